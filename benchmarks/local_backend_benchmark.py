@@ -0,0 +1,55 @@
+"""
+本地后端批处理基准：并发请求在不同批大小下的吞吐量
+
+默认使用桩模型模拟固定的单批前向耗时；指定 --model-path 时使用 transformers 模型（需安装 transformers 和 torch）
+用法：python benchmarks/local_backend_benchmark.py [--requests 64] [--concurrency 16] [--forward-ms 50]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client.modules.llm_backends import LocalBatchingBackend, StubModel, TransformersModel
+
+
+def run(model, batch_size, args):
+    backend = LocalBatchingBackend(model, max_batch_size=batch_size, batch_wait_ms=args.wait_ms)
+    try:
+        def call(i):
+            return backend.chat("local", [{"role": "user", "content": f"写一句关于第{i}章的开头"}], 0.7, args.max_tokens)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(call, range(args.requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        backend.close()
+    return elapsed, len(backend.batch_sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地后端批处理吞吐量基准")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--forward-ms", type=int, default=50)
+    parser.add_argument("--wait-ms", type=int, default=20)
+    parser.add_argument("--max-tokens", type=int, default=32)
+    parser.add_argument("--model-path", default="")
+    args = parser.parse_args()
+
+    if args.model_path:
+        model = TransformersModel(args.model_path)
+    else:
+        model = StubModel(forward_latency=args.forward_ms / 1000)
+
+    print(f"{'批大小':<8}{'耗时(s)':>10}{'批次数':>8}{'请求/秒':>10}")
+    for batch_size in (1, 4, 8, 16):
+        elapsed, batches = run(model, batch_size, args)
+        print(f"{batch_size:<8}{elapsed:>10.2f}{batches:>8}{args.requests / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
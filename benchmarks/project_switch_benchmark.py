@@ -0,0 +1,75 @@
+"""
+项目切换基准：多个各有数百章的项目之间轮流切换，测量读取项目上下文（项目行、最新大纲、章节元数据）的耗时
+
+首次切换时缓存为空，需要访问数据库；之后的切换命中读缓存
+用法：python benchmarks/project_switch_benchmark.py [--projects 5] [--chapters 500] [--target-ms 100]
+最慢一次切换超出目标耗时时以非零状态退出
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client.database import DatabaseManager
+from client.modules.project_manager import ProjectManager
+
+
+def populate(db, projects, chapters, chapter_chars):
+    paragraph = "夜色渐深，林风推开木门，院中的桂花被风吹落一地。"
+    content = paragraph * max(1, chapter_chars // len(paragraph))
+    project_ids = []
+    for p in range(projects):
+        project_id = db.create_project(f"项目{p + 1}", "测试作者", "武侠", "古典", "寻找")
+        db.save_outline(project_id, {
+            'main_storyline': {'overview': "少年林风离开小镇寻找失踪的师父"},
+            'chapters': [{'chapter_number': i, 'title': f"第{i}章", 'summary': paragraph}
+                         for i in range(1, chapters + 1)]
+        })
+        db.bulk_insert_chapters(project_id, ((i, f"第{i}章", content) for i in range(1, chapters + 1)))
+        project_ids.append(project_id)
+    return project_ids
+
+
+def switch_times(manager, project_ids, rounds):
+    """按顺序轮流切换项目，返回每次切换的耗时（毫秒）"""
+    times = []
+    for _ in range(rounds):
+        for project_id in project_ids:
+            start = time.perf_counter()
+            manager.get_context(project_id)
+            times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="项目切换耗时基准")
+    parser.add_argument("--projects", type=int, default=5)
+    parser.add_argument("--chapters", type=int, default=500)
+    parser.add_argument("--chapter-chars", type=int, default=3000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with DatabaseManager(os.path.join(tmpdir, "bench.db")) as db:
+            project_ids = populate(db, args.projects, args.chapters, args.chapter_chars)
+            manager = ProjectManager(db)
+
+            db.clear_caches()
+            cold = switch_times(manager, project_ids, 1)
+            warm = switch_times(manager, project_ids, args.rounds)
+
+    print(f"{args.projects} 个项目，每个 {args.chapters} 章（目标 {args.target_ms:.0f} ms）")
+    print(f"{'':<10}{'平均(ms)':>10}{'最慢(ms)':>10}")
+    for label, times in (("首次切换", cold), ("再次切换", warm)):
+        print(f"{label:<10}{sum(times) / len(times):>10.2f}{max(times):>10.2f}")
+
+    if max(cold + warm) > args.target_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
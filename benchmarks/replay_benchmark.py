@@ -0,0 +1,85 @@
+"""
+录制回放基准：按原速或加速回放录制的LLM会话，测量流式数据块吞吐量和并发流水线的总耗时
+
+录制：在 config.json 的后端配置中设置 "record_path": "recordings/session.jsonl.gz" 后正常使用客户端
+用法：python benchmarks/replay_benchmark.py [recordings/session.jsonl.gz] [--speeds 0 1 4] [--concurrency 8]
+未指定录制文件时使用合成的会话
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client.modules.llm_backends import BackendError, ReplayBackend, load_recording, request_key
+
+
+def synthetic_records(count=32, chunks=200, seed=5):
+    """模拟流式大纲：每块约8字，块间隔5-30毫秒"""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        messages = [{"role": "user", "content": f"会话{i}"}]
+        records.append({
+            'key': request_key(messages, True), 'model': "synthetic", 'stream': True,
+            'latency': rng.uniform(0.2, 0.8),
+            'chunks': [[rng.uniform(0.005, 0.03), {'choices': [{'delta': {'content': "夜色渐深，林风推门"}}]}]
+                       for _ in range(chunks)]
+        })
+    return records
+
+
+def recorded_seconds(record):
+    return record.get('latency', 0) + sum(delay for delay, _ in record.get('chunks', []))
+
+
+def consume(backend, record):
+    """
+    按录制时的请求方式调用并读完响应，返回 (数据块数, 字符数)
+    录制文件中只有请求键没有原始消息，空消息匹配不到键时回放按录制顺序取下一条记录
+    """
+    try:
+        if record.get('stream'):
+            count = chars = 0
+            for chunk in backend.chat(record.get('model'), [], 0, 0, stream=True):
+                count += 1
+                chars += len(chunk['choices'][0]['delta'].get('content') or "")
+            return count, chars
+        response = backend.chat(record.get('model'), [], 0, 0)
+        return 1, len(response['choices'][0]['message']['content'])
+    except BackendError:
+        # 录制时失败的调用同样失败
+        return 0, 0
+
+
+def run(records, speed, concurrency):
+    # 录制文件中没有原始消息，只能按录制顺序回放
+    backend = ReplayBackend(records, speed=speed, strict=False)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda record: consume(backend, record), records))
+    elapsed = time.perf_counter() - start
+    return elapsed, sum(r[0] for r in results), sum(r[1] for r in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM会话回放基准")
+    parser.add_argument("recording", nargs="?", default="")
+    parser.add_argument("--speeds", type=float, nargs="+", default=[0, 1, 4])
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    records = load_recording(args.recording) if args.recording else synthetic_records()
+    serial = sum(recorded_seconds(record) for record in records)
+    print(f"{len(records)} 条记录，录制时串行总耗时 {serial:.2f}s，并发数 {args.concurrency}")
+    print(f"{'速度':<8}{'耗时(s)':>10}{'数据块':>10}{'块/秒':>12}{'字符/秒':>12}")
+    for speed in args.speeds:
+        elapsed, chunks, chars = run(records, speed, args.concurrency)
+        print(f"{speed:<8g}{elapsed:>10.2f}{chunks:>10}{chunks / elapsed:>12.0f}{chars / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+启动耗时基准：使用 python -X importtime 统计导入 client.main 的耗时
+
+用法：python benchmarks/startup_benchmark.py [--target-ms 300] [--top 15]
+超出目标耗时或启动阶段导入了重量级模块时以非零状态退出。
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 这些模块应当在首次使用时才导入
+DEFERRED_MODULES = ["openai", "markdown2", "client.database", "client.modules.outline_generator",
+                    "client.modules.content_generator"]
+
+
+def profile_imports(module):
+    """在子进程中导入模块，返回 [(模块名, 自身耗时us, 累计耗时us)]"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入{module}失败:\n{result.stderr}")
+
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        records.append((name.strip(), int(self_us), int(cumulative_us)))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="客户端冷启动导入耗时基准")
+    parser.add_argument("--module", default="client.main")
+    parser.add_argument("--target-ms", type=float, default=300.0)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    records = profile_imports(args.module)
+    total_ms = next(cum for name, _, cum in records if name == args.module) / 1000
+
+    print(f"导入 {args.module} 累计耗时: {total_ms:.1f} ms（目标 {args.target_ms:.0f} ms）")
+    print(f"\n{'模块':<50}{'自身(ms)':>10}{'累计(ms)':>10}")
+    for name, self_us, cum_us in sorted(records, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"{name:<50}{self_us / 1000:>10.1f}{cum_us / 1000:>10.1f}")
+
+    imported = {name for name, _, _ in records}
+    eager = [m for m in DEFERRED_MODULES if m in imported]
+    if eager:
+        print(f"\n启动阶段不应导入: {', '.join(eager)}")
+
+    if eager or total_ms > args.target_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from client.config import get_config
+from client.tracing import traced
+
+# auto_vacuum 取值：0=NONE 1=FULL 2=INCREMENTAL
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+class BackupManager:
+    """
+    数据库快照与压缩整理，每次操作使用独立连接，可在后台线程中调用
+    :param settings: BackupSettings，未指定时每次读取当前配置（跟随热加载）
+    """
+
+    def __init__(self, db_path, settings=None):
+        if db_path == ':memory:':
+            raise ValueError("内存数据库不支持备份")
+        self.db_path = db_path
+        self._settings = settings
+        self.prefix = os.path.splitext(os.path.basename(db_path))[0]
+
+    @property
+    def settings(self):
+        return self._settings or get_config().settings.backup
+
+    @property
+    def directory(self):
+        return self.settings.directory
+
+    def _connect(self, path):
+        return sqlite3.connect(path, timeout=30)
+
+    # 快照
+    @traced(category='db')
+    def snapshot(self, progress=None):
+        """
+        生成带时间戳的快照并按保留数量清理旧快照
+        先写入临时文件再重命名，中途失败不会留下不完整的快照
+        :param progress: 在线备份时的进度回调 (剩余页数, 总页数)
+        :return: 快照路径
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._snapshot_path()
+        partial = path + '.partial'
+        if os.path.exists(partial):
+            os.remove(partial)
+
+        def report(status, remaining, total):
+            progress(remaining, total)
+
+        settings = self.settings
+        source = self._connect(self.db_path)
+        try:
+            if settings.compact_snapshots:
+                source.execute("VACUUM INTO ?", (partial,))
+            else:
+                target = self._connect(partial)
+                try:
+                    source.backup(target, pages=settings.pages_per_step,
+                                  progress=report if progress else None, sleep=0.01)
+                finally:
+                    target.close()
+        except Exception:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        finally:
+            source.close()
+
+        os.replace(partial, path)
+        self.prune()
+        return path
+
+    def _snapshot_path(self):
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(self.directory, f"{self.prefix}-{stamp}.db")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{self.prefix}-{stamp}-{suffix}.db")
+            suffix += 1
+        return path
+
+    def list_snapshots(self):
+        """按时间从旧到新返回快照路径"""
+        if not os.path.isdir(self.directory):
+            return []
+        names = [name for name in os.listdir(self.directory)
+                 if name.startswith(self.prefix + '-') and name.endswith('.db')]
+        paths = [os.path.join(self.directory, name) for name in names]
+        return sorted(paths, key=lambda p: (os.stat(p).st_mtime_ns, p))
+
+    def prune(self, keep=None):
+        """删除超出保留数量的旧快照，返回被删除的路径"""
+        keep = keep if keep is not None else self.settings.keep
+        snapshots = self.list_snapshots()
+        removed = snapshots[:max(len(snapshots) - keep, 0)]
+        for path in removed:
+            os.remove(path)
+        return removed
+
+    def restore(self, snapshot_path, db=None):
+        """
+        用快照覆盖当前数据库（在线备份API反向复制，已打开的连接会看到恢复后的数据）
+        :param db: 使用该数据库的 DatabaseManager，恢复后清空其读缓存
+        """
+        if not os.path.exists(snapshot_path):
+            raise ValueError(f"快照不存在: {snapshot_path}")
+        source = self._connect(snapshot_path)
+        target = self._connect(self.db_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        if db is not None:
+            db.clear_caches()
+
+    # 压缩整理
+    def is_incremental(self):
+        """数据库是否已启用增量vacuum"""
+        conn = self._connect(self.db_path)
+        try:
+            return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL
+        finally:
+            conn.close()
+
+    @traced(category='db')
+    def convert_to_incremental(self):
+        """
+        把旧数据库切换为增量vacuum，需要一次完整VACUUM（持有排他锁直到完成），只应由用户手动触发
+        :return: 回收的页数
+        """
+        conn = self._connect(self.db_path)
+        try:
+            freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            return freelist
+        finally:
+            conn.close()
+
+    @traced(category='db')
+    def compact(self, max_pages=None):
+        """
+        增量回收空闲页，数据库文件随之缩小；未启用增量vacuum的数据库不做处理（见 convert_to_incremental）
+        :param max_pages: 单次最多回收的页数，None表示全部
+        :return: 回收的页数
+        """
+        conn = self._connect(self.db_path)
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+                return 0
+            freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if freelist:
+                # execute() 只执行一步（回收一页），executescript 会执行到底
+                pages = f"({int(max_pages)})" if max_pages else ""
+                conn.executescript(f"PRAGMA incremental_vacuum{pages};")
+            return freelist - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        finally:
+            conn.close()
+
+
+class BackupScheduler(threading.Thread):
+    """
+    按配置的间隔在后台生成快照，并定期分批增量回收空闲页
+    启动时不立即执行，第一次快照和回收在一个间隔之后
+    """
+
+    def __init__(self, manager, now=None):
+        super().__init__(daemon=True)
+        self.manager = manager
+        self.stop_event = threading.Event()
+        started = now if now is not None else time.time()
+        self.last_snapshot = started
+        self.last_compact = started
+        self.error = None
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.run_pending()
+            self.stop_event.wait(60)
+
+    def run_pending(self, now=None):
+        """执行到期的快照和压缩整理"""
+        now = now if now is not None else time.time()
+        settings = self.manager.settings
+        if not settings.enabled:
+            return
+        try:
+            if now - self.last_snapshot >= settings.interval_minutes * 60:
+                self.manager.snapshot()
+                self.last_snapshot = now
+            if now - self.last_compact >= settings.vacuum_interval_hours * 3600:
+                # 每批只回收少量页，批与批之间释放锁，不阻塞主连接写入
+                while not self.stop_event.is_set() and self.manager.compact(settings.pages_per_step):
+                    self.stop_event.wait(0.05)
+                self.last_compact = now
+        except (sqlite3.Error, OSError) as e:
+            self.error = e
+            print(f"备份失败: {e}")
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    按条目数限制大小的LRU缓存，带命中率统计，可在多个线程中共享
+    :param copy: 返回值的复制函数；设置后 get/get_or_load 返回副本，调用方修改返回值不会影响缓存
+    """
+
+    def __init__(self, max_size, copy=None):
+        self.max_size = max_size
+        self._copy = copy
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _out(self, value):
+        if self._copy is None or value is None or value is _MISSING:
+            return value
+        return self._copy(value)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._out(self._data[key])
+            self.misses += 1
+            return default
+
+    def get_or_load(self, key, loader):
+        """命中时直接返回，否则调用loader加载并缓存结果；加载时不持有锁"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.put(key, value)
+            value = self._out(value)
+        return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._evict()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """删除键满足条件的所有条目"""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def resize(self, max_size):
+        with self._lock:
+            self.max_size = max_size
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+    def _evict(self):
+        while len(self._data) > max(self.max_size, 0):
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
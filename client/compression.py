@@ -0,0 +1,218 @@
+import struct
+import threading
+import warnings
+import zlib
+from collections import Counter
+
+# 压缩值格式：MAGIC + 算法(1字节) + 字典ID(2字节) + 压缩数据
+# 未压缩的值仍以TEXT存储，读取时按类型区分
+MAGIC = b'NW'
+ALGORITHMS = {'zlib': b'z', 'zstd': b's'}
+HEADER_SIZE = len(MAGIC) + 1 + 2
+# 头部中字典ID占2字节
+MAX_DICTIONARY_ID = 0xFFFF
+
+
+def _zstd():
+    """zstandard 为可选依赖"""
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def zstd_available():
+    return _zstd() is not None
+
+
+class Compressor:
+    """
+    文本压缩器，支持共享字典
+    :param algorithm: none / zlib / zstd，zstd不可用时退回zlib
+    :param dictionaries: {字典ID: 字典数据}，解压旧数据时按ID查找
+    """
+
+    def __init__(self, algorithm='zlib', level=6, min_size=512, dictionary_id=0, dictionaries=None,
+                 dictionary_loader=None):
+        if algorithm == 'zstd' and not zstd_available():
+            warnings.warn("未安装zstandard，改用zlib压缩", RuntimeWarning, stacklevel=2)
+            algorithm = 'zlib'
+        self.algorithm = algorithm
+        self.level = min(level, 9) if algorithm == 'zlib' else level
+        self.min_size = min_size
+        self.dictionary_id = dictionary_id
+        self.dictionaries = dict(dictionaries or {})
+        # 遇到未知字典ID时调用，返回字典数据
+        self.dictionary_loader = dictionary_loader
+        # 按字典ID缓存的压缩/解压对象，创建时才处理字典；zstandard 的对象不能在线程间同时使用，按线程缓存
+        self._local = threading.local()
+
+    @property
+    def enabled(self):
+        return self.algorithm in ALGORITHMS
+
+    def header(self):
+        """当前配置下压缩值的头部，用于判断是否需要重新压缩"""
+        return MAGIC + ALGORITHMS[self.algorithm] + struct.pack('>H', self.dictionary_id)
+
+    def compress(self, text):
+        """压缩文本，过短或未启用压缩时原样返回"""
+        if text is None or not self.enabled:
+            return text
+        data = text.encode('utf-8')
+        if len(data) < self.min_size:
+            return text
+
+        compressor = self._compressor(self.dictionary_id)
+        if self.algorithm == 'zstd':
+            body = compressor.compress(data)
+        else:
+            # 预置字典的 compressobj 只创建一次，每次压缩使用其副本
+            compressor = compressor.copy()
+            body = compressor.compress(data) + compressor.flush()
+
+        compressed = self.header() + body
+        # 压缩无收益时保留原文
+        return compressed if len(compressed) < len(data) else text
+
+    def decompress(self, value):
+        """解压数据库中读出的值，TEXT原样返回"""
+        if not isinstance(value, bytes):
+            return value
+        if not value.startswith(MAGIC) or len(value) < HEADER_SIZE:
+            return value.decode('utf-8')
+
+        algorithm = value[len(MAGIC):len(MAGIC) + 1]
+        dictionary_id = struct.unpack('>H', value[len(MAGIC) + 1:HEADER_SIZE])[0]
+        body = value[HEADER_SIZE:]
+
+        if algorithm == ALGORITHMS['zstd']:
+            data = self._zstd_decompressor(dictionary_id).decompress(body)
+        elif algorithm == ALGORITHMS['zlib']:
+            dictionary = self._get_dictionary(dictionary_id) if dictionary_id else None
+            decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+            data = decompressor.decompress(body) + decompressor.flush()
+        else:
+            raise ValueError("未知的压缩格式")
+        return data.decode('utf-8')
+
+    def _thread_cache(self, name):
+        cache = getattr(self._local, name, None)
+        if cache is None:
+            cache = {}
+            setattr(self._local, name, cache)
+        return cache
+
+    def _compressor(self, dictionary_id):
+        """当前算法和字典的压缩对象：zstd 为 ZstdCompressor，zlib 为预置字典的 compressobj"""
+        cache = self._thread_cache('compressors')
+        compressor = cache.get(dictionary_id)
+        if compressor is None:
+            dictionary = self.dictionaries.get(dictionary_id) if dictionary_id else None
+            if self.algorithm == 'zstd':
+                zstandard = _zstd()
+                params = {'level': self.level}
+                if dictionary:
+                    params['dict_data'] = zstandard.ZstdCompressionDict(dictionary)
+                compressor = zstandard.ZstdCompressor(**params)
+            elif dictionary:
+                compressor = zlib.compressobj(self.level, zlib.DEFLATED, 15, 9, zlib.Z_DEFAULT_STRATEGY, dictionary)
+            else:
+                compressor = zlib.compressobj(self.level)
+            cache[dictionary_id] = compressor
+        return compressor
+
+    def _zstd_decompressor(self, dictionary_id):
+        cache = self._thread_cache('decompressors')
+        decompressor = cache.get(dictionary_id)
+        if decompressor is None:
+            zstandard = _zstd()
+            if zstandard is None:
+                raise RuntimeError("数据使用zstd压缩，请安装zstandard")
+            params = {}
+            if dictionary_id:
+                params['dict_data'] = zstandard.ZstdCompressionDict(self._get_dictionary(dictionary_id))
+            decompressor = cache[dictionary_id] = zstandard.ZstdDecompressor(**params)
+        return decompressor
+
+    def _get_dictionary(self, dictionary_id):
+        if dictionary_id not in self.dictionaries and self.dictionary_loader:
+            dictionary = self.dictionary_loader(dictionary_id)
+            if dictionary is not None:
+                self.dictionaries[dictionary_id] = dictionary
+        if dictionary_id not in self.dictionaries:
+            raise ValueError(f"缺少压缩字典: {dictionary_id}")
+        return self.dictionaries[dictionary_id]
+
+
+def train_dictionary(samples, algorithm='zlib', size=32768):
+    """
+    用样本文本训练共享字典
+    zstd使用zstandard自带训练；zlib预设字典取高频片段，越常见的放得越靠后
+    """
+    encoded = [s.encode('utf-8') for s in samples if s]
+    if not encoded:
+        return None
+
+    if algorithm == 'zstd' and zstd_available():
+        return _zstd().train_dictionary(size, encoded).as_bytes()
+
+    # zlib 预设字典最多使用32KB，按“出现次数×字节数”挑选高频片段（人名、常用句式等）
+    size = min(size, 32768)
+    counts = Counter()
+    for text in samples:
+        for n in (4, 8):
+            counts.update(text[i:i + n] for i in range(0, len(text) - n + 1))
+
+    scored = sorted(
+        ((count * len(gram.encode('utf-8')), gram) for gram, count in counts.items() if count >= 3),
+        reverse=True
+    )
+    pieces = []
+    total = 0
+    for _, gram in scored:
+        piece = gram.encode('utf-8')
+        if total + len(piece) > size:
+            break
+        pieces.append(piece)
+        total += len(piece)
+    if not pieces:
+        return None
+    return b''.join(reversed(pieces))
+
+
+class RecompressionJob(threading.Thread):
+    """
+    后台重新压缩任务，使用独立的数据库连接
+    尚无共享字典且样本足够时先训练字典，再按批重写已有数据
+    :param on_dictionary_trained: 训练出新字典后在工作线程中调用，参数为字典ID，
+        用于通知主连接重新读取字典（如 DatabaseManager.reload_compressor）
+    """
+
+    def __init__(self, db_path, batch_size=200, on_dictionary_trained=None):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.on_dictionary_trained = on_dictionary_trained
+        self.stop_event = threading.Event()
+        self.rewritten = 0
+        self.error = None
+
+    def run(self):
+        from client.database import DatabaseManager
+
+        try:
+            with DatabaseManager(self.db_path) as db:
+                storage = db.config.settings.storage
+                if storage.use_dictionary and not db._compressor.dictionary_id:
+                    dictionary_id = db.train_compression_dictionary()
+                    if dictionary_id is not None and self.on_dictionary_trained:
+                        self.on_dictionary_trained(dictionary_id)
+                self.rewritten = db.recompress(self.batch_size, self.stop_event)
+        except Exception as e:
+            self.error = e
+            print(f"重新压缩失败: {e}")
+
+    def stop(self):
+        self.stop_event.set()
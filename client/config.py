@@ -1,43 +1,275 @@
+import copy
 import json
+import logging
 import os
+import threading
+from dataclasses import asdict, dataclass, field, fields
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OpenAISettings:
+    api_key: str = ""
+    api_base: str = "https://api.openai.com/v1"
+    model: str = "gpt-3.5-turbo"
+    temperature: float = 0.7
+    max_tokens: int = 2000
+
+
+@dataclass
+class DatabaseSettings:
+    path: str = "novel_writer.db"
+
+
+@dataclass
+class OutlineSettings:
+    temperature: float = 0.7
+    max_tokens: int = 1000
+    detail_level: int = 3
+    enable_worldbuilding: bool = True
+    max_scenes_per_chapter: int = 5
+    max_workers: int = 8
+    chapter_max_tokens: int = 800
+    # 大纲骨架的章节数；骨架按章节范围分多次生成，每次最多 skeleton_chapters_per_call 章，
+    # 每次的token预算为章节数乘以 skeleton_tokens_per_chapter（首次另加max_tokens用于主线、角色等）
+    chapter_count: int = 20
+    skeleton_chapters_per_call: int = 20
+    skeleton_tokens_per_chapter: int = 120
+
+
+@dataclass
+class ContentSettings:
+    temperature: float = 0.7
+    max_tokens: int = 2000
+
+
+@dataclass
+class ConsistencySettings:
+    temperature: float = 0.2
+    max_tokens: int = 300
+    # 规则无法确定的疑似矛盾交给LLM确认，每次检查最多调用的次数
+    use_llm: bool = True
+    max_llm_checks: int = 10
+
+
+@dataclass
+class ExportSettings:
+    output_dir: str = "exports"
+    max_workers: int = 4
+
+
+@dataclass
+class CacheSettings:
+    # DatabaseManager 读缓存条目数，0 表示不缓存
+    projects: int = 64
+    outlines: int = 32
+    chapters: int = 256
+    chapter_metadata: int = 32
+
+
+@dataclass
+class EditorSettings:
+    # 编辑器草稿自动保存间隔（秒），只写入自上次保存以来的增量，0 表示不自动保存
+    autosave_seconds: int = 10
+
+
+@dataclass
+class StorageSettings:
+    # 章节正文、大纲和LLM原始响应的压缩方式：none / zlib / zstd
+    compression: str = "none"
+    level: int = 6
+    # 小于该字节数的内容不压缩
+    min_size: int = 512
+    use_dictionary: bool = True
+    dictionary_size: int = 32768
+
+
+@dataclass
+class BackupSettings:
+    enabled: bool = True
+    directory: str = "backups"
+    interval_minutes: int = 60
+    # 保留的快照数量，超出时删除最旧的
+    keep: int = 10
+    # 在线备份每步复制的页数，步与步之间释放锁，不阻塞写入
+    pages_per_step: int = 256
+    # 快照使用 VACUUM INTO 生成（文件更小，但复制期间持有读事务）
+    compact_snapshots: bool = False
+    vacuum_interval_hours: int = 24
+
+
+@dataclass
+class BackendSettings:
+    # openai：openai SDK；http：OpenAI兼容的HTTP服务（llama.cpp server、vLLM等）；local：进程内模型；
+    # replay：回放录制文件中的响应，用于离线测试和基准
+    type: str = "openai"
+    # 为空时使用 openai.api_base / openai.api_key
+    api_base: str = ""
+    api_key: str = ""
+    timeout: int = 120
+    # local：stub（测试用）或 transformers
+    local_model: str = "stub"
+    model_path: str = ""
+    device: str = "cpu"
+    # local：并发请求合并为一批，最多等待 batch_wait_ms 毫秒凑满 max_batch_size
+    max_batch_size: int = 8
+    batch_wait_ms: int = 20
+    # replay：录制文件和回放速度倍数（0 表示不等待）
+    replay_path: str = ""
+    replay_speed: float = 1.0
+    # replay：请求与录制不一致时报错；关闭后按录制顺序回放
+    replay_strict: bool = True
+    # 不为空时把经过该后端的请求和响应录制到此文件（gzip压缩的JSON Lines）
+    record_path: str = ""
+
+
+def _default_backends():
+    return {"openai": BackendSettings()}
+
+
+@dataclass
+class ModelTier:
+    backend: str = "openai"
+    # 为空时使用 openai.model
+    model: str = ""
+    # 每千token价格，用于成本统计
+    prompt_price: float = 0.0
+    completion_price: float = 0.0
+    # 请求超时（秒）
+    timeout: int = 60
+    # 出错或超时时改用的层级，为空表示不降级
+    fallback: str = ""
+
+
+@dataclass
+class TaskRoute:
+    tier: str = "strong"
+    # 为空时使用调用方传入的参数（generation.* 或 openai.*）
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+
+
+def _default_tiers():
+    return {"strong": ModelTier(fallback="fast"), "fast": ModelTier()}
+
+
+def _default_tasks():
+    return {
+        "outline": TaskRoute("strong"),
+        "outline_chapter": TaskRoute("fast"),
+        "chapter": TaskRoute("strong"),
+        "consistency": TaskRoute("fast"),
+        "summary": TaskRoute("fast"),
+        "title": TaskRoute("fast"),
+    }
+
+
+@dataclass
+class RoutingSettings:
+    # 未配置的任务使用的层级
+    default_tier: str = "strong"
+    tiers: Dict[str, ModelTier] = field(default_factory=_default_tiers)
+    tasks: Dict[str, TaskRoute] = field(default_factory=_default_tasks)
+
+
+@dataclass
+class Settings:
+    """只读的强类型配置快照，热加载时整体替换"""
+    openai: OpenAISettings = field(default_factory=OpenAISettings)
+    database: DatabaseSettings = field(default_factory=DatabaseSettings)
+    outline: OutlineSettings = field(default_factory=OutlineSettings)
+    content: ContentSettings = field(default_factory=ContentSettings)
+    consistency: ConsistencySettings = field(default_factory=ConsistencySettings)
+    export: ExportSettings = field(default_factory=ExportSettings)
+    cache: CacheSettings = field(default_factory=CacheSettings)
+    editor: EditorSettings = field(default_factory=EditorSettings)
+    storage: StorageSettings = field(default_factory=StorageSettings)
+    backup: BackupSettings = field(default_factory=BackupSettings)
+    routing: RoutingSettings = field(default_factory=RoutingSettings)
+    backends: Dict[str, BackendSettings] = field(default_factory=_default_backends)
+
+    def to_dict(self):
+        """转换为与config.json相同的嵌套结构"""
+        return {
+            "openai": asdict(self.openai),
+            "database": asdict(self.database),
+            "generation": {
+                "outline": asdict(self.outline),
+                "content": asdict(self.content),
+                "consistency": asdict(self.consistency)
+            },
+            "export": asdict(self.export),
+            "cache": asdict(self.cache),
+            "editor": asdict(self.editor),
+            "storage": asdict(self.storage),
+            "backup": asdict(self.backup),
+            "routing": asdict(self.routing),
+            "backends": {name: asdict(backend) for name, backend in self.backends.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, config):
+        def build(settings_cls, data):
+            names = {f.name for f in fields(settings_cls)}
+            return settings_cls(**{k: v for k, v in data.items() if k in names})
+
+        generation = config.get("generation", {})
+        routing = config.get("routing", {})
+        return cls(
+            openai=build(OpenAISettings, config.get("openai", {})),
+            database=build(DatabaseSettings, config.get("database", {})),
+            outline=build(OutlineSettings, generation.get("outline", {})),
+            content=build(ContentSettings, generation.get("content", {})),
+            consistency=build(ConsistencySettings, generation.get("consistency", {})),
+            export=build(ExportSettings, config.get("export", {})),
+            cache=build(CacheSettings, config.get("cache", {})),
+            editor=build(EditorSettings, config.get("editor", {})),
+            storage=build(StorageSettings, config.get("storage", {})),
+            backup=build(BackupSettings, config.get("backup", {})),
+            routing=RoutingSettings(
+                default_tier=routing.get("default_tier", "strong"),
+                tiers={name: build(ModelTier, tier) for name, tier in routing.get("tiers", {}).items()},
+                tasks={name: build(TaskRoute, task) for name, task in routing.get("tasks", {}).items()}
+            ),
+            backends={name: build(BackendSettings, backend) for name, backend in config.get("backends", {}).items()}
+        )
+
+
+def _merge(defaults, overrides):
+    """递归合并配置，文件中未出现的键使用默认值"""
+    merged = copy.deepcopy(defaults)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
 
 class Config:
     def __init__(self, config_path="config.json"):
         self.config_path = config_path
-        self.default_config = {
-            "openai": {
-                "api_key": "",
-                "api_base": "https://api.openai.com/v1",
-                "model": "gpt-3.5-turbo",
-                "temperature": 0.7,
-                "max_tokens": 2000
-            },
-            "database": {
-                "path": "novel_writer.db"
-            },
-            "generation": {
-                "outline": {
-                    "temperature": 0.7,
-                    "max_tokens": 1000
-                },
-                "content": {
-                    "temperature": 0.7,
-                    "max_tokens": 2000
-                }
-            }
-        }
+        self.default_config = Settings().to_dict()
+        self._listeners = []
+        # 最近一次重新加载失败的原因，成功后清空
+        self.last_error = None
+        self._mtime = self._get_mtime()
         self.config = self.load_config()
         self.validate_config()
+        self.settings = Settings.from_dict(self.config)
 
     def load_config(self):
         if os.path.exists(self.config_path):
-            with open(self.config_path, 'r') as f:
-                return json.load(f)
-        return self.default_config
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                return _merge(self.default_config, json.load(f))
+        return copy.deepcopy(self.default_config)
 
     def save_config(self):
-        with open(self.config_path, 'w') as f:
-            json.dump(self.config, f, indent=4)
+        with open(self.config_path, 'w', encoding='utf-8') as f:
+            json.dump(self.config, f, indent=4, ensure_ascii=False)
+        self._mtime = self._get_mtime()
 
     def get_openai_config(self):
         return self.config.get("openai", {})
@@ -48,20 +280,168 @@ class Config:
     def get_generation_config(self, type="content"):
         return self.config.get("generation", {}).get(type, {})
 
-    def validate_config(self):
+    def validate_config(self, config=None):
         """校验配置文件有效性"""
-        if not 0 <= self.config['openai']['temperature'] <= 2:
+        config = config if config is not None else self.config
+        openai_config = config['openai']
+        if not 0 <= openai_config['temperature'] <= 2:
             raise ValueError("Temperature 参数需在0-2之间")
-        if self.config['openai']['api_key'] == "":
-            raise ValueError("缺少OpenAI API密钥")
-
-class ConfigManager:
-    def __init__(self, config_file):
-        with open(config_file, 'r', encoding='utf-8') as f:
-            self.config = json.load(f)
-    
-    def get_openai_config(self):
-        return self.config.get('openai', {})
-    
-    def get_generation_config(self, config_type):
-        return self.config.get('generation', {}).get(config_type, {}) 
\ No newline at end of file
+        _check_int(openai_config, 'max_tokens', "openai.max_tokens", minimum=1)
+
+        for name, generation in config['generation'].items():
+            if 'temperature' in generation and not 0 <= generation['temperature'] <= 2:
+                raise ValueError(f"generation.{name}.temperature 参数需在0-2之间")
+            if 'max_tokens' in generation:
+                _check_int(generation, 'max_tokens', f"generation.{name}.max_tokens", minimum=1)
+
+        outline = config['generation']['outline']
+        _check_int(outline, 'detail_level', "generation.outline.detail_level", minimum=1, maximum=5)
+        _check_int(outline, 'max_scenes_per_chapter', "generation.outline.max_scenes_per_chapter", minimum=1)
+        _check_int(outline, 'max_workers', "generation.outline.max_workers", minimum=1, maximum=64)
+        _check_int(outline, 'chapter_max_tokens', "generation.outline.chapter_max_tokens", minimum=1)
+        _check_int(outline, 'chapter_count', "generation.outline.chapter_count", minimum=1, maximum=500)
+        _check_int(outline, 'skeleton_chapters_per_call',
+                   "generation.outline.skeleton_chapters_per_call", minimum=1, maximum=50)
+        _check_int(outline, 'skeleton_tokens_per_chapter',
+                   "generation.outline.skeleton_tokens_per_chapter", minimum=1)
+
+        _check_int(config['generation']['consistency'], 'max_llm_checks',
+                   "generation.consistency.max_llm_checks", minimum=0)
+
+        _check_int(config['export'], 'max_workers', "export.max_workers", minimum=1, maximum=16)
+        for key in ('projects', 'outlines', 'chapters', 'chapter_metadata'):
+            _check_int(config['cache'], key, f"cache.{key}", minimum=0, maximum=100000)
+        _check_int(config['editor'], 'autosave_seconds', "editor.autosave_seconds", minimum=0, maximum=3600)
+
+        storage = config['storage']
+        if storage['compression'] not in ('none', 'zlib', 'zstd'):
+            raise ValueError("storage.compression 只能为 none、zlib 或 zstd")
+        _check_int(storage, 'level', "storage.level", minimum=1, maximum=22)
+        _check_int(storage, 'min_size', "storage.min_size", minimum=0)
+        _check_int(storage, 'dictionary_size', "storage.dictionary_size", minimum=1024, maximum=1048576)
+
+        backup = config['backup']
+        _check_int(backup, 'interval_minutes', "backup.interval_minutes", minimum=1)
+        _check_int(backup, 'keep', "backup.keep", minimum=1)
+        _check_int(backup, 'pages_per_step', "backup.pages_per_step", minimum=1)
+        _check_int(backup, 'vacuum_interval_hours', "backup.vacuum_interval_hours", minimum=1)
+
+        routing = config['routing']
+        tiers = routing['tiers']
+        if routing['default_tier'] not in tiers:
+            raise ValueError(f"routing.default_tier 未定义: {routing['default_tier']}")
+        # 自定义的后端、层级和任务可以只写部分字段，其余使用默认值
+        backends = config['backends']
+        for name, backend in backends.items():
+            backend = dict(asdict(BackendSettings()), **backend)
+            if backend['type'] not in ('openai', 'http', 'local', 'replay'):
+                raise ValueError(f"backends.{name}.type 只能为 openai、http、local 或 replay")
+            if backend['type'] == 'http' and not backend['api_base']:
+                raise ValueError(f"backends.{name}.api_base 未配置")
+            if backend['type'] == 'local' and backend['local_model'] not in ('stub', 'transformers'):
+                raise ValueError(f"backends.{name}.local_model 只能为 stub 或 transformers")
+            if backend['type'] == 'replay' and not backend['replay_path']:
+                raise ValueError(f"backends.{name}.replay_path 未配置")
+            if backend['replay_speed'] < 0:
+                raise ValueError(f"backends.{name}.replay_speed 不能为负数")
+            _check_int(backend, 'timeout', f"backends.{name}.timeout", minimum=1)
+            _check_int(backend, 'max_batch_size', f"backends.{name}.max_batch_size", minimum=1, maximum=256)
+            _check_int(backend, 'batch_wait_ms', f"backends.{name}.batch_wait_ms", minimum=0, maximum=10000)
+
+        for name, tier in tiers.items():
+            tier = dict(asdict(ModelTier()), **tier)
+            if tier['backend'] not in backends:
+                raise ValueError(f"routing.tiers.{name}.backend 未定义: {tier['backend']}")
+            _check_int(tier, 'timeout', f"routing.tiers.{name}.timeout", minimum=1)
+            if tier['prompt_price'] < 0 or tier['completion_price'] < 0:
+                raise ValueError(f"routing.tiers.{name} 价格不能为负数")
+            if tier['fallback'] and tier['fallback'] not in tiers:
+                raise ValueError(f"routing.tiers.{name}.fallback 未定义: {tier['fallback']}")
+            # 只使用本地后端时不需要OpenAI密钥
+            backend = dict(asdict(BackendSettings()), **backends[tier['backend']])
+            if backend['type'] == 'openai' and not backend['api_key'] and openai_config['api_key'] == "":
+                raise ValueError("缺少OpenAI API密钥")
+        for name, task in routing['tasks'].items():
+            task = dict(asdict(TaskRoute()), **task)
+            if task['tier'] not in tiers:
+                raise ValueError(f"routing.tasks.{name}.tier 未定义: {task['tier']}")
+            if task.get('max_tokens') is not None:
+                _check_int(task, 'max_tokens', f"routing.tasks.{name}.max_tokens", minimum=1)
+            if task.get('temperature') is not None and not 0 <= task['temperature'] <= 2:
+                raise ValueError(f"routing.tasks.{name}.temperature 需在0-2之间")
+
+    # 热加载
+    def add_listener(self, callback):
+        """注册配置变更回调，回调参数为当前Config实例"""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def reload(self):
+        """
+        重新读取配置文件，校验失败时保留旧配置，失败原因记录在 last_error 中
+        回调在调用线程中执行，应在主线程调用
+        :return: 新配置是否已加载且所有回调执行成功
+        """
+        self._mtime = self._get_mtime()
+        try:
+            new_config = self.load_config()
+            self.validate_config(new_config)
+        except (ValueError, KeyError, TypeError, json.JSONDecodeError) as e:
+            self.last_error = str(e)
+            logger.warning("配置重新加载失败，继续使用旧配置: %s", e)
+            return False
+
+        # 整体替换引用，读取方无需加锁
+        self.config = new_config
+        self.settings = Settings.from_dict(new_config)
+        self.last_error = None
+        for callback in list(self._listeners):
+            try:
+                callback(self)
+            except Exception as e:
+                self.last_error = f"配置变更回调执行失败: {e}"
+                logger.exception("配置变更回调执行失败")
+        return self.last_error is None
+
+    def reload_if_changed(self):
+        """
+        配置文件修改时间变化时重新加载
+        只做一次 stat，由主线程定时调用（见 MainWindow），监听回调因此都在主线程执行
+        :return: 文件未变化时返回None，否则返回 reload() 的结果
+        """
+        if self._get_mtime() != self._mtime:
+            return self.reload()
+        return None
+
+    def _get_mtime(self):
+        try:
+            return os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            return None
+
+
+def _check_int(section, key, name, minimum=None, maximum=None):
+    value = section.get(key)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f"{name} 参数必须为整数")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"{name} 参数不能小于{minimum}")
+    if maximum is not None and value > maximum:
+        raise ValueError(f"{name} 参数不能大于{maximum}")
+
+
+_config_instance = None
+_config_lock = threading.Lock()
+
+
+def get_config(config_path="config.json"):
+    """获取全局共享的配置实例，首次调用时加载"""
+    global _config_instance
+    with _config_lock:
+        if _config_instance is None:
+            _config_instance = Config(config_path)
+        return _config_instance
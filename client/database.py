@@ -1,16 +1,60 @@
+import copy
 import sqlite3
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Iterable, Iterator, Tuple
 from datetime import datetime
+import hashlib
 import json
-from client.config import Config
+from client.cache import LRUCache
+from client.compression import MAX_DICTIONARY_ID, Compressor, train_dictionary
+from client.config import get_config
+from client.tracing import span, traced
+
+# 章节状态的显示名称，编辑器和进度面板共用
+CHAPTER_STATUS_LABELS = {
+    'not_started': "未开始",
+    'generating': "生成中",
+    'pending_review': "待审核",
+    'completed': "已完成"
+}
+
+
+class TracedConnection(sqlite3.Connection):
+    """开启追踪时记录每次提交的耗时"""
+
+    def commit(self):
+        with span("sqlite.commit", "db"):
+            super().commit()
+
 
 class DatabaseManager:
+    # 当前客户端支持的数据库版本
+    SCHEMA_VERSION = 8
+
+    CHAPTER_STATUSES = ('not_started', 'generating', 'pending_review', 'completed')
+
     def __init__(self, db_path=None):
-        self.config = Config()
+        self.config = get_config()
         db_config = self.config.get_database_config()
         self.db_path = db_path or db_config.get("path")
-        self.conn = sqlite3.connect(self.db_path)
+        self.conn = sqlite3.connect(self.db_path, factory=TracedConnection)
+        # 外键约束是连接级设置，每个连接都需要单独启用
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        # 新建的数据库启用增量vacuum，删除项目后的空闲页可由 BackupManager.compact 回收
+        if self.conn.execute("PRAGMA page_count").fetchone()[0] == 0:
+            self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
         self._check_and_update_schema()
+        self._compressor = self._build_compressor(self.config.settings.storage)
+        self._compressor_stale = False
+
+        # 读缓存：写入方法中按键精确失效，返回副本以免调用方修改缓存内容
+        cache_settings = self.config.settings.cache
+        self._project_cache = LRUCache(cache_settings.projects, copy=dict)
+        self._outline_cache = LRUCache(cache_settings.outlines, copy=copy.deepcopy)
+        self._chapter_cache = LRUCache(cache_settings.chapters, copy=dict)
+        self._chapter_meta_cache = LRUCache(cache_settings.chapter_metadata,
+                                            copy=lambda rows: [dict(row) for row in rows])
+        self.config.add_listener(self._resize_caches)
+        self.config.add_listener(self._apply_storage_config)
 
     def _check_and_update_schema(self):
         """检查并更新数据库schema"""
@@ -29,20 +73,25 @@ class DatabaseManager:
         result = cursor.fetchone()
         current_version = result[0] if result else 0
         
-        # 执行必要的schema更新
-        if current_version < 1:
-            self._create_tables_v1()
-            cursor.execute("INSERT INTO db_version (version) VALUES (1)")
-            self.conn.commit()
         # 添加版本回滚机制
-        elif current_version > 1:  
+        if current_version > self.SCHEMA_VERSION:
             raise ValueError("检测到新版数据库，请升级客户端")
         
-        # 未来版本更新可以这样添加
-        # if current_version < 2:
-        #     self._update_schema_v2()
-        #     cursor.execute("INSERT INTO db_version (version) VALUES (2)")
-        #     self.conn.commit()
+        # 按版本顺序执行必要的schema更新
+        migrations = {
+            1: self._create_tables_v1,
+            2: self._update_schema_v2,
+            3: self._update_schema_v3,
+            4: self._update_schema_v4,
+            5: self._update_schema_v5,
+            6: self._update_schema_v6,
+            7: self._update_schema_v7,
+            8: self._update_schema_v8,
+        }
+        for version in range(current_version + 1, self.SCHEMA_VERSION + 1):
+            migrations[version]()
+            cursor.execute("INSERT INTO db_version (version) VALUES (?)", (version,))
+            self.conn.commit()
 
     def _create_tables_v1(self):
         """创建初始表结构（版本1）"""
@@ -133,7 +182,468 @@ class DatabaseManager:
         
         self.conn.commit()
 
+    def _update_schema_v2(self):
+        """版本2：导出时按章节缓存渲染结果"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS export_fragments (
+            project_id INTEGER NOT NULL,
+            chapter_index INTEGER NOT NULL,
+            format TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            fragment BLOB NOT NULL,
+            PRIMARY KEY (project_id, chapter_index, format),
+            FOREIGN KEY(project_id) REFERENCES projects(id) ON DELETE CASCADE
+        )
+        """)
+        # 查询每章最新版本时使用
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_chapter_latest ON chapters(project_id, chapter_index, id)")
+        self.conn.commit()
+
+    def _update_schema_v3(self):
+        """版本3：章节字数和项目汇总列，由触发器增量维护"""
+        cursor = self.conn.cursor()
+        cursor.execute("ALTER TABLE chapters ADD COLUMN char_count INTEGER NOT NULL DEFAULT 0")
+        cursor.execute("ALTER TABLE projects ADD COLUMN chapter_count INTEGER NOT NULL DEFAULT 0")
+        cursor.execute("ALTER TABLE projects ADD COLUMN word_count INTEGER NOT NULL DEFAULT 0")
+
+        # 覆盖索引：读取章节元数据和触发器查询时无需访问正文所在的数据页
+        cursor.execute("DROP INDEX IF EXISTS idx_chapter_latest")
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_chapter_meta
+        ON chapters(project_id, chapter_index, id, char_count, status, title)
+        """)
+
+        # 回填已有数据
+        cursor.execute("UPDATE chapters SET char_count = COALESCE(length(content), 0)")
+        cursor.execute("""
+        UPDATE projects SET
+            chapter_count = (SELECT COUNT(DISTINCT chapter_index) FROM chapters WHERE project_id = projects.id),
+            word_count = COALESCE((
+                SELECT SUM(char_count) FROM chapters WHERE id IN (
+                    SELECT MAX(id) FROM chapters WHERE project_id = projects.id GROUP BY chapter_index
+                )
+            ), 0)
+        """)
+
+        # 每章以最新版本（id最大）计入项目汇总
+        cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_chapters_insert_count AFTER INSERT ON chapters
+        BEGIN
+            UPDATE projects SET
+                word_count = word_count + NEW.char_count - COALESCE((
+                    SELECT char_count FROM chapters
+                    WHERE project_id = NEW.project_id AND chapter_index = NEW.chapter_index AND id < NEW.id
+                    ORDER BY id DESC LIMIT 1
+                ), 0),
+                chapter_count = chapter_count + NOT EXISTS (
+                    SELECT 1 FROM chapters
+                    WHERE project_id = NEW.project_id AND chapter_index = NEW.chapter_index AND id < NEW.id
+                )
+            WHERE id = NEW.project_id;
+        END
+        """)
+        cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_chapters_delete_count AFTER DELETE ON chapters
+        WHEN NOT EXISTS (
+            SELECT 1 FROM chapters
+            WHERE project_id = OLD.project_id AND chapter_index = OLD.chapter_index AND id > OLD.id
+        )
+        BEGIN
+            UPDATE projects SET
+                word_count = word_count - OLD.char_count + COALESCE((
+                    SELECT char_count FROM chapters
+                    WHERE project_id = OLD.project_id AND chapter_index = OLD.chapter_index
+                    ORDER BY id DESC LIMIT 1
+                ), 0),
+                chapter_count = chapter_count - NOT EXISTS (
+                    SELECT 1 FROM chapters
+                    WHERE project_id = OLD.project_id AND chapter_index = OLD.chapter_index
+                )
+            WHERE id = OLD.project_id;
+        END
+        """)
+        cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_chapters_update_count AFTER UPDATE OF char_count ON chapters
+        WHEN NOT EXISTS (
+            SELECT 1 FROM chapters
+            WHERE project_id = NEW.project_id AND chapter_index = NEW.chapter_index AND id > NEW.id
+        )
+        BEGIN
+            UPDATE projects SET word_count = word_count + NEW.char_count - OLD.char_count
+            WHERE id = NEW.project_id;
+        END
+        """)
+        self.conn.commit()
+
+    def _update_schema_v4(self):
+        """版本4：章节状态计数、token消耗和每日写作进度统计"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chapter_status_counts (
+            project_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            chapter_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (project_id, status)
+        )
+        """)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS project_stats (
+            project_id INTEGER PRIMARY KEY,
+            prompt_tokens INTEGER NOT NULL DEFAULT 0,
+            completion_tokens INTEGER NOT NULL DEFAULT 0,
+            llm_calls INTEGER NOT NULL DEFAULT 0
+        )
+        """)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS writing_progress (
+            project_id INTEGER NOT NULL,
+            day DATE NOT NULL,
+            chars_added INTEGER NOT NULL DEFAULT 0,
+            chapters_saved INTEGER NOT NULL DEFAULT 0,
+            prompt_tokens INTEGER NOT NULL DEFAULT 0,
+            completion_tokens INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (project_id, day)
+        )
+        """)
+
+        # 回填已有数据，历史进度按章节最后修改日期近似统计
+        cursor.execute("""
+        INSERT INTO chapter_status_counts (project_id, status, chapter_count)
+        SELECT project_id, status, COUNT(*) FROM chapters
+        WHERE id IN (SELECT MAX(id) FROM chapters GROUP BY project_id, chapter_index)
+        GROUP BY project_id, status
+        """)
+        cursor.execute("""
+        INSERT INTO writing_progress (project_id, day, chars_added, chapters_saved)
+        SELECT project_id, date(last_modified, 'localtime'), SUM(char_count), COUNT(*)
+        FROM chapters GROUP BY project_id, date(last_modified, 'localtime')
+        """)
+
+        # 章节状态以每章最新版本为准
+        cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_chapters_insert_status AFTER INSERT ON chapters
+        BEGIN
+            UPDATE chapter_status_counts SET chapter_count = chapter_count - 1
+            WHERE project_id = NEW.project_id AND status = (
+                SELECT status FROM chapters
+                WHERE project_id = NEW.project_id AND chapter_index = NEW.chapter_index AND id < NEW.id
+                ORDER BY id DESC LIMIT 1
+            );
+            INSERT INTO chapter_status_counts (project_id, status, chapter_count)
+            VALUES (NEW.project_id, NEW.status, 1)
+            ON CONFLICT (project_id, status) DO UPDATE SET chapter_count = chapter_count + 1;
+            INSERT INTO writing_progress (project_id, day, chars_added, chapters_saved)
+            VALUES (
+                NEW.project_id, date('now', 'localtime'),
+                NEW.char_count - COALESCE((
+                    SELECT char_count FROM chapters
+                    WHERE project_id = NEW.project_id AND chapter_index = NEW.chapter_index AND id < NEW.id
+                    ORDER BY id DESC LIMIT 1
+                ), 0),
+                1
+            )
+            ON CONFLICT (project_id, day) DO UPDATE SET
+                chars_added = chars_added + excluded.chars_added,
+                chapters_saved = chapters_saved + 1;
+        END
+        """)
+        cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_chapters_delete_status AFTER DELETE ON chapters
+        WHEN NOT EXISTS (
+            SELECT 1 FROM chapters
+            WHERE project_id = OLD.project_id AND chapter_index = OLD.chapter_index AND id > OLD.id
+        )
+        BEGIN
+            UPDATE chapter_status_counts SET chapter_count = chapter_count - 1
+            WHERE project_id = OLD.project_id AND status = OLD.status;
+            UPDATE chapter_status_counts SET chapter_count = chapter_count + 1
+            WHERE project_id = OLD.project_id AND status = (
+                SELECT status FROM chapters
+                WHERE project_id = OLD.project_id AND chapter_index = OLD.chapter_index
+                ORDER BY id DESC LIMIT 1
+            );
+        END
+        """)
+        cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_chapters_update_status AFTER UPDATE OF status ON chapters
+        WHEN NOT EXISTS (
+            SELECT 1 FROM chapters
+            WHERE project_id = NEW.project_id AND chapter_index = NEW.chapter_index AND id > NEW.id
+        )
+        BEGIN
+            UPDATE chapter_status_counts SET chapter_count = chapter_count - 1
+            WHERE project_id = OLD.project_id AND status = OLD.status;
+            INSERT INTO chapter_status_counts (project_id, status, chapter_count)
+            VALUES (NEW.project_id, NEW.status, 1)
+            ON CONFLICT (project_id, status) DO UPDATE SET chapter_count = chapter_count + 1;
+        END
+        """)
+        self.conn.commit()
+
+    def _update_schema_v5(self):
+        """版本5：压缩字典和LLM原始响应，正文类字段可存为压缩后的BLOB"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS compression_dicts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            algorithm TEXT NOT NULL,
+            data BLOB NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS llm_responses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id INTEGER NOT NULL,
+            task TEXT NOT NULL,
+            model TEXT,
+            prompt_hash TEXT,
+            response BLOB,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(project_id) REFERENCES projects(id) ON DELETE CASCADE
+        )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_response_project ON llm_responses(project_id, task)")
+        self.conn.commit()
+
+    def _update_schema_v6(self):
+        """版本6：角色一致性检查的逐章抽取缓存"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS consistency_extractions (
+            project_id INTEGER NOT NULL,
+            chapter_index INTEGER NOT NULL,
+            chapter_id INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            signature TEXT NOT NULL,
+            facts TEXT NOT NULL,
+            PRIMARY KEY (project_id, chapter_index),
+            FOREIGN KEY(project_id) REFERENCES projects(id) ON DELETE CASCADE
+        )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_review_project ON reviews(project_id, review_type)")
+        self.conn.commit()
+
+    def _update_schema_v7(self):
+        """版本7：编辑器草稿（片段表增量）和锚定在正文上的审核批注"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chapter_drafts (
+            project_id INTEGER NOT NULL,
+            chapter_index INTEGER NOT NULL,
+            base_id INTEGER NOT NULL,
+            pieces TEXT NOT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (project_id, chapter_index),
+            FOREIGN KEY(project_id) REFERENCES projects(id) ON DELETE CASCADE
+        )
+        """)
+        # 草稿追加缓冲区按保存批次分段存储，每次只写入新增部分
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chapter_draft_chunks (
+            project_id INTEGER NOT NULL,
+            chapter_index INTEGER NOT NULL,
+            added_offset INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            PRIMARY KEY (project_id, chapter_index, added_offset),
+            FOREIGN KEY(project_id) REFERENCES projects(id) ON DELETE CASCADE
+        )
+        """)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS annotations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id INTEGER NOT NULL,
+            chapter_index INTEGER NOT NULL,
+            chapter_id INTEGER NOT NULL,
+            review_id INTEGER,
+            start_pos INTEGER NOT NULL,
+            end_pos INTEGER NOT NULL,
+            note TEXT,
+            FOREIGN KEY(project_id) REFERENCES projects(id) ON DELETE CASCADE
+        )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_annotation_chapter ON annotations(project_id, chapter_index)")
+        self.conn.commit()
+
+    def _update_schema_v8(self):
+        """版本8：角色一致性检查的LLM确认结果，同一疑似矛盾不重复询问"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS consistency_verdicts (
+            project_id INTEGER NOT NULL,
+            verdict_key TEXT NOT NULL,
+            consistent INTEGER NOT NULL,
+            reason TEXT,
+            checked_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (project_id, verdict_key),
+            FOREIGN KEY(project_id) REFERENCES projects(id) ON DELETE CASCADE
+        )
+        """)
+        self.conn.commit()
+
+    # 压缩相关操作
+    @property
+    def compression_enabled(self) -> bool:
+        """当前配置下写入的数据是否压缩"""
+        return self._compressor.enabled
+
+    def _build_compressor(self, storage) -> Compressor:
+        """按配置创建压缩器，启用字典时使用该算法最新训练的字典"""
+        compressor = Compressor(storage.compression, storage.level, storage.min_size,
+                                dictionary_loader=self._load_compression_dict)
+        if compressor.enabled and storage.use_dictionary:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+            SELECT id, data FROM compression_dicts WHERE algorithm = ? ORDER BY id DESC LIMIT 1
+            """, (compressor.algorithm,))
+            row = cursor.fetchone()
+            if row:
+                compressor.dictionary_id = row[0]
+                compressor.dictionaries[row[0]] = row[1]
+        return compressor
+
+    def _load_compression_dict(self, dictionary_id: int) -> Optional[bytes]:
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT data FROM compression_dicts WHERE id = ?", (dictionary_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def _apply_storage_config(self, config):
+        """配置热加载后按新的压缩配置写入，已有数据由重新压缩任务处理"""
+        self._compressor = self._build_compressor(config.settings.storage)
+
+    def reload_compressor(self):
+        """
+        其他连接训练出新字典后调用，可在任意线程调用
+        只做标记，下次写入前在本连接所在线程中重新读取字典
+        """
+        self._compressor_stale = True
+
+    def _encode(self, text):
+        if self._compressor_stale:
+            self._compressor_stale = False
+            self._compressor = self._build_compressor(self.config.settings.storage)
+        return self._compressor.compress(text)
+
+    def _decode(self, value):
+        return self._compressor.decompress(value)
+
+    @traced(category='db')
+    def train_compression_dictionary(self, sample_limit: int = 200, sample_chars: int = 4000) -> Optional[int]:
+        """
+        用最近的章节正文训练共享压缩字典，之后的写入使用新字典
+        :return: 字典ID，未启用压缩或样本不足时返回None
+        """
+        storage = self.config.settings.storage
+        if not self._compressor.enabled or not storage.use_dictionary:
+            return None
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT content FROM chapters ORDER BY id DESC LIMIT ?", (sample_limit,))
+        samples = [(self._decode(row[0]) or "")[:sample_chars] for row in cursor.fetchall()]
+        if len(samples) < 8:
+            return None
+        dictionary = train_dictionary(samples, self._compressor.algorithm, storage.dictionary_size)
+        if not dictionary:
+            return None
+        cursor.execute("""
+        INSERT INTO compression_dicts (algorithm, data) VALUES (?, ?)
+        """, (self._compressor.algorithm, dictionary))
+        # 压缩值头部只能记录2字节的字典ID
+        if cursor.lastrowid > MAX_DICTIONARY_ID:
+            self.conn.rollback()
+            raise ValueError(f"压缩字典数量超过上限{MAX_DICTIONARY_ID}")
+        self.conn.commit()
+        self._compressor.dictionary_id = cursor.lastrowid
+        self._compressor.dictionaries[cursor.lastrowid] = dictionary
+        return cursor.lastrowid
+
+    @traced(category='db')
+    def recompress(self, batch_size: int = 200, stop_event=None) -> int:
+        """
+        按当前压缩配置重写已有数据：未压缩的行被压缩，旧算法或旧字典的行用新配置重新压缩，
+        关闭压缩时解压回文本。每批提交一次，避免长时间占用写锁
+        :param stop_event: threading.Event，置位后在下一批前停止
+        :return: 重写的行数
+        """
+        header = self._compressor.header() if self._compressor.enabled else None
+        rewritten = 0
+        for table, column in (('chapters', 'content'), ('outlines', 'content'), ('llm_responses', 'response')):
+            last_id = 0
+            while stop_event is None or not stop_event.is_set():
+                cursor = self.conn.cursor()
+                cursor.execute(f"""
+                SELECT id, {column} FROM {table} WHERE id > ? ORDER BY id LIMIT ?
+                """, (last_id, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+
+                updates = []
+                for row_id, value in rows:
+                    if value is None or (header and isinstance(value, bytes) and value.startswith(header)):
+                        continue
+                    encoded = self._encode(self._decode(value))
+                    if encoded != value:
+                        updates.append((encoded, row_id))
+                if updates:
+                    cursor.executemany(f"UPDATE {table} SET {column} = ? WHERE id = ?", updates)
+                    self.conn.commit()
+                    rewritten += len(updates)
+        return rewritten
+
+    def storage_stats(self) -> Dict[str, Dict]:
+        """各正文字段的存储字节数和压缩行数"""
+        cursor = self.conn.cursor()
+        stats = {}
+        for table, column in (('chapters', 'content'), ('outlines', 'content'), ('llm_responses', 'response')):
+            cursor.execute(f"""
+            SELECT COUNT(*), COALESCE(SUM(length(CAST({column} AS BLOB))), 0),
+                   COALESCE(SUM(typeof({column}) = 'blob'), 0)
+            FROM {table}
+            """)
+            rows, stored_bytes, compressed_rows = cursor.fetchone()
+            stats[f"{table}.{column}"] = {'rows': rows, 'bytes': stored_bytes, 'compressed_rows': compressed_rows}
+        return stats
+
+    # 缓存相关操作
+    def _resize_caches(self, config):
+        """配置热加载后调整缓存大小"""
+        cache_settings = config.settings.cache
+        self._project_cache.resize(cache_settings.projects)
+        self._outline_cache.resize(cache_settings.outlines)
+        self._chapter_cache.resize(cache_settings.chapters)
+        self._chapter_meta_cache.resize(cache_settings.chapter_metadata)
+
+    def _invalidate_chapters(self, project_id: int, chapter_index: Optional[int] = None):
+        """章节写入后失效章节、章节元数据和项目行（项目汇总列由触发器更新）"""
+        if chapter_index is None:
+            self._chapter_cache.invalidate_where(lambda key: key[0] == project_id)
+        else:
+            self._chapter_cache.invalidate((project_id, chapter_index))
+        self._chapter_meta_cache.invalidate(project_id)
+        self._project_cache.invalidate(project_id)
+
+    def clear_caches(self):
+        """清空全部读缓存并重新加载压缩字典，数据库文件被外部替换（如从快照恢复）后调用"""
+        self._project_cache.clear()
+        self._outline_cache.clear()
+        self._chapter_cache.clear()
+        self._chapter_meta_cache.clear()
+        self._compressor = self._build_compressor(self.config.settings.storage)
+
+    def cache_stats(self) -> Dict[str, Dict]:
+        """各读缓存的命中统计，用于调整缓存大小"""
+        return {
+            'projects': self._project_cache.stats(),
+            'outlines': self._outline_cache.stats(),
+            'chapters': self._chapter_cache.stats(),
+            'chapter_metadata': self._chapter_meta_cache.stats()
+        }
+
     # 项目相关操作
+    @traced(category='db')
     def create_project(self, name: str, author: str, theme: str, style: str, topic: str) -> int:
         """创建新项目"""
         cursor = self.conn.cursor()
@@ -142,10 +652,15 @@ class DatabaseManager:
         VALUES (?, ?, ?, ?, ?)
         """, (name, author, theme, style, topic))
         self.conn.commit()
+        self._project_cache.invalidate(cursor.lastrowid)
         return cursor.lastrowid
 
     def get_project(self, project_id: int) -> Optional[Dict]:
-        """获取项目详情"""
+        """获取项目详情（带缓存）"""
+        return self._project_cache.get_or_load(project_id, lambda: self._load_project(project_id))
+
+    @traced(category='db')
+    def _load_project(self, project_id: int) -> Optional[Dict]:
         cursor = self.conn.cursor()
         cursor.execute("SELECT * FROM projects WHERE id = ?", (project_id,))
         row = cursor.fetchone()
@@ -153,6 +668,26 @@ class DatabaseManager:
             return dict(zip([col[0] for col in cursor.description], row))
         return None
 
+    @traced(category='db')
+    def list_projects(self, offset: int = 0, limit: int = 20) -> List[Dict]:
+        """分页获取项目列表，章节数和字数来自预计算列"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        SELECT id, name, author, status, last_modified, chapter_count, word_count
+        FROM projects
+        ORDER BY last_modified DESC, id DESC
+        LIMIT ? OFFSET ?
+        """, (limit, offset))
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def count_projects(self) -> int:
+        """获取项目总数"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM projects")
+        return cursor.fetchone()[0]
+
+    @traced(category='db')
     def update_project(self, project_id: int, **kwargs) -> bool:
         """更新项目信息"""
         if not kwargs:
@@ -179,11 +714,13 @@ class DatabaseManager:
                 WHERE id = ?
             """, values)
             self.conn.commit()
+            self._project_cache.invalidate(project_id)
             return cursor.rowcount > 0
         except sqlite3.Error as e:
             print(f"更新项目失败: {e}")
             return False
 
+    @traced(category='db')
     def delete_project(self, project_id: int) -> bool:
         """删除项目及其所有相关数据"""
         try:
@@ -196,11 +733,23 @@ class DatabaseManager:
             cursor.execute("DELETE FROM chapters WHERE project_id = ?", (project_id,))
             cursor.execute("DELETE FROM characters WHERE project_id = ?", (project_id,))
             cursor.execute("DELETE FROM reviews WHERE project_id = ?", (project_id,))
+            cursor.execute("DELETE FROM export_fragments WHERE project_id = ?", (project_id,))
+            cursor.execute("DELETE FROM chapter_status_counts WHERE project_id = ?", (project_id,))
+            cursor.execute("DELETE FROM project_stats WHERE project_id = ?", (project_id,))
+            cursor.execute("DELETE FROM writing_progress WHERE project_id = ?", (project_id,))
+            cursor.execute("DELETE FROM llm_responses WHERE project_id = ?", (project_id,))
+            cursor.execute("DELETE FROM consistency_extractions WHERE project_id = ?", (project_id,))
+            cursor.execute("DELETE FROM consistency_verdicts WHERE project_id = ?", (project_id,))
+            cursor.execute("DELETE FROM chapter_drafts WHERE project_id = ?", (project_id,))
+            cursor.execute("DELETE FROM chapter_draft_chunks WHERE project_id = ?", (project_id,))
+            cursor.execute("DELETE FROM annotations WHERE project_id = ?", (project_id,))
             
             # 删除项目
             cursor.execute("DELETE FROM projects WHERE id = ?", (project_id,))
             
             self.conn.commit()
+            self._invalidate_chapters(project_id)
+            self._outline_cache.invalidate(project_id)
             return cursor.rowcount > 0
         except sqlite3.Error as e:
             self.conn.rollback()
@@ -208,57 +757,497 @@ class DatabaseManager:
             return False
 
     # 大纲相关操作
+    @traced(category='db')
     def save_outline(self, project_id: int, content: Dict) -> int:
         """保存大纲"""
         cursor = self.conn.cursor()
         cursor.execute("""
         INSERT INTO outlines (project_id, content)
         VALUES (?, ?)
-        """, (project_id, json.dumps(content)))
+        """, (project_id, self._encode(json.dumps(content))))
         self.conn.commit()
+        self._outline_cache.invalidate(project_id)
         return cursor.lastrowid
 
     def get_latest_outline(self, project_id: int) -> Optional[Dict]:
-        """获取项目最新大纲"""
+        """获取项目最新大纲（带缓存，避免重复解析JSON）"""
+        return self._outline_cache.get_or_load(project_id, lambda: self._load_latest_outline(project_id))
+
+    @traced(category='db')
+    def _load_latest_outline(self, project_id: int) -> Optional[Dict]:
         cursor = self.conn.cursor()
         cursor.execute("""
         SELECT content FROM outlines 
         WHERE project_id = ?
-        ORDER BY created_at DESC
+        ORDER BY created_at DESC, id DESC
         LIMIT 1
         """, (project_id,))
         result = cursor.fetchone()
-        return json.loads(result[0]) if result else None
+        return json.loads(self._decode(result[0])) if result else None
 
     # 章节相关操作
-    def save_chapter(self, project_id: int, chapter_index: int, content: str, title: str = None) -> int:
-        """保存章节内容"""
+    @traced(category='db')
+    def save_chapter(self, project_id: int, chapter_index: int, content: str, title: str = None,
+                     status: str = None) -> int:
+        """
+        保存章节内容（新增一个版本）
+        :param status: 章节状态，未指定时沿用上一版本，首个版本为待审核
+        """
+        if status is not None and status not in self.CHAPTER_STATUSES:
+            raise ValueError(f"无效的章节状态: {status}")
         cursor = self.conn.cursor()
         cursor.execute("""
-        INSERT INTO chapters (project_id, chapter_index, title, content)
-        VALUES (?, ?, ?, ?)
-        """, (project_id, chapter_index, title, content))
+        INSERT INTO chapters (project_id, chapter_index, title, content, char_count, status)
+        VALUES (?, ?, ?, ?, ?, COALESCE(?, (
+            SELECT status FROM chapters WHERE project_id = ? AND chapter_index = ?
+            ORDER BY id DESC LIMIT 1
+        ), 'pending_review'))
+        """, (project_id, chapter_index, title, self._encode(content), len(content or ""), status,
+              project_id, chapter_index))
         self.conn.commit()
+        self._invalidate_chapters(project_id, chapter_index)
         return cursor.lastrowid
 
+    @traced(category='db')
+    def update_chapter_status(self, project_id: int, chapter_index: int, status: str) -> bool:
+        """更新章节最新版本的状态"""
+        if status not in self.CHAPTER_STATUSES:
+            raise ValueError(f"无效的章节状态: {status}")
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        UPDATE chapters SET status = ?
+        WHERE id = (
+            SELECT MAX(id) FROM chapters WHERE project_id = ? AND chapter_index = ?
+        )
+        """, (status, project_id, chapter_index))
+        self.conn.commit()
+        self._invalidate_chapters(project_id, chapter_index)
+        return cursor.rowcount > 0
+
     def get_chapter(self, project_id: int, chapter_index: int) -> Optional[Dict]:
-        """获取章节内容"""
+        """获取章节最新版本（带缓存）"""
+        return self._chapter_cache.get_or_load(
+            (project_id, chapter_index), lambda: self._load_chapter(project_id, chapter_index)
+        )
+
+    @traced(category='db')
+    def _load_chapter(self, project_id: int, chapter_index: int) -> Optional[Dict]:
         cursor = self.conn.cursor()
         cursor.execute("""
         SELECT * FROM chapters 
         WHERE project_id = ? AND chapter_index = ?
-        ORDER BY last_modified DESC
+        ORDER BY last_modified DESC, id DESC
         LIMIT 1
         """, (project_id, chapter_index))
         row = cursor.fetchone()
         if row:
-            return dict(zip([col[0] for col in cursor.description], row))
+            chapter = dict(zip([col[0] for col in cursor.description], row))
+            chapter['content'] = self._decode(chapter['content'])
+            return chapter
         return None
 
+    @traced(category='db')
+    def bulk_insert_chapters(self, project_id: int, chapters: Iterable[Tuple[int, Optional[str], str]],
+                             status: str = 'not_started', record_progress: bool = True) -> int:
+        """
+        在单个事务中批量插入章节，chapters 可以是生成器以便流式导入
+        :param chapters: (章节序号, 标题, 内容) 的迭代器
+        :param record_progress: 为False时（如导入已有书稿）插入的章节不计入写作进度
+        :return: 插入的章节数
+        """
+        count = 0
+
+        def rows():
+            nonlocal count
+            for chapter_index, title, content in chapters:
+                count += 1
+                yield project_id, chapter_index, title, self._encode(content), len(content or ""), status
+
+        try:
+            cursor = self.conn.cursor()
+            if not record_progress:
+                cursor.execute("""
+                SELECT day, chars_added, chapters_saved FROM writing_progress WHERE project_id = ?
+                """, (project_id,))
+                progress = {day: (chars, chapters) for day, chars, chapters in cursor.fetchall()}
+            cursor.executemany("""
+            INSERT INTO chapters (project_id, chapter_index, title, content, char_count, status)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """, rows())
+            if not record_progress:
+                # 撤销触发器为这些章节累加的写作进度，恢复为插入前的值
+                cursor.execute("SELECT day FROM writing_progress WHERE project_id = ?", (project_id,))
+                cursor.executemany("""
+                UPDATE writing_progress SET chars_added = ?, chapters_saved = ? WHERE project_id = ? AND day = ?
+                """, [(*progress.get(day, (0, 0)), project_id, day) for day, in cursor.fetchall()])
+                cursor.execute("""
+                DELETE FROM writing_progress
+                WHERE project_id = ? AND chars_added = 0 AND chapters_saved = 0
+                AND prompt_tokens = 0 AND completion_tokens = 0
+                """, (project_id,))
+            self.conn.commit()
+            self._invalidate_chapters(project_id)
+            return count
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
+    def get_chapter_metadata(self, project_id: int) -> List[Dict]:
+        """获取每章最新版本的元数据（不含正文，带缓存）"""
+        return self._chapter_meta_cache.get_or_load(project_id, lambda: self._load_chapter_metadata(project_id))
+
+    @traced(category='db')
+    def _load_chapter_metadata(self, project_id: int) -> List[Dict]:
+        """仅通过覆盖索引读取章节元数据"""
+        cursor = self.conn.cursor()
+        # SQLite中与MAX()同时查询的列取自最大值所在行，即每章最新版本
+        cursor.execute("""
+        SELECT MAX(id) AS id, chapter_index, title, status, char_count
+        FROM chapters
+        WHERE project_id = ?
+        GROUP BY chapter_index
+        ORDER BY chapter_index
+        """, (project_id,))
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def iter_latest_chapters(self, project_id: int, batch_size: int = 50) -> Iterator[Dict]:
+        """按章节序号逐章返回每章最新版本，分批读取避免一次载入全书"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        SELECT id, chapter_index, title, content, status FROM chapters
+        WHERE id IN (
+            SELECT MAX(id) FROM chapters WHERE project_id = ? GROUP BY chapter_index
+        )
+        ORDER BY chapter_index
+        """, (project_id,))
+        columns = [col[0] for col in cursor.description]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                chapter = dict(zip(columns, row))
+                chapter['content'] = self._decode(chapter['content'])
+                yield chapter
+
+    # 编辑器草稿与批注
+    def get_chapter_draft(self, project_id: int, chapter_index: int) -> Optional[Dict]:
+        """
+        获取章节的未保存草稿
+        :return: {'base_id': 草稿所基于的章节版本ID, 'added': 追加缓冲区, 'pieces': 片段列表}，没有草稿时返回None
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        SELECT base_id, pieces FROM chapter_drafts WHERE project_id = ? AND chapter_index = ?
+        """, (project_id, chapter_index))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        cursor.execute("""
+        SELECT text FROM chapter_draft_chunks WHERE project_id = ? AND chapter_index = ?
+        ORDER BY added_offset
+        """, (project_id, chapter_index))
+        return {
+            'base_id': row[0],
+            'added': "".join(chunk for chunk, in cursor.fetchall()),
+            'pieces': json.loads(row[1])
+        }
+
+    @traced(category='db')
+    def save_chapter_draft(self, project_id: int, chapter_index: int, base_id: int, added_offset: int,
+                           added_text: str, pieces: List, annotations: Iterable[Tuple] = ()):
+        """
+        增量保存草稿：只写入追加缓冲区从 added_offset 开始的新增文字和当前片段列表
+        :param annotations: 草稿正文上的批注，(review_id, 起始, 结束, 备注) 的迭代器
+        """
+        cursor = self.conn.cursor()
+        if added_offset == 0:
+            # 新草稿，清除基于旧版本的分段
+            cursor.execute("DELETE FROM chapter_draft_chunks WHERE project_id = ? AND chapter_index = ?",
+                           (project_id, chapter_index))
+        if added_text:
+            cursor.execute("""
+            INSERT OR REPLACE INTO chapter_draft_chunks (project_id, chapter_index, added_offset, text)
+            VALUES (?, ?, ?, ?)
+            """, (project_id, chapter_index, added_offset, added_text))
+        cursor.execute("""
+        INSERT OR REPLACE INTO chapter_drafts (project_id, chapter_index, base_id, pieces, updated_at)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (project_id, chapter_index, base_id, json.dumps(pieces, separators=(',', ':'))))
+        self._replace_annotations(cursor, project_id, chapter_index, base_id, annotations)
+        self.conn.commit()
+
+    def delete_chapter_draft(self, project_id: int, chapter_index: int):
+        cursor = self.conn.cursor()
+        cursor.execute("DELETE FROM chapter_drafts WHERE project_id = ? AND chapter_index = ?",
+                       (project_id, chapter_index))
+        cursor.execute("DELETE FROM chapter_draft_chunks WHERE project_id = ? AND chapter_index = ?",
+                       (project_id, chapter_index))
+        self.conn.commit()
+
+    def get_annotations(self, project_id: int, chapter_index: int, chapter_id: int) -> List[Dict]:
+        """获取锚定在指定章节版本（或基于该版本的草稿）上的批注"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        SELECT id, review_id, start_pos, end_pos, note FROM annotations
+        WHERE project_id = ? AND chapter_index = ? AND chapter_id = ?
+        ORDER BY start_pos
+        """, (project_id, chapter_index, chapter_id))
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def save_annotations(self, project_id: int, chapter_index: int, chapter_id: int,
+                         annotations: Iterable[Tuple]):
+        """
+        替换章节的全部批注
+        :param annotations: (review_id, 起始, 结束, 备注) 的迭代器
+        """
+        cursor = self.conn.cursor()
+        self._replace_annotations(cursor, project_id, chapter_index, chapter_id, annotations)
+        self.conn.commit()
+
+    def _replace_annotations(self, cursor, project_id, chapter_index, chapter_id, annotations):
+        cursor.execute("DELETE FROM annotations WHERE project_id = ? AND chapter_index = ?",
+                       (project_id, chapter_index))
+        cursor.executemany("""
+        INSERT INTO annotations (project_id, chapter_index, chapter_id, review_id, start_pos, end_pos, note)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, ((project_id, chapter_index, chapter_id) + tuple(annotation) for annotation in annotations))
+
+    # 统计相关操作
+    @traced(category='db')
+    def record_token_usage(self, project_id: int, prompt_tokens: int, completion_tokens: int):
+        """累计项目和当日的token消耗"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        INSERT INTO project_stats (project_id, prompt_tokens, completion_tokens, llm_calls)
+        VALUES (?, ?, ?, 1)
+        ON CONFLICT (project_id) DO UPDATE SET
+            prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+            completion_tokens = completion_tokens + excluded.completion_tokens,
+            llm_calls = llm_calls + 1
+        """, (project_id, prompt_tokens, completion_tokens))
+        cursor.execute("""
+        INSERT INTO writing_progress (project_id, day, prompt_tokens, completion_tokens)
+        VALUES (?, date('now', 'localtime'), ?, ?)
+        ON CONFLICT (project_id, day) DO UPDATE SET
+            prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+            completion_tokens = completion_tokens + excluded.completion_tokens
+        """, (project_id, prompt_tokens, completion_tokens))
+        self.conn.commit()
+
+    @traced(category='db')
+    def get_project_stats(self, project_id: int) -> Optional[Dict]:
+        """获取项目汇总统计（均为预计算结果，不扫描章节正文）"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        SELECT p.chapter_count, p.word_count,
+               COALESCE(s.prompt_tokens, 0), COALESCE(s.completion_tokens, 0), COALESCE(s.llm_calls, 0)
+        FROM projects p LEFT JOIN project_stats s ON s.project_id = p.id
+        WHERE p.id = ?
+        """, (project_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        stats = dict(zip(['chapter_count', 'word_count', 'prompt_tokens', 'completion_tokens', 'llm_calls'], row))
+
+        cursor.execute("""
+        SELECT status, chapter_count FROM chapter_status_counts WHERE project_id = ?
+        """, (project_id,))
+        stats['status_counts'] = {status: 0 for status in self.CHAPTER_STATUSES}
+        stats['status_counts'].update(dict(cursor.fetchall()))
+        return stats
+
+    @traced(category='db')
+    def get_writing_progress(self, project_id: int, days: int = 14) -> List[Dict]:
+        """获取最近若干天的写作进度，按日期升序"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        SELECT day, chars_added, chapters_saved, prompt_tokens, completion_tokens
+        FROM writing_progress
+        WHERE project_id = ? AND day >= date('now', 'localtime', ?)
+        ORDER BY day
+        """, (project_id, f"-{days - 1} days"))
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    # 角色相关操作
+    @traced(category='db')
+    def bulk_insert_characters(self, project_id: int, characters: Iterable[Dict]) -> int:
+        """批量插入角色，字典键与characters表字段一致"""
+        fields = ('name', 'description', 'personality', 'appearance', 'background', 'relationships')
+        rows = [(project_id,) + tuple(c.get(f) for f in fields) for c in characters]
+        try:
+            cursor = self.conn.cursor()
+            cursor.executemany(f"""
+            INSERT INTO characters (project_id, {', '.join(fields)})
+            VALUES (?, {', '.join('?' for _ in fields)})
+            """, rows)
+            self.conn.commit()
+            return len(rows)
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
+    def get_characters(self, project_id: int) -> List[Dict]:
+        """获取项目的所有角色"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT * FROM characters WHERE project_id = ? ORDER BY id", (project_id,))
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    # 导出缓存相关操作
+    def get_export_fragment(self, project_id: int, chapter_index: int, fmt: str) -> Optional[Tuple[str, bytes]]:
+        """获取章节的已渲染片段，返回 (内容哈希, 片段)"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        SELECT content_hash, fragment FROM export_fragments
+        WHERE project_id = ? AND chapter_index = ? AND format = ?
+        """, (project_id, chapter_index, fmt))
+        return cursor.fetchone()
+
+    @traced(category='db')
+    def save_export_fragments(self, project_id: int, fragments: Iterable[Tuple[int, str, str, bytes]]):
+        """
+        在单个事务中保存章节的渲染片段
+        :param fragments: (章节序号, 格式, 内容哈希, 片段) 的迭代器
+        """
+        cursor = self.conn.cursor()
+        cursor.executemany("""
+        INSERT OR REPLACE INTO export_fragments (project_id, chapter_index, format, content_hash, fragment)
+        VALUES (?, ?, ?, ?, ?)
+        """, ((project_id, chapter_index, fmt, content_hash, fragment)
+              for chapter_index, fmt, content_hash, fragment in fragments))
+        self.conn.commit()
+
+    # 一致性检查相关操作
+    @traced(category='db')
+    def get_consistency_extractions(self, project_id: int) -> Dict[int, Dict]:
+        """获取项目各章的抽取缓存，键为章节序号"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        SELECT chapter_index, chapter_id, content_hash, signature, facts
+        FROM consistency_extractions WHERE project_id = ?
+        """, (project_id,))
+        return {
+            row[0]: {'chapter_id': row[1], 'content_hash': row[2], 'signature': row[3], 'facts': json.loads(row[4])}
+            for row in cursor.fetchall()
+        }
+
+    @traced(category='db')
+    def save_consistency_extractions(self, project_id: int, extractions: Iterable[Tuple[int, int, str, str, List]]):
+        """
+        批量保存抽取缓存
+        :param extractions: (章节序号, 章节版本ID, 内容哈希, 抽取签名, 事实列表) 的迭代器
+        """
+        cursor = self.conn.cursor()
+        cursor.executemany("""
+        INSERT OR REPLACE INTO consistency_extractions
+            (project_id, chapter_index, chapter_id, content_hash, signature, facts)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """, ((project_id, idx, chapter_id, content_hash, signature, json.dumps(facts, ensure_ascii=False))
+              for idx, chapter_id, content_hash, signature, facts in extractions))
+        self.conn.commit()
+
+    def get_consistency_verdicts(self, project_id: int) -> Dict[str, Tuple[bool, str]]:
+        """获取项目已有的LLM确认结果，键为疑似矛盾的哈希，值为 (是否一致, 理由)"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        SELECT verdict_key, consistent, reason FROM consistency_verdicts WHERE project_id = ?
+        """, (project_id,))
+        return {row[0]: (bool(row[1]), row[2] or "") for row in cursor.fetchall()}
+
+    @traced(category='db')
+    def save_consistency_verdicts(self, project_id: int, verdicts: Iterable[Tuple[str, bool, str]]):
+        """
+        批量保存LLM确认结果
+        :param verdicts: (疑似矛盾的哈希, 是否一致, 理由) 的迭代器
+        """
+        cursor = self.conn.cursor()
+        cursor.executemany("""
+        INSERT OR REPLACE INTO consistency_verdicts (project_id, verdict_key, consistent, reason)
+        VALUES (?, ?, ?, ?)
+        """, ((project_id, key, int(consistent), reason) for key, consistent, reason in verdicts))
+        self.conn.commit()
+
+    # 审核记录相关操作
+    def add_review(self, project_id: int, review_type: str, result: str, issues: Dict,
+                   suggestions: str = "", status: str = 'pending') -> int:
+        """添加审核记录，issues 以JSON保存"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        INSERT INTO reviews (project_id, review_type, result, issues, suggestions, status)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """, (project_id, review_type, result, json.dumps(issues, ensure_ascii=False), suggestions, status))
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def get_reviews(self, project_id: int, review_type: Optional[str] = None,
+                    status: Optional[str] = None) -> List[Dict]:
+        """获取审核记录，按时间倒序"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        SELECT * FROM reviews
+        WHERE project_id = ? AND (? IS NULL OR review_type = ?) AND (? IS NULL OR status = ?)
+        ORDER BY id DESC
+        """, (project_id, review_type, review_type, status, status))
+        columns = [col[0] for col in cursor.description]
+        reviews = []
+        for row in cursor.fetchall():
+            review = dict(zip(columns, row))
+            review['issues'] = json.loads(review['issues']) if review['issues'] else None
+            reviews.append(review)
+        return reviews
+
+    def update_review_status(self, review_id: int, status: str) -> bool:
+        cursor = self.conn.cursor()
+        cursor.execute("UPDATE reviews SET status = ? WHERE id = ?", (status, review_id))
+        self.conn.commit()
+        return cursor.rowcount > 0
+
+    def delete_reviews(self, review_ids: Iterable[int]):
+        cursor = self.conn.cursor()
+        review_ids = [(review_id,) for review_id in review_ids]
+        cursor.executemany("DELETE FROM reviews WHERE id = ?", review_ids)
+        cursor.executemany("DELETE FROM annotations WHERE review_id = ?", review_ids)
+        self.conn.commit()
+
+    # LLM原始响应
+    @traced(category='db')
+    def save_llm_response(self, project_id: int, task: str, model: str, prompt: str, response: str) -> int:
+        """保存LLM原始响应（压缩存储），用于排查生成问题"""
+        prompt_hash = hashlib.sha1(prompt.encode('utf-8')).hexdigest()
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        INSERT INTO llm_responses (project_id, task, model, prompt_hash, response)
+        VALUES (?, ?, ?, ?, ?)
+        """, (project_id, task, model, prompt_hash, self._encode(response)))
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def get_llm_responses(self, project_id: int, task: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """获取项目最近的LLM原始响应"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        SELECT id, task, model, prompt_hash, response, created_at FROM llm_responses
+        WHERE project_id = ? AND (? IS NULL OR task = ?)
+        ORDER BY id DESC LIMIT ?
+        """, (project_id, task, task, limit))
+        columns = [col[0] for col in cursor.description]
+        responses = []
+        for row in cursor.fetchall():
+            item = dict(zip(columns, row))
+            item['response'] = self._decode(item['response'])
+            responses.append(item)
+        return responses
+
     # 其他操作方法...
     
     def close(self):
         """关闭数据库连接"""
+        self.config.remove_listener(self._resize_caches)
+        self.config.remove_listener(self._apply_storage_config)
         self.conn.close()
 
     def __enter__(self):
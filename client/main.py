@@ -1,65 +1,323 @@
 import sys
-from PyQt5.QtWidgets import QApplication, QMainWindow, QTabWidget, QMessageBox
-from client.modules.outline_generator import OutlineGenerator, OutlineEditor
-from client.modules.content_generator import ContentGenerator, ContentEditor
-from client.database import DatabaseManager
-from client.config import ConfigManager
+import time
+from PyQt5.QtWidgets import QApplication, QMainWindow, QTabWidget, QMessageBox, QFileDialog
+from PyQt5.QtCore import QTimer
+from client.config import get_config
+from client import tracing
 
 class MainWindow(QMainWindow):
-    def __init__(self, db, config, parent=None):
+    def __init__(self, config, parent=None):
         super().__init__(parent)
         try:
             # 提前验证核心配置
-            assert config.get_openai_config().get('api_key'), "OpenAI API密钥未配置"
             assert config.get_generation_config('outline'), "大纲生成配置缺失"
             assert config.get_generation_config('content'), "内容生成配置缺失"
-            
-            self.db = db
+
             self.config = config
+            self.db = None
+            self.project_id = None
+            self.outline_gen = None
+            self.content_gen = None
+            self.recompression_job = None
+            self.backup_scheduler = None
             self.init_ui()
-            self.outline_gen = OutlineGenerator(self.db.conn)
-            self.content_gen = ContentGenerator(self.db.conn)
         except Exception as e:
             QMessageBox.critical(None, "启动失败", f"关键配置校验失败: {str(e)}")
             sys.exit(1)
-        
+
     def init_ui(self):
         self.setWindowTitle("小说创作助手")
         self.setGeometry(100, 100, 800, 600)
-        
+
         # 创建主界面
         self.tabs = QTabWidget()
         self.setCentralWidget(self.tabs)
-        
-        # 添加大纲编辑器
-        self.outline_editor = OutlineEditor(
-            project_id=1, 
-            db_conn=self.db.conn,
-            config=self.config
-        )
-        self.tabs.addTab(self.outline_editor, "大纲编辑")
-        
-        # 添加内容编辑器
-        self.content_editor = ContentEditor(project_id=1, chapter_index=1)
-        self.tabs.addTab(self.content_editor, "内容编辑")
-        
+
+        # 导入导出菜单
+        file_menu = self.menuBar().addMenu("文件")
+        file_menu.addAction("导入书稿...").triggered.connect(self.import_manuscript)
+        file_menu.addAction("立即备份").triggered.connect(self.backup_now)
+        file_menu.addAction("整理数据库...").triggered.connect(self.compact_database)
+        export_menu = file_menu.addMenu("导出")
+        for label, formats in [("Markdown", ["markdown"]), ("EPUB", ["epub"]), ("Word", ["docx"]),
+                               ("PDF", ["pdf"]), ("全部格式", ["markdown", "epub", "docx", "pdf"])]:
+            action = export_menu.addAction(label)
+            action.triggered.connect(lambda checked, f=formats: self.export_project(f))
+
+        # 审核菜单
+        review_menu = self.menuBar().addMenu("审核")
+        review_menu.addAction("检查角色一致性").triggered.connect(self.check_consistency)
+        review_menu.addAction("模型调用统计").triggered.connect(self.show_model_report)
+
+        # 调试菜单
+        debug_menu = self.menuBar().addMenu("调试")
+        trace_action = debug_menu.addAction("启用性能追踪")
+        trace_action.setCheckable(True)
+        trace_action.setChecked(tracing.is_enabled())
+        trace_action.toggled.connect(self.toggle_tracing)
+        debug_menu.addAction("导出追踪...").triggered.connect(self.export_trace)
+        debug_menu.addAction("追踪统计").triggered.connect(self.show_trace_summary)
+
         # 添加状态栏
-        self.statusBar().showMessage("就绪")
+        self.statusBar().showMessage("正在加载...")
+
+        # 窗口显示后再连接数据库和创建编辑器
+        QTimer.singleShot(0, self._deferred_init)
+
+        # 在主线程定时检查配置文件，热加载的回调（数据库、模型路由等）都在主线程执行
+        self.config_timer = QTimer(self)
+        self.config_timer.timeout.connect(self.check_config_changed)
+        self.config_timer.start(1000)
+
+    def check_config_changed(self):
+        """配置文件变化时重新加载，失败原因显示在状态栏"""
+        result = self.config.reload_if_changed()
+        if result is True:
+            self.statusBar().showMessage("配置已重新加载")
+        elif result is False:
+            self.statusBar().showMessage(f"配置重新加载失败：{self.config.last_error}")
+
+    def _deferred_init(self):
+        """延迟初始化：数据库schema检查、生成器和编辑器"""
+        try:
+            from client.database import DatabaseManager
+            from client.modules.outline_generator import OutlineGenerator, OutlineEditor
+            from client.modules.content_generator import ContentGenerator, ContentEditor
+            from client.modules.project_manager import ProjectManager, ProjectManagerView
+            from client.modules.progress_dashboard import ProgressDashboard
+
+            # 初始化数据库连接
+            self.db = DatabaseManager()
+            self.project_manager = ProjectManager(self.db)
+
+            # 每种生成器只创建一个实例，编辑器共享
+            self.outline_gen = OutlineGenerator(self.db)
+            self.content_gen = ContentGenerator(self.db)
+
+            project_id = self._recent_project_id()
+
+            # 添加项目管理
+            self.project_view = ProjectManagerView(self.project_manager)
+            self.project_view.project_selected.connect(self.switch_project)
+            self.project_view.project_deleted.connect(self.on_project_deleted)
+            self.tabs.addTab(self.project_view, "项目管理")
+
+            # 添加大纲编辑器
+            self.outline_editor = OutlineEditor(
+                project_id=project_id,
+                generator=self.outline_gen,
+                config=self.config
+            )
+            self.outline_editor.outline_saved.connect(self.on_project_changed)
+            self.tabs.addTab(self.outline_editor, "大纲编辑")
+
+            # 添加内容编辑器
+            self.content_editor = ContentEditor(project_id=project_id, chapter_index=1, db=self.db)
+            self.content_editor.chapter_saved.connect(self.on_project_changed)
+            self.content_editor.status_message.connect(self.statusBar().showMessage)
+            self.tabs.addTab(self.content_editor, "内容编辑")
+
+            # 添加写作进度面板
+            self.dashboard = ProgressDashboard(self.db)
+            self.tabs.addTab(self.dashboard, "写作进度")
+
+            self.switch_project(project_id)
+
+            # 按当前配置在后台压缩已有数据
+            if self.db.compression_enabled and self.db.db_path != ':memory:':
+                from client.compression import RecompressionJob
+                self.recompression_job = RecompressionJob(
+                    self.db.db_path, on_dictionary_trained=lambda _: self.db.reload_compressor())
+                self.recompression_job.start()
+
+            # 定时快照和空闲页回收
+            if self.db.db_path != ':memory:':
+                from client.backup import BackupManager, BackupScheduler
+                self.backup_scheduler = BackupScheduler(BackupManager(self.db.db_path))
+                self.backup_scheduler.start()
+        except Exception as e:
+            QMessageBox.critical(self, "启动失败", f"初始化失败: {str(e)}")
+            self.statusBar().showMessage("初始化失败")
+
+    @tracing.traced(category='gui')
+    def switch_project(self, project_id):
+        """切换当前项目，大纲和章节元数据优先使用缓存"""
+        start = time.perf_counter()
+        try:
+            context = self.project_manager.get_context(project_id)
+        except ValueError as e:
+            QMessageBox.warning(self, "切换失败", str(e))
+            return
+        self.project_id = project_id
+        self.outline_editor.set_project(project_id, context['outline'])
+        self.content_editor.set_project(project_id, context['chapters'])
+        self.dashboard.set_project(project_id, context['outline'])
+        elapsed = (time.perf_counter() - start) * 1000
+        self.setWindowTitle(f"小说创作助手 - {context['project']['name']}")
+        self.statusBar().showMessage(f"已打开《{context['project']['name']}》（{elapsed:.0f} ms）")
+
+    def _recent_project_id(self):
+        """最近修改的项目，没有项目时创建一个"""
+        recent, _ = self.project_manager.list_page(0, page_size=1)
+        return recent[0]['id'] if recent else self.project_manager.create_project("我的小说")
+
+    def on_project_deleted(self, project_id):
+        """删除的是当前项目时切换到最近修改的项目，编辑器不再指向已删除的项目"""
+        if project_id != self.project_id:
+            return
+        self.project_id = None
+        self.content_editor.discard_project()
+        self.switch_project(self._recent_project_id())
+        self.project_view.refresh()
+
+    def on_project_changed(self, project_id):
+        """项目数据写入后刷新项目列表和进度"""
+        self.project_view.refresh()
+        if project_id == self.project_id:
+            self.dashboard.refresh(self.project_manager.get_context(project_id)['outline'])
+
+    def import_manuscript(self):
+        """导入已有书稿为新项目"""
+        if self.db is None:
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "选择书稿", "", "书稿 (*.txt *.md *.docx)")
+        if not path:
+            return
+        try:
+            from client.modules.importer import ManuscriptImporter
+            self.statusBar().showMessage("正在导入...")
+            result = ManuscriptImporter(self.db).import_file(path, extract_characters=True)
+            self.project_view.refresh()
+            self.switch_project(result['project_id'])
+            QMessageBox.information(
+                self, "导入成功",
+                f"已导入{result['chapters']}个章节，识别{result['characters']}个角色"
+            )
+        except Exception as e:
+            QMessageBox.critical(self, "导入失败", f"导入书稿时发生错误：{str(e)}")
+        finally:
+            self.statusBar().showMessage("就绪")
+
+    def check_consistency(self):
+        """检查当前项目的角色一致性，结果写入审核记录"""
+        if self.project_id is None:
+            return
+        try:
+            from client.modules.consistency_checker import ConsistencyChecker
+            self.statusBar().showMessage("正在检查角色一致性...")
+            findings = ConsistencyChecker(self.db).check(self.project_id)
+            if findings:
+                QMessageBox.warning(self, "发现不一致",
+                                    "\n".join(ConsistencyChecker.describe(f) for f in findings[:20]))
+            else:
+                QMessageBox.information(self, "检查完成", "未发现角色设定前后矛盾")
+        except Exception as e:
+            QMessageBox.critical(self, "检查失败", f"检查时发生错误：{str(e)}")
+        finally:
+            self.statusBar().showMessage("就绪")
+
+    def show_model_report(self):
+        """显示本次运行中各模型层级的延迟和成本"""
+        from client.modules.model_router import get_router
+        lines = [
+            f"{r['tier']}（{r['model']}）：{r['calls']}次调用，失败{r['errors']}次，降级{r['fallbacks']}次，"
+            f"平均{r['avg_latency_ms']:.0f} ms，p95 {r['p95_latency_ms']:.0f} ms，"
+            f"{r['prompt_tokens'] + r['completion_tokens']} tokens，成本 {r['cost']:.4f}"
+            for r in get_router().report()
+        ]
+        QMessageBox.information(self, "模型调用统计", "\n".join(lines) or "尚未调用模型")
+
+    def backup_now(self):
+        """立即生成数据库快照"""
+        if self.backup_scheduler is None:
+            return
+        try:
+            self.statusBar().showMessage("正在备份...")
+            path = self.backup_scheduler.manager.snapshot()
+            QMessageBox.information(self, "备份成功", f"快照已保存到：{path}")
+        except Exception as e:
+            QMessageBox.critical(self, "备份失败", f"备份时发生错误：{str(e)}")
+        finally:
+            self.statusBar().showMessage("就绪")
+
+    def compact_database(self):
+        """回收空闲页；旧数据库需先经用户确认做一次完整VACUUM切换为增量模式"""
+        if self.backup_scheduler is None:
+            return
+        manager = self.backup_scheduler.manager
+        try:
+            if not manager.is_incremental():
+                reply = QMessageBox.question(
+                    self, "整理数据库",
+                    "当前数据库尚未启用增量回收，需要完整整理一次，期间无法保存，是否继续？"
+                )
+                if reply != QMessageBox.Yes:
+                    return
+                self.statusBar().showMessage("正在整理数据库...")
+                pages = manager.convert_to_incremental()
+            else:
+                self.statusBar().showMessage("正在整理数据库...")
+                pages = manager.compact()
+            QMessageBox.information(self, "整理完成", f"已回收{pages}个空闲页")
+        except Exception as e:
+            QMessageBox.critical(self, "整理失败", f"整理数据库时发生错误：{str(e)}")
+        finally:
+            self.statusBar().showMessage("就绪")
+
+    def toggle_tracing(self, enabled):
+        """开启或关闭性能追踪，开启时清空之前的记录"""
+        if enabled:
+            tracing.reset()
+            tracing.enable()
+            self.statusBar().showMessage("性能追踪已开启")
+        else:
+            tracing.disable()
+            self.statusBar().showMessage("性能追踪已关闭")
+
+    def export_trace(self):
+        """导出Chrome trace格式的追踪文件"""
+        path, _ = QFileDialog.getSaveFileName(self, "导出追踪", "trace.json", "Chrome Trace (*.json)")
+        if not path:
+            return
+        try:
+            count = tracing.export_chrome_trace(path)
+            QMessageBox.information(self, "导出成功", f"已导出{count}个事件，可在 chrome://tracing 或 Perfetto 中打开")
+        except OSError as e:
+            QMessageBox.critical(self, "导出失败", f"写入追踪文件失败：{str(e)}")
+
+    def show_trace_summary(self):
+        """按总耗时显示各span的p50/p95"""
+        rows = tracing.summary()
+        QMessageBox.information(self, "追踪统计", tracing.format_summary() if rows else "尚无追踪记录")
+
+    def export_project(self, formats):
+        """导出当前项目"""
+        if self.project_id is None:
+            return
+        output_dir = QFileDialog.getExistingDirectory(self, "选择导出目录", self.config.settings.export.output_dir)
+        if not output_dir:
+            return
+        try:
+            from client.modules.exporter import NovelExporter
+            self.statusBar().showMessage("正在导出...")
+            paths = NovelExporter(self.db).export_many(self.project_id, formats, output_dir)
+            QMessageBox.information(self, "导出成功", "\n".join(paths.values()))
+        except Exception as e:
+            QMessageBox.critical(self, "导出失败", f"导出时发生错误：{str(e)}")
+        finally:
+            self.statusBar().showMessage("就绪")
 
 def main():
     app = QApplication(sys.argv)
-    
-    # 初始化数据库连接
-    db = DatabaseManager('novel_writer.db')
-    
-    # 加载配置文件
-    config = ConfigManager('config.json')
-    
+
+    # 加载配置文件（全局共享），主窗口定时检查文件变化热加载
+    config = get_config('config.json')
+
     # 创建主窗口
-    window = MainWindow(db, config)
+    window = MainWindow(config)
     window.show()
-    
+
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,383 @@
+import hashlib
+import json
+import re
+from collections import defaultdict
+from client.config import get_config
+from client.modules.model_router import get_router
+
+# 抽取规则变化时递增，使已缓存的抽取结果失效
+EXTRACTOR_VERSION = 2
+
+SENTENCE_SPLIT = re.compile(r'[。！？!?\n]+')
+
+# 外貌属性：属性 -> (显示名, 正则, 同义值归并)
+APPEARANCE_RULES = {
+    'hair_color': ("发色", re.compile(r'([黑白银金红棕褐灰紫蓝])色?的?[长短卷]?头?发'), {'银': '白', '褐': '棕'}),
+    'eye_color': ("瞳色", re.compile(r'([黑蓝绿金红紫灰褐])色?的?(?:眼睛|眼眸|眸子|瞳孔|双眸|眼瞳)'), {'褐': '棕'}),
+    'build': ("身材", re.compile(r'身材(高大|魁梧|高挑|矮小|瘦小|娇小)'),
+              {'魁梧': '高大', '高挑': '高大', '瘦小': '矮小', '娇小': '矮小'}),
+}
+AGE_PATTERN = re.compile(r'([0-9]{1,3}|[一二两三四五六七八九十]{1,3})岁')
+
+# 性格：互为反义的特征词，性格变化可能是剧情需要，一律交给LLM确认
+TRAIT_ANTONYMS = {
+    '开朗': '阴郁', '冷漠': '热情', '胆小': '勇敢', '温柔': '暴躁',
+    '谨慎': '鲁莽', '冷静': '冲动', '沉默寡言': '健谈'
+}
+TRAIT_ANTONYMS.update({v: k for k, v in TRAIT_ANTONYMS.items()})
+# 特征词前的否定（“不冷静”“并不胆小”“不是很开朗”），否定的特征不计入
+TRAIT_NEGATION = re.compile(r'(?:不|没|未|非|无)[是很太够再怎么大]{0,2}$')
+
+# 只能有一个对象的关系
+EXCLUSIVE_RELATIONS = ('父亲', '母亲', '师父', '妻子', '丈夫')
+
+ATTRIBUTE_LABELS = {attr: rule[0] for attr, rule in APPEARANCE_RULES.items()}
+ATTRIBUTE_LABELS.update({'age': "年龄", 'trait': "性格"})
+ATTRIBUTE_LABELS.update({f'relation:{rel}': rel for rel in EXCLUSIVE_RELATIONS})
+
+CHINESE_DIGITS = {'一': 1, '二': 2, '两': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+
+
+def _parse_age(text):
+    """解析阿拉伯数字或一百以内的中文数字"""
+    if text.isdigit():
+        return int(text)
+    if '十' not in text:
+        return CHINESE_DIGITS.get(text)
+    tens, _, ones = text.partition('十')
+    return CHINESE_DIGITS.get(tens, 1) * 10 + CHINESE_DIGITS.get(ones, 0)
+
+
+def _hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _find_trait(text, trait):
+    """返回特征词第一次未被否定的出现位置，没有则返回-1"""
+    position = text.find(trait)
+    while position >= 0 and TRAIT_NEGATION.search(text, max(0, position - 3), position):
+        position = text.find(trait, position + len(trait))
+    return position
+
+
+def _verdict_key(finding):
+    """LLM确认结果的键：角色、属性、基准值和出现矛盾的句子都相同时视为同一疑似矛盾"""
+    return _hash(f"{finding['character']}|{finding['attribute']}|{finding['expected']}|{finding['actual_sentence']}")
+
+
+class FactExtractor:
+    """按规则从文本中抽取角色属性陈述，只依赖角色名列表"""
+
+    def __init__(self, names):
+        self.names = sorted(set(names), key=len, reverse=True)
+        alternation = "|".join(re.escape(name) for name in self.names)
+        relations = "|".join(EXCLUSIVE_RELATIONS)
+        self.name_pattern = re.compile(alternation)
+        # “张三是林远的师父” / “林远的师父张三”
+        self.relation_patterns = [
+            (re.compile(rf'(?P<other>{alternation})(?:是|乃)(?P<owner>{alternation})的(?P<rel>{relations})'), 'owner'),
+            (re.compile(rf'(?P<owner>{alternation})的(?P<rel>{relations})(?P<other>{alternation})'), 'owner'),
+        ]
+        # 角色设定中的“师父：张三”
+        self.profile_relation_pattern = re.compile(rf'(?P<rel>{relations})\s*[是为：:]\s*(?P<other>{alternation})')
+
+    @property
+    def signature(self):
+        """规则版本和角色名决定抽取结果，任一变化都需要重新抽取"""
+        return _hash(f"{EXTRACTOR_VERSION}|{'|'.join(self.names)}")
+
+    def extract(self, text):
+        """
+        抽取正文中的属性陈述
+        句中出现多个角色时，属性归于其前最近的角色并标记为不确定
+        """
+        facts = []
+        for sentence in SENTENCE_SPLIT.split(text or ""):
+            mentions = [(m.start(), m.group()) for m in self.name_pattern.finditer(sentence)]
+            if not mentions:
+                continue
+            ambiguous = len({name for _, name in mentions}) > 1
+
+            def owner(position):
+                preceding = [name for start, name in mentions if start < position]
+                return preceding[-1] if preceding else mentions[0][1]
+
+            def add(position, attribute, value, is_ambiguous=ambiguous):
+                facts.append({
+                    'character': owner(position), 'attribute': attribute, 'value': value,
+                    'sentence': sentence.strip()[:80], 'ambiguous': is_ambiguous
+                })
+
+            for attribute, (_, pattern, synonyms) in APPEARANCE_RULES.items():
+                for match in pattern.finditer(sentence):
+                    add(match.start(), attribute, synonyms.get(match.group(1), match.group(1)))
+            for match in AGE_PATTERN.finditer(sentence):
+                age = _parse_age(match.group(1))
+                if age:
+                    add(match.start(), 'age', age)
+            for trait in TRAIT_ANTONYMS:
+                position = _find_trait(sentence, trait)
+                if position >= 0:
+                    add(position, 'trait', trait)
+            for pattern, _ in self.relation_patterns:
+                for match in pattern.finditer(sentence):
+                    facts.append({
+                        'character': match.group('owner'), 'attribute': f"relation:{match.group('rel')}",
+                        'value': match.group('other'), 'sentence': sentence.strip()[:80], 'ambiguous': False
+                    })
+        return facts
+
+    def extract_profile(self, character):
+        """从characters表的设定中抽取基准属性"""
+        name = character['name']
+        facts = []
+
+        def add(attribute, value):
+            facts.append({'character': name, 'attribute': attribute, 'value': value,
+                          'sentence': "角色设定", 'ambiguous': False})
+
+        appearance = " ".join(filter(None, [character.get('appearance'), character.get('description')]))
+        for attribute, (_, pattern, synonyms) in APPEARANCE_RULES.items():
+            match = pattern.search(appearance)
+            if match:
+                add(attribute, synonyms.get(match.group(1), match.group(1)))
+        match = AGE_PATTERN.search(appearance)
+        if match and _parse_age(match.group(1)):
+            add('age', _parse_age(match.group(1)))
+
+        personality = " ".join(filter(None, [character.get('personality'), character.get('description')]))
+        for trait in TRAIT_ANTONYMS:
+            if _find_trait(personality, trait) >= 0:
+                add('trait', trait)
+
+        for match in self.profile_relation_pattern.finditer(character.get('relationships') or ""):
+            add(f"relation:{match.group('rel')}", match.group('other'))
+        return facts
+
+
+def find_contradictions(facts):
+    """
+    比较按章节排序的属性陈述，章节序号0表示角色设定
+    :return: 矛盾列表，ambiguous 为 True 的需要进一步确认
+    """
+    groups = defaultdict(list)
+    for fact in sorted(facts, key=lambda f: f['chapter_index']):
+        groups[(fact['character'], fact['attribute'])].append(fact)
+
+    findings = []
+    for (name, attribute), items in groups.items():
+        if attribute == 'age':
+            # 年龄只增不减，后文比前文小视为矛盾
+            oldest = None
+            for item in items:
+                if oldest and item['value'] < oldest['value'] and item['chapter_index'] > oldest['chapter_index']:
+                    findings.append(_finding(name, attribute, oldest, item, item['ambiguous']))
+                if oldest is None or item['value'] > oldest['value']:
+                    oldest = item
+        elif attribute == 'trait':
+            reported = set()
+            for i, item in enumerate(items):
+                for earlier in items[:i]:
+                    pair = (earlier['value'], item['value'])
+                    if (TRAIT_ANTONYMS.get(item['value']) == earlier['value']
+                            and earlier['chapter_index'] < item['chapter_index'] and pair not in reported):
+                        reported.add(pair)
+                        findings.append(_finding(name, attribute, earlier, item, True))
+        else:
+            # 以最早的确定陈述为基准
+            baseline = next((item for item in items if not item['ambiguous']), items[0])
+            reported = set()
+            for item in items:
+                if item['value'] != baseline['value'] and item['value'] not in reported:
+                    reported.add(item['value'])
+                    findings.append(_finding(name, attribute, baseline, item,
+                                             baseline['ambiguous'] or item['ambiguous']))
+    return findings
+
+
+def _finding(name, attribute, expected, actual, ambiguous):
+    return {
+        'fingerprint': f"{name}|{attribute}|{expected['value']}|{actual['value']}",
+        'character': name,
+        'attribute': attribute,
+        'label': ATTRIBUTE_LABELS.get(attribute, attribute),
+        'expected': expected['value'],
+        'expected_chapter': expected['chapter_index'],
+        'expected_sentence': expected['sentence'],
+        'actual': actual['value'],
+        'actual_chapter': actual['chapter_index'],
+        'actual_sentence': actual['sentence'],
+        'ambiguous': ambiguous,
+        'confirmed': not ambiguous,
+        'explanation': ""
+    }
+
+
+def _chapter_label(chapter_index):
+    return "角色设定" if chapter_index == 0 else f"第{chapter_index}章"
+
+
+class ConsistencyChecker:
+    """
+    角色一致性检查：按规则逐章抽取属性陈述并缓存，跨章比较，
+    只有规则无法确定的疑似矛盾才调用LLM，结果写入reviews表（类型character）
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.config = get_config()
+        self.last_stats = {}
+
+    def check(self, project_id, use_llm=None):
+        """
+        检查项目并更新审核记录
+        :param use_llm: 是否用LLM确认不确定的矛盾，默认读取配置
+        :return: 本次发现的矛盾列表
+        """
+        characters = self.db.get_characters(project_id)
+        names = [c['name'] for c in characters if c.get('name')]
+        if not names:
+            self.last_stats = {'chapters': 0, 'extracted': 0, 'reused': 0, 'llm_checks': 0}
+            return []
+
+        extractor = FactExtractor(names)
+        facts = []
+        for character in characters:
+            facts.extend(dict(fact, chapter_index=0) for fact in extractor.extract_profile(character))
+        facts.extend(self._chapter_facts(project_id, extractor))
+
+        findings = self._confirm(project_id, characters, find_contradictions(facts), use_llm)
+        self._save_reviews(project_id, findings)
+        return findings
+
+    def _chapter_facts(self, project_id, extractor):
+        """
+        读取各章抽取结果：章节版本未变时直接使用缓存，不读取正文；
+        版本变化但内容哈希相同时也复用缓存
+        """
+        signature = extractor.signature
+        cached = self.db.get_consistency_extractions(project_id)
+        updates = []
+        facts = []
+        extracted = reused = 0
+
+        for meta in self.db.get_chapter_metadata(project_id):
+            chapter_index = meta['chapter_index']
+            entry = cached.get(chapter_index)
+            if entry and entry['signature'] == signature and entry['chapter_id'] == meta['id']:
+                chapter_facts = entry['facts']
+                reused += 1
+            else:
+                chapter = self.db.get_chapter(project_id, chapter_index)
+                content = (chapter or {}).get('content') or ""
+                content_hash = _hash(content)
+                if entry and entry['signature'] == signature and entry['content_hash'] == content_hash:
+                    chapter_facts = entry['facts']
+                    reused += 1
+                else:
+                    chapter_facts = extractor.extract(content)
+                    extracted += 1
+                updates.append((chapter_index, meta['id'], content_hash, signature, chapter_facts))
+            facts.extend(dict(fact, chapter_index=chapter_index) for fact in chapter_facts)
+
+        if updates:
+            self.db.save_consistency_extractions(project_id, updates)
+        self.last_stats = {'chapters': extracted + reused, 'extracted': extracted, 'reused': reused, 'llm_checks': 0}
+        return facts
+
+    def _confirm(self, project_id, characters, findings, use_llm):
+        """
+        将不确定的矛盾交给LLM确认，LLM认为合理的移除；超出次数上限的保留为待确认
+        确认结果按疑似矛盾保存，之后的检查直接使用，不再重复询问
+        """
+        settings = self.config.settings.consistency
+        use_llm = settings.use_llm if use_llm is None else use_llm
+        if not use_llm:
+            return findings
+
+        profiles = {c['name']: c for c in characters}
+        verdicts = self.db.get_consistency_verdicts(project_id)
+        new_verdicts = []
+        confirmed = []
+        checks = 0
+        for finding in findings:
+            if finding['ambiguous']:
+                key = _verdict_key(finding)
+                verdict = verdicts.get(key)
+                if verdict is None and checks < settings.max_llm_checks:
+                    checks += 1
+                    try:
+                        verdict = self._ask_llm(project_id, profiles.get(finding['character'], {}), finding)
+                    except Exception as e:
+                        print(f"一致性确认失败: {e}")
+                    else:
+                        verdicts[key] = verdict
+                        new_verdicts.append((key, *verdict))
+                if verdict is not None:
+                    consistent, reason = verdict
+                    if consistent:
+                        continue
+                    finding['confirmed'] = True
+                    finding['explanation'] = reason
+            confirmed.append(finding)
+        if new_verdicts:
+            self.db.save_consistency_verdicts(project_id, new_verdicts)
+        self.last_stats['llm_checks'] = checks
+        return confirmed
+
+    def _ask_llm(self, project_id, profile, finding):
+        """询问LLM两处描写是否矛盾，返回 (是否一致, 理由)"""
+        settings = self.config.settings.consistency
+        prompt = (
+            f"角色：{finding['character']}\n"
+            f"设定：{profile.get('description') or ''} {profile.get('personality') or ''}\n"
+            f"{_chapter_label(finding['expected_chapter'])}：{finding['expected_sentence']}\n"
+            f"{_chapter_label(finding['actual_chapter'])}：{finding['actual_sentence']}\n"
+            f"以上两处关于该角色{finding['label']}的描写是否矛盾？若属于剧情发展或描写的是其他角色，视为不矛盾。\n"
+            '请只输出JSON：{"consistent": true/false, "reason": "简要理由"}'
+        )
+        response = get_router().complete(
+            'consistency',
+            messages=[
+                {"role": "system", "content": "你是一个严谨的小说审校编辑"},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=settings.temperature,
+            max_tokens=settings.max_tokens
+        )
+        text = response['choices'][0]['message']['content']
+        usage = response.get('usage') or {}
+        self.db.record_token_usage(project_id, usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0))
+        self.db.save_llm_response(project_id, 'consistency', response.get('model'), prompt, text)
+
+        start, end = text.find('{'), text.rfind('}')
+        result = json.loads(text[start:end + 1]) if start >= 0 else {}
+        return bool(result.get('consistent')), result.get('reason', "")
+
+    def _save_reviews(self, project_id, findings):
+        """新矛盾写入审核记录，已处理过的不重复写入，已消失的待处理记录删除"""
+        existing = {}
+        for review in self.db.get_reviews(project_id, 'character'):
+            fingerprint = (review['issues'] or {}).get('fingerprint')
+            if fingerprint:
+                existing[fingerprint] = review
+
+        current = {finding['fingerprint'] for finding in findings}
+        for finding in findings:
+            if finding['fingerprint'] in existing:
+                continue
+            self.db.add_review(project_id, 'character', self.describe(finding), finding,
+                               f"统一为“{finding['expected']}”，或在{_chapter_label(finding['actual_chapter'])}交代变化原因")
+        self.db.delete_reviews(
+            review['id'] for fingerprint, review in existing.items()
+            if fingerprint not in current and review['status'] == 'pending'
+        )
+
+    @staticmethod
+    def describe(finding):
+        text = (f"{finding['character']}的{finding['label']}前后不一致："
+                f"{_chapter_label(finding['expected_chapter'])}为“{finding['expected']}”，"
+                f"{_chapter_label(finding['actual_chapter'])}为“{finding['actual']}”")
+        if not finding['confirmed']:
+            text += "（待确认）"
+        return text
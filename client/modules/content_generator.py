@@ -1,19 +1,21 @@
-import openai
 import json
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTextEdit, QPushButton, QMessageBox, QLineEdit, QLabel
-from client.database import DatabaseManager
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, QPushButton, QMessageBox, QLineEdit, QLabel, QComboBox, QListWidget
+from PyQt5.QtCore import pyqtSignal, QTimer
+from PyQt5.QtGui import QColor, QTextCursor
 import sqlite3
-import os
-from client.config import Config
+from client.config import get_config
+from client.database import CHAPTER_STATUS_LABELS
+from client.modules.document_model import Annotation, PieceTable, anchor_reviews
+from client.modules.llm_backends import BackendError
+from client.modules.model_router import get_router
+from client.tracing import traced
 
 class ContentGenerator:
-    def __init__(self, db_conn):
-        self.db = db_conn
-        self.config = Config()
-        openai_config = self.config.get_openai_config()
-        openai.api_key = openai_config.get("api_key")
-        openai.api_base = openai_config.get("api_base")
+    def __init__(self, db):
+        self.db = db
+        self.config = get_config()
         
+    @traced(category='generation')
     def generate_chapter(self, project_id, chapter_index, style_params):
         """生成章节内容"""
         # 参数验证
@@ -42,8 +44,8 @@ class ContentGenerator:
             max_tokens = min(generation_config.get("max_tokens"), MAX_CHAPTER_LENGTH)
             
             # 调用OpenAI API
-            response = openai.ChatCompletion.create(
-                model=self.config.get_openai_config().get("model"),
+            response = get_router().complete(
+                'chapter',
                 messages=[
                     {"role": "system", "content": "你是一个专业的小说创作助手"},
                     {"role": "user", "content": prompt}
@@ -54,11 +56,14 @@ class ContentGenerator:
             
             content = response['choices'][0]['message']['content']
             
-            # 保存生成内容
+            # 保存生成内容、原始响应并记录token消耗
             self._save_content(project_id, chapter_index, content)
+            self.db.save_llm_response(project_id, 'chapter', response.get('model'), prompt, content)
+            usage = response.get('usage') or {}
+            self.db.record_token_usage(project_id, usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0))
             return content
         
-        except openai.error.APIError as e:
+        except BackendError as e:
             self.error_occurred.emit("API错误", str(e))
         except sqlite3.Error as e:
             QMessageBox.critical(None, "数据库错误", f"数据库操作失败: {str(e)}")
@@ -71,13 +76,7 @@ class ContentGenerator:
         :param project_id: 项目ID
         :return: 大纲内容
         """
-        cursor = self.db.cursor()
-        cursor.execute("""
-            SELECT content FROM outlines WHERE project_id = ?
-            ORDER BY created_at DESC LIMIT 1
-        """, (project_id,))
-        result = cursor.fetchone()
-        return json.loads(result[0]) if result else {}
+        return self.db.get_latest_outline(project_id) or {}
         
     def _save_content(self, project_id, chapter_index, content):
         """
@@ -86,31 +85,59 @@ class ContentGenerator:
         :param chapter_index: 章节序号
         :param content: 章节内容
         """
-        cursor = self.db.cursor()
-        cursor.execute("""
-            INSERT INTO chapters (project_id, chapter_index, content)
-            VALUES (?, ?, ?)
-        """, (project_id, chapter_index, content))
-        self.db.commit()
+        self.db.save_chapter(project_id, chapter_index, content, status='pending_review')
 
 class ContentEditor(QWidget):
-    def __init__(self, project_id, chapter_index, parent=None):
+    # 章节写入数据库后发出，参数为项目ID
+    chapter_saved = pyqtSignal(int)
+    # 需要在状态栏显示的提示
+    status_message = pyqtSignal(str)
+
+    def __init__(self, project_id, chapter_index, db, parent=None):
         super().__init__(parent)
+        self.db = db
         self.project_id = project_id
         self.chapter_index = chapter_index
+        # 正文以片段表维护，编辑时按 contentsChange 增量更新，不再整篇读取 toPlainText()
+        self.document = PieceTable()
+        # 当前章节最新版本的ID，草稿和批注都基于该版本；章节尚未保存过时为0
+        self.chapter_id = 0
+        self._loading = False
+        self._listed_annotations = []
         self.init_ui()
         
     def init_ui(self):
         # 创建内容编辑器界面
         self.layout = QVBoxLayout()
         
+        # 章节选择
+        chapter_layout = QHBoxLayout()
+        chapter_layout.addWidget(QLabel("章节"))
+        self.chapter_combo = QComboBox()
+        self.chapter_combo.activated.connect(
+            lambda i: self.load_chapter(self.chapter_combo.itemData(i))
+        )
+        chapter_layout.addWidget(self.chapter_combo, 1)
+        
+        # 章节状态
+        chapter_layout.addWidget(QLabel("状态"))
+        self.status_combo = QComboBox()
+        for status, label in CHAPTER_STATUS_LABELS.items():
+            self.status_combo.addItem(label, status)
+        self.status_combo.activated.connect(self.change_status)
+        chapter_layout.addWidget(self.status_combo)
+        self.layout.addLayout(chapter_layout)
+        
         # 添加章节标题输入
         self.title_edit = QLineEdit()
         self.layout.addWidget(QLabel("章节标题"))
         self.layout.addWidget(self.title_edit)
         
-        # 内容编辑区域
+        # 内容编辑区域，批注以高亮显示（不修改文档内容）
+        # 章节正文以纯文本存储，片段表和批注偏移都按纯文本计算，因此不接受粘贴的富文本格式
         self.content_edit = QTextEdit()
+        self.content_edit.setAcceptRichText(False)
+        self.content_edit.document().contentsChange.connect(self._on_contents_change)
         self.layout.addWidget(self.content_edit)
         
         # 添加字数统计
@@ -118,6 +145,18 @@ class ContentEditor(QWidget):
         self.content_edit.textChanged.connect(self.update_word_count)
         self.layout.addWidget(self.word_count_label)
         
+        # 审核批注：单击定位，双击标记为已处理
+        self.layout.addWidget(QLabel("审核批注"))
+        self.annotation_list = QListWidget()
+        self.annotation_list.setMaximumHeight(100)
+        self.annotation_list.itemClicked.connect(
+            lambda item: self.show_annotation(self.annotation_list.row(item))
+        )
+        self.annotation_list.itemDoubleClicked.connect(
+            lambda item: self.resolve_annotation(self.annotation_list.row(item))
+        )
+        self.layout.addWidget(self.annotation_list)
+        
         # 保存按钮
         self.save_btn = QPushButton("保存修改")
         self.save_btn.clicked.connect(self.save_changes)
@@ -125,27 +164,191 @@ class ContentEditor(QWidget):
         
         self.setLayout(self.layout)
         
+        # 定时增量保存草稿
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.timeout.connect(self.save_draft)
+        autosave_seconds = get_config().settings.editor.autosave_seconds
+        if autosave_seconds:
+            self.autosave_timer.start(autosave_seconds * 1000)
+        
+    @traced(category='gui')
+    def set_project(self, project_id, chapters):
+        """
+        切换项目，只填充章节列表，正文在选中章节时再读取
+        :param chapters: 章节元数据列表（不含正文）
+        """
+        self.save_draft()
+        self.project_id = project_id
+        self.chapter_combo.clear()
+        for chapter in chapters:
+            self.chapter_combo.addItem(
+                f"第{chapter['chapter_index']}章 {chapter['title'] or ''}（{chapter['char_count']}字）",
+                chapter['chapter_index']
+            )
+        self.load_chapter(chapters[0]['chapter_index'] if chapters else 1)
+
+    def discard_project(self):
+        """当前项目已被删除：丢弃未保存的草稿，之后切换项目时不再写回数据库"""
+        self.project_id = None
+        self.document.mark_saved()
+
+    @traced(category='gui')
+    def load_chapter(self, chapter_index):
+        """加载章节最新版本，有基于该版本的草稿时恢复草稿"""
+        self.save_draft()
+        self.chapter_index = chapter_index
+        chapter = self.db.get_chapter(self.project_id, chapter_index)
+        self.chapter_id = chapter['id'] if chapter else 0
+        self.document, restored = self._load_document((chapter or {}).get('content') or "")
+        self._loading = True
+        try:
+            self.content_edit.setPlainText(self.document.text())
+        finally:
+            self._loading = False
+        self.title_edit.setText((chapter or {}).get('title') or "")
+        self.status_combo.setCurrentIndex(
+            max(0, self.status_combo.findData((chapter or {}).get('status', 'not_started')))
+        )
+        self.status_combo.setEnabled(chapter is not None)
+        self._refresh_annotations()
+        self.update_word_count()
+        if restored:
+            self.word_count_label.setText(f"字数：{len(self.document)}（已恢复未保存的草稿）")
+
+    def _load_document(self, content):
+        """
+        构造片段表：恢复草稿，读取已锚定的批注并为新的待处理审核记录锚定批注
+        :return: (文档, 是否恢复了草稿)
+        """
+        document = PieceTable(content)
+        restored = False
+        draft = self.db.get_chapter_draft(self.project_id, self.chapter_index)
+        if draft and draft['base_id'] == self.chapter_id:
+            document = PieceTable(content, draft['added'], draft['pieces'])
+            restored = True
+        elif draft:
+            # 章节在草稿之后被重新生成或保存，草稿作废
+            self.db.delete_chapter_draft(self.project_id, self.chapter_index)
+
+        document.annotations = [
+            Annotation(row['start_pos'], row['end_pos'], row['review_id'], row['note'] or "")
+            for row in self.db.get_annotations(self.project_id, self.chapter_index, self.chapter_id)
+        ]
+        anchored = anchor_reviews(document.text(), self.chapter_index,
+                                  self.db.get_reviews(self.project_id, status='pending'), document.annotations)
+        if anchored:
+            document.annotations.extend(anchored)
+            self.db.save_annotations(self.project_id, self.chapter_index, self.chapter_id,
+                                     self._annotation_rows(document))
+        return document, restored
+
+    @staticmethod
+    def _annotation_rows(document):
+        return [(a.review_id, a.start, a.end, a.note) for a in document.annotations if not a.collapsed]
+
+    @traced('editor.contentsChange', category='gui')
+    def _on_contents_change(self, position, removed, added):
+        """把编辑器中的修改同步到片段表，只读取新增的文字"""
+        if self._loading:
+            return
+        qt_document = self.content_edit.document()
+        # QTextDocument 末尾有一个隐含的段落分隔符，不计入正文
+        length = qt_document.characterCount() - 1
+        added = min(added, length - position)
+        cursor = QTextCursor(qt_document)
+        cursor.setPosition(position)
+        cursor.setPosition(position + added, QTextCursor.KeepAnchor)
+        self.document.apply_change(position, removed, cursor.selectedText().replace('\u2029', '\n'),
+                                   length, self.content_edit.toPlainText)
+
+    def _refresh_annotations(self):
+        """重新绘制批注高亮和批注列表；编辑过程中高亮由 QTextCursor 自动跟随"""
+        selections = []
+        self.annotation_list.clear()
+        self._listed_annotations = [a for a in self.document.annotations if not a.collapsed]
+        for annotation in self._listed_annotations:
+            selection = QTextEdit.ExtraSelection()
+            selection.format.setBackground(QColor(255, 236, 153))
+            selection.format.setToolTip(annotation.note)
+            selection.cursor = QTextCursor(self.content_edit.document())
+            selection.cursor.setPosition(annotation.start)
+            selection.cursor.setPosition(annotation.end, QTextCursor.KeepAnchor)
+            selections.append(selection)
+            self.annotation_list.addItem(annotation.note or self.document.slice(annotation.start, annotation.end))
+        self.content_edit.setExtraSelections(selections)
+
+    def show_annotation(self, row):
+        """在编辑器中选中批注对应的文字"""
+        annotation = self._listed_annotations[row]
+        if annotation.collapsed:
+            return
+        cursor = self.content_edit.textCursor()
+        cursor.setPosition(annotation.start)
+        cursor.setPosition(annotation.end, QTextCursor.KeepAnchor)
+        self.content_edit.setTextCursor(cursor)
+        self.content_edit.setFocus()
+
+    def resolve_annotation(self, row):
+        """把批注对应的审核记录标记为已处理并移除批注"""
+        annotation = self._listed_annotations[row]
+        # 先保存草稿，使批注偏移与数据库中的草稿正文一致
+        self.save_draft()
+        try:
+            if annotation.review_id is not None:
+                self.db.update_review_status(annotation.review_id, 'resolved')
+            self.document.annotations.remove(annotation)
+            self.db.save_annotations(self.project_id, self.chapter_index, self.chapter_id,
+                                     self._annotation_rows(self.document))
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "数据库错误", f"更新审核记录时发生数据库错误：{str(e)}")
+        self._refresh_annotations()
+
+    def save_draft(self):
+        """增量保存草稿：只写入自上次保存以来新输入的文字和片段列表"""
+        if not self.document.dirty or self.project_id is None:
+            return
+        added_offset, added_text, pieces = self.document.delta()
+        try:
+            self.db.save_chapter_draft(self.project_id, self.chapter_index, self.chapter_id,
+                                       added_offset, added_text, pieces, self._annotation_rows(self.document))
+            self.document.mark_saved()
+        except sqlite3.Error as e:
+            self.status_message.emit(f"保存草稿失败：{str(e)}")
+
+    def change_status(self, index):
+        """修改当前章节状态"""
+        try:
+            if self.db.update_chapter_status(self.project_id, self.chapter_index, self.status_combo.itemData(index)):
+                self.chapter_saved.emit(self.project_id)
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "数据库错误", f"更新章节状态时发生数据库错误：{str(e)}")
+
     def update_word_count(self):
-        text = self.content_edit.toPlainText()
-        self.word_count_label.setText(f"字数：{len(text)}")
+        self.word_count_label.setText(f"字数：{len(self.document)}")
         
     def save_changes(self):
         """保存修改后的内容"""
         try:
             # 获取修改后的内容
-            modified_content = self.content_edit.toPlainText()
+            modified_content = self.document.text()
             
             # 参数验证
             if not modified_content.strip():
                 raise ValueError("内容不能为空")
             
-            # 保存到数据库
-            db = DatabaseManager('novel_writer.db')
-            db.save_chapter(
+            # 保存到数据库，批注随新版本保存，草稿不再需要
+            self.chapter_id = self.db.save_chapter(
                 project_id=self.project_id,
                 chapter_index=self.chapter_index,
-                content=modified_content
+                content=modified_content,
+                title=self.title_edit.text().strip() or None
             )
+            self.db.save_annotations(self.project_id, self.chapter_index, self.chapter_id,
+                                     self._annotation_rows(self.document))
+            self.db.delete_chapter_draft(self.project_id, self.chapter_index)
+            self.document.compact()
+            self.status_combo.setEnabled(True)
+            self.chapter_saved.emit(self.project_id)
             
             # 提示保存成功
             QMessageBox.information(self, "保存成功", "章节内容已成功保存！")
@@ -0,0 +1,228 @@
+"""
+章节编辑器的文档模型：piece table 保存正文，审核批注以偏移量锚定在正文上并随编辑移动
+
+正文由原始缓冲区（加载时的章节内容，只读）和追加缓冲区（编辑时输入的文字，只追加）拼成，
+插入和删除只修改片段列表，不复制正文，单次编辑的开销与片段数有关而与章节长度无关。
+草稿保存时只需写入追加缓冲区的新增部分和片段列表
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+ORIGINAL = 0
+ADDED = 1
+
+
+@dataclass
+class Annotation:
+    """锚定在正文 [start, end) 上的批注，review_id 对应 reviews 表"""
+    start: int
+    end: int
+    review_id: Optional[int] = None
+    note: str = ""
+
+    @property
+    def collapsed(self):
+        """批注的文字已被全部删除"""
+        return self.start >= self.end
+
+    def _insert(self, position, length):
+        # 在批注开头插入的文字不属于批注，在内部插入的文字扩展批注
+        if position <= self.start:
+            self.start += length
+        if position < self.end:
+            self.end += length
+        self.end = max(self.end, self.start)
+
+    def _delete(self, position, length):
+        def shift(offset):
+            if offset <= position:
+                return offset
+            return max(position, offset - length)
+        self.start, self.end = shift(self.start), shift(self.end)
+
+
+class PieceTable:
+    """
+    片段表文档模型
+    片段为 [缓冲区, 起始偏移, 长度]；连续输入会扩展最后一个片段，不会产生新片段
+    """
+
+    def __init__(self, text="", added="", pieces=None):
+        self.original = text
+        self.added = added
+        if pieces is None:
+            pieces = [[ORIGINAL, 0, len(text)]] if text else []
+        self.pieces = [list(piece) for piece in pieces]
+        self.annotations: List[Annotation] = []
+        self._length = sum(piece[2] for piece in self.pieces)
+        # 上次保存草稿时追加缓冲区的长度
+        self.saved_added_length = len(added)
+        self.dirty = False
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def added(self):
+        """追加缓冲区；输入时只追加分段，读取时才合并"""
+        if len(self._added_chunks) > 1:
+            self._added_chunks = ["".join(self._added_chunks)]
+        return self._added_chunks[0] if self._added_chunks else ""
+
+    @added.setter
+    def added(self, text):
+        self._added_chunks = [text] if text else []
+        self._added_length = len(text)
+
+    def _buffer(self, source):
+        return self.original if source == ORIGINAL else self.added
+
+    def text(self):
+        return "".join(self._buffer(source)[start:start + length] for source, start, length in self.pieces)
+
+    def slice(self, start, end):
+        """返回 [start, end) 的文字，只访问相关片段"""
+        parts = []
+        offset = 0
+        for source, piece_start, length in self.pieces:
+            if offset >= end:
+                break
+            if offset + length > start:
+                lo = max(start - offset, 0)
+                hi = min(end - offset, length)
+                parts.append(self._buffer(source)[piece_start + lo:piece_start + hi])
+            offset += length
+        return "".join(parts)
+
+    def _locate(self, position):
+        """返回包含 position 的片段序号和片段内偏移，position 位于片段边界时返回前一个片段的末尾"""
+        offset = 0
+        for i, piece in enumerate(self.pieces):
+            if position <= offset + piece[2]:
+                return i, position - offset
+            offset += piece[2]
+        return len(self.pieces), 0
+
+    def insert(self, position, text):
+        if not text:
+            return
+        if not 0 <= position <= self._length:
+            raise IndexError(f"插入位置越界: {position}")
+        start = self._added_length
+        self._added_chunks.append(text)
+        self._added_length += len(text)
+        i, inner = self._locate(position)
+        new_piece = [ADDED, start, len(text)]
+        if i == len(self.pieces):
+            self.pieces.append(new_piece)
+        else:
+            piece = self.pieces[i]
+            if inner == piece[2] and piece[0] == ADDED and piece[1] + piece[2] == start:
+                # 紧接着上次输入继续输入
+                piece[2] += len(text)
+            elif inner == 0:
+                self.pieces.insert(i, new_piece)
+            elif inner == piece[2]:
+                self.pieces.insert(i + 1, new_piece)
+            else:
+                tail = [piece[0], piece[1] + inner, piece[2] - inner]
+                piece[2] = inner
+                self.pieces[i + 1:i + 1] = [new_piece, tail]
+        self._length += len(text)
+        for annotation in self.annotations:
+            annotation._insert(position, len(text))
+        self.dirty = True
+
+    def delete(self, position, length):
+        if length <= 0:
+            return
+        if position < 0 or position + length > self._length:
+            raise IndexError(f"删除范围越界: {position}+{length}")
+        end = position + length
+        pieces = []
+        offset = 0
+        for source, start, size in self.pieces:
+            piece_end = offset + size
+            if piece_end <= position or offset >= end:
+                pieces.append([source, start, size])
+            else:
+                if offset < position:
+                    pieces.append([source, start, position - offset])
+                if piece_end > end:
+                    pieces.append([source, start + end - offset, piece_end - end])
+            offset = piece_end
+        self.pieces = pieces
+        self._length -= length
+        for annotation in self.annotations:
+            annotation._delete(position, length)
+        self.dirty = True
+
+    def replace(self, position, removed, text):
+        """先删除 removed 个字符再插入 text"""
+        self.delete(position, removed)
+        self.insert(position, text)
+
+    def apply_change(self, position, removed, text, length, read_all):
+        """
+        应用 QTextDocument.contentsChange 报告的修改
+        报告的范围与编辑器文档长度 length 不一致时（例如整篇替换），用 read_all() 读取全文，
+        与当前正文比较后只替换中间变化的部分，未变化部分的片段和批注保持不变
+        """
+        removed = max(0, min(removed, self._length - position))
+        if self._length - removed + len(text) == length:
+            self.replace(position, removed, text)
+        else:
+            self.replace_changed(read_all())
+
+    def replace_changed(self, text):
+        """用 text 替换正文：跳过相同的前缀和后缀，只替换中间变化的部分"""
+        old = self.text()
+        limit = min(len(old), len(text))
+        prefix = 0
+        while prefix < limit and old[prefix] == text[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old[-1 - suffix] == text[-1 - suffix]:
+            suffix += 1
+        self.replace(prefix, len(old) - prefix - suffix, text[prefix:len(text) - suffix])
+
+    # 序列化
+    def delta(self):
+        """
+        自上次保存以来的增量：追加缓冲区的新增部分和当前片段列表
+        :return: (新增文字在追加缓冲区中的起始偏移, 新增文字, 片段列表)
+        """
+        return self.saved_added_length, self.added[self.saved_added_length:], [list(p) for p in self.pieces]
+
+    def mark_saved(self):
+        self.saved_added_length = self._added_length
+        self.dirty = False
+
+    def compact(self):
+        """把当前正文作为新的原始缓冲区，完整保存章节后调用"""
+        text = self.text()
+        self.original = text
+        self.added = ""
+        self.pieces = [[ORIGINAL, 0, len(text)]] if text else []
+        self.mark_saved()
+
+
+def anchor_reviews(text: str, chapter_index: int, reviews: Iterable[Dict],
+                   annotations: Iterable[Annotation] = ()) -> List[Annotation]:
+    """
+    为尚未锚定的待处理审核记录在正文中定位批注
+    审核记录的 issues 中 actual_chapter 为当前章节且 actual_sentence 能在正文中找到时才锚定
+    :return: 新建的批注
+    """
+    anchored = {annotation.review_id for annotation in annotations}
+    created = []
+    for review in reviews:
+        issues = review.get('issues') or {}
+        sentence = issues.get('actual_sentence')
+        if (review['id'] in anchored or review.get('status') == 'resolved'
+                or issues.get('actual_chapter') != chapter_index or not sentence):
+            continue
+        position = text.find(sentence)
+        if position >= 0:
+            created.append(Annotation(position, position + len(sentence), review['id'], review.get('result') or ""))
+    return created
@@ -0,0 +1,356 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import re
+import tempfile
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+from client.config import get_config
+
+# 新渲染的片段每攒够这么多章写入一次缓存，导出时内存中最多保留一批片段
+FRAGMENT_BATCH_SIZE = 50
+
+
+def _chapter_title(chapter):
+    return chapter.get('title') or f"第{chapter['chapter_index']}章"
+
+
+def _paragraphs(content):
+    """按行拆分段落，忽略空行"""
+    return [line.strip() for line in (content or "").splitlines() if line.strip()]
+
+
+class ChapterWriter:
+    """
+    单一导出格式的渲染器
+    render_chapter 生成可缓存的章节片段，write 将片段流式拼装为最终文件
+    """
+    format = None
+    extension = None
+    # 渲染逻辑变化时递增，使旧缓存失效
+    render_version = 1
+
+    def render_chapter(self, chapter) -> bytes:
+        raise NotImplementedError
+
+    def write(self, output_path, project, fragments):
+        """
+        :param project: 项目信息字典
+        :param fragments: 逐章产出 (章节信息, 片段) 的迭代器
+        """
+        raise NotImplementedError
+
+
+class MarkdownWriter(ChapterWriter):
+    format = "markdown"
+    extension = "md"
+
+    def render_chapter(self, chapter):
+        text = f"## {_chapter_title(chapter)}\n\n"
+        text += "\n\n".join(_paragraphs(chapter.get('content')))
+        return (text + "\n\n").encode('utf-8')
+
+    def write(self, output_path, project, fragments):
+        with open(output_path, 'wb') as f:
+            f.write(f"# {project.get('name', '')}\n\n".encode('utf-8'))
+            if project.get('author'):
+                f.write(f"作者：{project['author']}\n\n".encode('utf-8'))
+            for _, fragment in fragments:
+                f.write(fragment)
+
+
+class EpubWriter(ChapterWriter):
+    format = "epub"
+    extension = "epub"
+
+    def render_chapter(self, chapter):
+        title = escape(_chapter_title(chapter))
+        body = "\n".join(f"<p>{escape(p)}</p>" for p in _paragraphs(chapter.get('content')))
+        return f"""<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" xml:lang="zh-CN">
+<head><title>{title}</title></head>
+<body>
+<h2>{title}</h2>
+{body}
+</body>
+</html>
+""".encode('utf-8')
+
+    def write(self, output_path, project, fragments):
+        name = escape(project.get('name', ''))
+        author = escape(project.get('author') or '')
+        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            # mimetype 必须是第一个且不压缩
+            zf.writestr(zipfile.ZipInfo('mimetype'), 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+            zf.writestr('META-INF/container.xml', """<?xml version="1.0" encoding="utf-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>
+</container>
+""")
+            # 章节逐个写入压缩包，内存中只保留目录信息
+            toc = []
+            for chapter, fragment in fragments:
+                item_id = f"chapter_{chapter['chapter_index']}"
+                zf.writestr(f"OEBPS/{item_id}.xhtml", fragment)
+                toc.append((item_id, escape(_chapter_title(chapter))))
+
+            nav_items = "\n".join(f'<li><a href="{i}.xhtml">{t}</a></li>' for i, t in toc)
+            zf.writestr('OEBPS/nav.xhtml', f"""<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" xml:lang="zh-CN">
+<head><title>{name}</title></head>
+<body><nav epub:type="toc"><h1>目录</h1><ol>
+{nav_items}
+</ol></nav></body>
+</html>
+""")
+            manifest = "\n".join(
+                f'<item id="{i}" href="{i}.xhtml" media-type="application/xhtml+xml"/>' for i, _ in toc
+            )
+            spine = "\n".join(f'<itemref idref="{i}"/>' for i, _ in toc)
+            modified = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+            zf.writestr('OEBPS/content.opf', f"""<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id" xml:lang="zh-CN">
+<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:identifier id="book-id">urn:uuid:{uuid.uuid4()}</dc:identifier>
+<dc:title>{name}</dc:title>
+<dc:creator>{author}</dc:creator>
+<dc:language>zh-CN</dc:language>
+<meta property="dcterms:modified">{modified}</meta>
+</metadata>
+<manifest>
+<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+{manifest}
+</manifest>
+<spine>
+{spine}
+</spine>
+</package>
+""")
+
+
+class DocxWriter(ChapterWriter):
+    format = "docx"
+    extension = "docx"
+
+    def render_chapter(self, chapter):
+        parts = [
+            '<w:p><w:pPr><w:pStyle w:val="Heading1"/><w:pageBreakBefore/></w:pPr>'
+            f'<w:r><w:t>{escape(_chapter_title(chapter))}</w:t></w:r></w:p>'
+        ]
+        for paragraph in _paragraphs(chapter.get('content')):
+            parts.append(f'<w:p><w:r><w:t xml:space="preserve">{escape(paragraph)}</w:t></w:r></w:p>')
+        return "".join(parts).encode('utf-8')
+
+    def write(self, output_path, project, fragments):
+        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('[Content_Types].xml', """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+<Override PartName="/word/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>
+</Types>
+""")
+            zf.writestr('_rels/.rels', """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>
+""")
+            zf.writestr('word/_rels/document.xml.rels', """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>
+""")
+            zf.writestr('word/styles.xml', """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
+<w:docDefaults><w:rPrDefault><w:rPr><w:rFonts w:eastAsia="宋体"/><w:sz w:val="24"/></w:rPr></w:rPrDefault></w:docDefaults>
+<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/>
+<w:pPr><w:ind w:firstLineChars="200"/></w:pPr></w:style>
+<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Normal"/>
+<w:pPr><w:jc w:val="center"/><w:ind w:firstLineChars="0"/></w:pPr><w:rPr><w:b/><w:sz w:val="44"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/>
+<w:pPr><w:jc w:val="center"/><w:ind w:firstLineChars="0"/><w:outlineLvl w:val="0"/></w:pPr><w:rPr><w:b/><w:sz w:val="32"/></w:rPr></w:style>
+</w:styles>
+""")
+            # 正文逐章流式写入 document.xml
+            with zf.open('word/document.xml', 'w') as doc:
+                doc.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                          b'<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>')
+                doc.write(('<w:p><w:pPr><w:pStyle w:val="Title"/></w:pPr>'
+                           f'<w:r><w:t>{escape(project.get("name", ""))}</w:t></w:r></w:p>').encode('utf-8'))
+                for _, fragment in fragments:
+                    doc.write(fragment)
+                doc.write(b'<w:sectPr/></w:body></w:document>')
+
+
+class PdfWriter(ChapterWriter):
+    """依赖可选的 reportlab，未安装时导出PDF会提示安装"""
+    format = "pdf"
+    extension = "pdf"
+
+    def render_chapter(self, chapter):
+        # 缓存转义后的段落标记，排版在拼装阶段完成
+        data = {
+            'title': escape(_chapter_title(chapter)),
+            'paragraphs': [escape(p) for p in _paragraphs(chapter.get('content'))]
+        }
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    def write(self, output_path, project, fragments):
+        try:
+            from reportlab.lib.pagesizes import A4
+            from reportlab.lib.styles import ParagraphStyle
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+            from reportlab.platypus import SimpleDocTemplate, Paragraph, PageBreak
+        except ImportError:
+            raise RuntimeError("导出PDF需要安装reportlab：pip install reportlab")
+
+        pdfmetrics.registerFont(UnicodeCIDFont('STSong-Light'))
+        title_style = ParagraphStyle('title', fontName='STSong-Light', fontSize=22, leading=30, alignment=1)
+        heading_style = ParagraphStyle('heading', fontName='STSong-Light', fontSize=16, leading=24,
+                                       alignment=1, spaceAfter=12)
+        body_style = ParagraphStyle('body', fontName='STSong-Light', fontSize=11, leading=18,
+                                    firstLineIndent=22, wordWrap='CJK')
+
+        # reportlab 需要完整的flowable列表进行分页，这里只保存轻量的段落对象
+        story = [Paragraph(escape(project.get('name', '')), title_style)]
+        for _, fragment in fragments:
+            data = json.loads(fragment)
+            story.append(PageBreak())
+            story.append(Paragraph(data['title'], heading_style))
+            story.extend(Paragraph(p, body_style) for p in data['paragraphs'])
+        SimpleDocTemplate(output_path, pagesize=A4, title=project.get('name', '')).build(story)
+
+
+WRITERS = {writer.format: writer for writer in (MarkdownWriter, EpubWriter, DocxWriter, PdfWriter)}
+EXPORT_FORMATS = tuple(WRITERS)
+
+
+class NovelExporter:
+    def __init__(self, db):
+        self.db = db
+        self.config = get_config()
+
+    def export(self, project_id, fmt, output_path=None):
+        """
+        导出单一格式
+        :param fmt: markdown / epub / docx / pdf
+        :return: 输出文件路径
+        """
+        return self._render(project_id, fmt, output_path,
+                            lambda batch: self.db.save_export_fragments(project_id, batch))
+
+    def _render(self, project_id, fmt, output_path, save_batch):
+        """
+        生成导出文件
+        :param save_batch: 新渲染的片段按批传给该回调 [(章节序号, 格式, 内容哈希, 片段)]，
+                           子进程中写入临时文件，不写数据库
+        :return: 输出文件路径
+        """
+        if fmt not in WRITERS:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+        project = self.db.get_project(project_id)
+        if not project:
+            raise ValueError("项目不存在")
+
+        writer = WRITERS[fmt]()
+        output_path = output_path or self._default_path(project, writer)
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        writer.write(output_path, project, self._iter_fragments(project_id, writer, save_batch))
+        return output_path
+
+    def export_many(self, project_id, formats, output_dir=None):
+        """
+        导出多种格式，文件数据库时每种格式在独立进程中转换
+        子进程只读数据库，新渲染的片段分批写入临时文件，主进程再逐批读出并在一个事务中写入缓存
+        :return: {格式: 输出文件路径}
+        """
+        for fmt in formats:
+            if fmt not in WRITERS:
+                raise ValueError(f"不支持的导出格式: {fmt}")
+        project = self.db.get_project(project_id)
+        if not project:
+            raise ValueError("项目不存在")
+
+        output_dir = output_dir or self.config.settings.export.output_dir
+        paths = {fmt: self._default_path(project, WRITERS[fmt](), output_dir) for fmt in formats}
+
+        # 内存数据库无法跨进程共享，单一格式也无需开进程
+        if len(formats) == 1 or self.db.db_path == ':memory:':
+            return {fmt: self.export(project_id, fmt, path) for fmt, path in paths.items()}
+
+        max_workers = min(self.config.settings.export.max_workers, len(formats))
+        with tempfile.TemporaryDirectory() as spool_dir:
+            spools = {fmt: os.path.join(spool_dir, f"{fmt}.fragments") for fmt in formats}
+            # 主进程已有后台线程（备份、重新压缩），fork 出的子进程可能继承被持有的锁，使用 spawn
+            with ProcessPoolExecutor(max_workers=max_workers,
+                                     mp_context=multiprocessing.get_context('spawn')) as executor:
+                futures = {
+                    fmt: executor.submit(_render_in_process, self.db.db_path, project_id, fmt, path, spools[fmt])
+                    for fmt, path in paths.items()
+                }
+                results = {fmt: future.result() for fmt, future in futures.items()}
+            self.db.save_export_fragments(
+                project_id, (fragment for spool in spools.values() for fragment in _read_spool(spool))
+            )
+        return results
+
+    def _iter_fragments(self, project_id, writer, save_batch):
+        """
+        逐章产出渲染片段，内容未变化的章节直接使用缓存
+        新渲染的片段每 FRAGMENT_BATCH_SIZE 章交给 save_batch 一次，不在内存中累积全书
+        """
+        batch = []
+        for chapter in self.db.iter_latest_chapters(project_id):
+            content_hash = self._content_hash(chapter, writer)
+            cached = self.db.get_export_fragment(project_id, chapter['chapter_index'], writer.format)
+            if cached and cached[0] == content_hash:
+                fragment = cached[1]
+            else:
+                fragment = writer.render_chapter(chapter)
+                batch.append((chapter['chapter_index'], writer.format, content_hash, fragment))
+                if len(batch) >= FRAGMENT_BATCH_SIZE:
+                    save_batch(batch)
+                    batch = []
+            yield chapter, fragment
+        if batch:
+            save_batch(batch)
+
+    def _content_hash(self, chapter, writer):
+        digest = hashlib.sha1(f"{writer.render_version}\0{chapter.get('title') or ''}\0".encode('utf-8'))
+        digest.update((chapter.get('content') or '').encode('utf-8'))
+        return digest.hexdigest()
+
+    def _default_path(self, project, writer, output_dir=None):
+        output_dir = output_dir or self.config.settings.export.output_dir
+        name = re.sub(r'[\\/:*?"<>|\s]+', '_', project.get('name') or f"project_{project['id']}")
+        return os.path.join(output_dir, f"{name}.{writer.extension}")
+
+
+def _render_in_process(db_path, project_id, fmt, output_path, spool_path):
+    """
+    进程池入口：每个进程使用独立的数据库连接且只读，新渲染的片段逐批追加到 spool_path
+    :return: 输出文件路径
+    """
+    from client.database import DatabaseManager
+    with DatabaseManager(db_path) as db, open(spool_path, 'wb') as spool:
+        return NovelExporter(db)._render(project_id, fmt, output_path, lambda batch: pickle.dump(batch, spool))
+
+
+def _read_spool(spool_path):
+    """逐个产出子进程写入临时文件的片段，每次只载入一批"""
+    with open(spool_path, 'rb') as spool:
+        while True:
+            try:
+                batch = pickle.load(spool)
+            except EOFError:
+                return
+            yield from batch
@@ -0,0 +1,189 @@
+import codecs
+import os
+import re
+import zipfile
+from collections import Counter
+from xml.etree import ElementTree
+
+# 章节标题：第X章/回/节/卷，其后须为空白、冒号或行尾（“第三回合”“第一节课”不是标题），或英文 Chapter N
+CHAPTER_HEADING = re.compile(
+    r'^(第[0-9０-９零一二三四五六七八九十百千万两〇]+[章回节卷](?:\s.{0,30}|[：:].{0,30})?|'
+    r'[Cc]hapter\s+\d+.{0,40})$'
+)
+MARKDOWN_HEADING = re.compile(r'^(#{1,6})\s+(.+?)\s*#*$')
+
+# 对话归属："XX说/道/问……"，用于识别角色名
+SPEAKER_PATTERN = re.compile(r'(?:^|(?<=[，。！？；：、”"\s]))([一-龥]{2,3}?)(?:笑道|说道|问道|答道|喊道|叫道|冷笑道|说|道|问)[：:，,“"]')
+NAME_STOPWORDS = {
+    '他们', '我们', '她们', '你们', '自己', '大家', '有人', '这时', '然后', '于是', '只是', '只听',
+    '那人', '众人', '老人', '少年', '女子', '男子', '对方', '心中', '忽然', '突然', '一边', '低声',
+    '轻声', '大声', '淡淡', '微笑', '笑着', '接着', '继续', '回头', '点头', '摇头', '开口', '随即'
+}
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+class ManuscriptImporter:
+    """将已有书稿（.txt/.md/.docx）流式导入为新项目"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def import_file(self, path, project_name=None, author="", extract_characters=False,
+                    min_mentions=5, max_characters=50):
+        """
+        导入书稿
+        :param extract_characters: 是否根据对话归属自动识别角色
+        :return: {'project_id', 'chapters', 'characters'}
+        """
+        if not os.path.exists(path):
+            raise ValueError(f"文件不存在: {path}")
+        project_name = project_name or os.path.splitext(os.path.basename(path))[0]
+        project_id = self.db.create_project(project_name, author, "", "", "")
+
+        speakers = Counter()
+
+        def chapters():
+            for chapter_index, title, content in self.iter_chapters(self.iter_lines(path)):
+                if extract_characters:
+                    speakers.update(SPEAKER_PATTERN.findall(content))
+                yield chapter_index, title, content
+
+        try:
+            # 导入的是已完成的书稿，不计入当天的写作进度
+            chapter_count = self.db.bulk_insert_chapters(project_id, chapters(), status='completed',
+                                                         record_progress=False)
+            characters = self._select_characters(speakers, min_mentions, max_characters)
+            self.db.bulk_insert_characters(project_id, characters)
+        except Exception:
+            self.db.delete_project(project_id)
+            raise
+
+        return {'project_id': project_id, 'chapters': chapter_count, 'characters': len(characters)}
+
+    def iter_lines(self, path):
+        """按文件类型逐行（段落）读取，大文件不整体载入内存"""
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.docx':
+            yield from self._iter_docx_paragraphs(path)
+            return
+
+        for line in self._iter_text_lines(path):
+            if ext == '.md':
+                match = MARKDOWN_HEADING.match(line.strip())
+                if match:
+                    # 二级标题或符合章节格式的标题视为章节
+                    title = match.group(2)
+                    if len(match.group(1)) == 2 or CHAPTER_HEADING.match(title):
+                        yield ('heading', title)
+                        continue
+                    # 一级标题通常是书名，不计入正文
+                    if len(match.group(1)) == 1:
+                        continue
+                    line = title
+            yield line
+
+    def iter_chapters(self, lines):
+        """
+        按章节标题切分，逐章产出 (章节序号, 标题, 内容)
+        第一个标题之前的正文作为“序章”
+        """
+        chapter_index = 0
+        title = None
+        buffer = []
+
+        def flush():
+            return "\n".join(buffer).strip()
+
+        for line in lines:
+            if isinstance(line, tuple):
+                heading = line[1]
+            else:
+                stripped = line.strip()
+                heading = stripped if CHAPTER_HEADING.match(stripped) else None
+                if heading is None:
+                    buffer.append(stripped)
+                    continue
+
+            content = flush()
+            if title is not None or content:
+                chapter_index += 1
+                yield chapter_index, title if title is not None else "序章", content
+            title = heading
+            buffer = []
+
+        content = flush()
+        if title is not None or content:
+            chapter_index += 1
+            yield chapter_index, title if title is not None else "正文", content
+
+    def _detect_encoding(self, path, sample_size=65536):
+        """根据文件开头判断编码：带BOM或开头是合法UTF-8时按UTF-8，否则按GB18030"""
+        with open(path, 'rb') as f:
+            sample = f.read(sample_size)
+        if sample.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        try:
+            # 样本末尾可能截断了多字节字符，不要求完整
+            codecs.getincrementaldecoder('utf-8')().decode(sample)
+        except UnicodeDecodeError:
+            return 'gb18030'
+        return 'utf-8'
+
+    def _iter_text_lines(self, path, chunk_size=65536):
+        """
+        分块解码并逐行产出文本，文件只读取一遍
+        开头按UTF-8判断的书稿在后文出现解码错误时（常见于夹杂GBK的旧稿），从出错位置起改用GB18030解码
+        """
+        encoding = self._detect_encoding(path)
+        decoder = codecs.getincrementaldecoder(encoding)()
+        pending = ""
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                try:
+                    text = decoder.decode(chunk, final=not chunk)
+                except UnicodeDecodeError as e:
+                    if encoding == 'gb18030':
+                        raise
+                    # e.object 是解码器缓存的字节加上本块，出错位置之前的部分是合法的UTF-8
+                    text = e.object[:e.start].decode(encoding)
+                    encoding = 'gb18030'
+                    decoder = codecs.getincrementaldecoder(encoding)()
+                    text += decoder.decode(e.object[e.start:], final=not chunk)
+                lines = (pending + text).split('\n')
+                pending = lines.pop()
+                for line in lines:
+                    yield line.rstrip('\r')
+                if not chunk:
+                    break
+        if pending:
+            yield pending.rstrip('\r')
+
+    def _iter_docx_paragraphs(self, path):
+        """流式解析docx正文段落，标题样式的段落视为章节"""
+        with zipfile.ZipFile(path) as zf, zf.open('word/document.xml') as doc:
+            for event, elem in ElementTree.iterparse(doc, events=('end',)):
+                if elem.tag != f'{WORD_NS}p':
+                    continue
+                text = "".join(t.text or "" for t in elem.iter(f'{WORD_NS}t'))
+                style = elem.find(f'{WORD_NS}pPr/{WORD_NS}pStyle')
+                style_name = style.get(f'{WORD_NS}val', '') if style is not None else ''
+                elem.clear()
+
+                if style_name in ('Title',):
+                    continue
+                if style_name.startswith('Heading') and text.strip():
+                    yield ('heading', text.strip())
+                else:
+                    yield text
+
+    def _select_characters(self, speakers, min_mentions, max_characters):
+        characters = []
+        for name, count in speakers.most_common():
+            if len(characters) >= max_characters or count < min_mentions:
+                break
+            if name in NAME_STOPWORDS or name[-1] in '的了着们':
+                continue
+            characters.append({'name': name, 'description': f"导入书稿时自动识别，对话出现{count}次"})
+        return characters
@@ -0,0 +1,23 @@
+from client.config import get_config
+
+# openai 导入较慢，首次调用生成功能时才加载
+_openai = None
+
+
+def get_openai():
+    """获取已按配置初始化的openai模块（延迟导入）"""
+    global _openai
+    if _openai is None:
+        import openai
+        _openai = openai
+        config = get_config()
+        _apply_openai_config(config)
+        # 配置热加载后同步API地址和密钥，生成参数在每次调用时读取
+        config.add_listener(_apply_openai_config)
+    return _openai
+
+
+def _apply_openai_config(config):
+    openai_config = config.get_openai_config()
+    _openai.api_key = openai_config.get("api_key")
+    _openai.api_base = openai_config.get("api_base")
@@ -0,0 +1,468 @@
+import gzip
+import hashlib
+import json
+import math
+import os
+import queue
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict, deque
+from client.modules.llm import get_openai
+
+
+class BackendError(Exception):
+    """LLM后端调用失败（网络错误、超时、服务端报错等），ModelRouter据此降级"""
+
+
+class LLMBackend:
+    """
+    LLM后端接口，请求和响应都使用OpenAI ChatCompletion的格式：
+    非流式返回 {'model', 'choices': [{'message': {'content'}}], 'usage'}，
+    流式返回产出 {'choices': [{'delta': {'content'}}]} 的迭代器
+    """
+
+    def chat(self, model, messages, temperature, max_tokens, stream=False, timeout=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+# 中日韩文字和全角标点
+_CJK = re.compile(r'[\u3000-\u303f\u3400-\u9fff\uac00-\ud7af\uff00-\uffef]')
+
+
+def estimate_tokens(text):
+    """
+    接口不返回用量时（流式响应、本地模型）估算token数：中文约每字1个token，其余约每4个字符1个token
+    所有估算都应使用此函数，避免把字符数和token数混在一起统计
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def _response(model, text, prompt_tokens, completion_tokens):
+    return {
+        'model': model,
+        'choices': [{'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+        'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                  'total_tokens': prompt_tokens + completion_tokens}
+    }
+
+
+class OpenAIBackend(LLMBackend):
+    """openai SDK（0.28），未单独配置地址和密钥时使用 openai.* 全局配置"""
+
+    def __init__(self, settings):
+        self.settings = settings
+
+    def chat(self, model, messages, temperature, max_tokens, stream=False, timeout=None):
+        openai = get_openai()
+        params = {}
+        if self.settings.api_base:
+            params['api_base'] = self.settings.api_base
+        if self.settings.api_key:
+            params['api_key'] = self.settings.api_key
+        try:
+            return openai.ChatCompletion.create(
+                model=model, messages=messages, temperature=temperature, max_tokens=max_tokens,
+                stream=stream, request_timeout=timeout or self.settings.timeout, **params
+            )
+        except openai.error.OpenAIError as e:
+            raise BackendError(str(e)) from e
+
+
+class HTTPBackend(LLMBackend):
+    """
+    OpenAI兼容的HTTP接口（llama.cpp server、vLLM、Ollama等本地服务），只依赖标准库
+    这类服务自身会合并并发请求，客户端直接并发调用即可
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.url = settings.api_base.rstrip('/') + '/chat/completions'
+
+    def chat(self, model, messages, temperature, max_tokens, stream=False, timeout=None):
+        body = json.dumps({
+            'model': model, 'messages': messages, 'temperature': temperature,
+            'max_tokens': max_tokens, 'stream': stream
+        }).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.settings.api_key:
+            headers['Authorization'] = f"Bearer {self.settings.api_key}"
+        request = urllib.request.Request(self.url, data=body, headers=headers, method='POST')
+        try:
+            response = urllib.request.urlopen(request, timeout=timeout or self.settings.timeout)
+        except (urllib.error.URLError, OSError) as e:
+            raise BackendError(f"请求 {self.url} 失败: {e}") from e
+
+        if stream:
+            return self._iter_events(response)
+        with response:
+            try:
+                return json.loads(response.read().decode('utf-8'))
+            except (ValueError, OSError) as e:
+                raise BackendError(f"响应解析失败: {e}") from e
+
+    def _iter_events(self, response):
+        """解析SSE流，逐个产出数据块"""
+        with response:
+            for line in response:
+                line = line.decode('utf-8').strip()
+                if not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                yield json.loads(data)
+
+
+class StubModel:
+    """
+    不依赖任何模型文件的桩模型，用于测试和无GPU环境下验证批处理
+    :param forward_latency: 每批模拟的前向计算耗时（秒），与批大小无关
+    """
+
+    def __init__(self, forward_latency=0.0):
+        self.forward_latency = forward_latency
+
+    def generate_batch(self, requests):
+        if self.forward_latency:
+            time.sleep(self.forward_latency)
+        results = []
+        for request in requests:
+            prompt = request['messages'][-1]['content'] if request['messages'] else ""
+            text = f"[stub] {prompt}"[:request['max_tokens']]
+            prompt_tokens = sum(estimate_tokens(m.get('content')) for m in request['messages'])
+            results.append((text, prompt_tokens, estimate_tokens(text)))
+        return results
+
+
+class TransformersModel:
+    """进程内的 transformers 模型，依赖可选的 transformers 和 torch，CPU上可使用很小的模型"""
+
+    def __init__(self, model_path, device='cpu'):
+        try:
+            from transformers import AutoModelForCausalLM, AutoTokenizer
+        except ImportError:
+            raise RuntimeError("本地模型需要安装transformers和torch：pip install transformers torch")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path, padding_side='left')
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = AutoModelForCausalLM.from_pretrained(model_path).to(device)
+        self.device = device
+
+    def _format(self, messages):
+        if getattr(self.tokenizer, 'chat_template', None):
+            return self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        return "\n".join(f"{m['role']}: {m['content']}" for m in messages) + "\nassistant:"
+
+    def generate_batch(self, requests):
+        import torch
+
+        results = [None] * len(requests)
+        # generate 的采样参数对整批生效，按温度分组
+        groups = {}
+        for i, request in enumerate(requests):
+            groups.setdefault(request['temperature'], []).append(i)
+        for temperature, indexes in groups.items():
+            prompts = [self._format(requests[i]['messages']) for i in indexes]
+            inputs = self.tokenizer(prompts, return_tensors='pt', padding=True).to(self.device)
+            sampling = {'do_sample': True, 'temperature': temperature} if temperature > 0 else {'do_sample': False}
+            with torch.no_grad():
+                outputs = self.model.generate(
+                    **inputs, max_new_tokens=max(requests[i]['max_tokens'] for i in indexes),
+                    pad_token_id=self.tokenizer.pad_token_id, **sampling
+                )
+            prompt_length = inputs['input_ids'].shape[1]
+            for row, i in enumerate(indexes):
+                generated = outputs[row][prompt_length:prompt_length + requests[i]['max_tokens']]
+                text = self.tokenizer.decode(generated, skip_special_tokens=True)
+                prompt_tokens = int(inputs['attention_mask'][row].sum())
+                results[i] = (text, prompt_tokens, len(generated))
+        return results
+
+
+class _PendingRequest:
+    def __init__(self, messages, temperature, max_tokens):
+        self.params = {'messages': messages, 'temperature': temperature, 'max_tokens': max_tokens}
+        self.done = threading.Event()
+        self.cancelled = False
+        self.result = None
+        self.error = None
+
+
+class LocalBatchingBackend(LLMBackend):
+    """
+    进程内模型后端：并发请求进入队列，由单个工作线程合并成批后一次前向计算
+    模型需提供 generate_batch(requests) -> [(文本, prompt_tokens, completion_tokens)]
+    """
+
+    def __init__(self, model, max_batch_size=8, batch_wait_ms=20):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self.batch_sizes = []
+
+    def chat(self, model, messages, temperature, max_tokens, stream=False, timeout=None):
+        request = _PendingRequest(messages, temperature, max_tokens)
+        self._ensure_worker()
+        self._queue.put(request)
+        if not request.done.wait(timeout):
+            # 仍在队列中的请求不再占用批次名额
+            request.cancelled = True
+            raise BackendError("本地模型生成超时")
+        if request.error is not None:
+            raise BackendError(f"本地模型生成失败: {request.error}") from request.error
+
+        text, prompt_tokens, completion_tokens = request.result
+        if stream:
+            # 整批生成完成后才有结果，流式接口一次产出全部内容
+            return iter([{'model': model, 'choices': [{'delta': {'content': text}, 'finish_reason': 'stop'}]}])
+        return _response(model, text, prompt_tokens, completion_tokens)
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self):
+        """阻塞等待第一个请求，再在等待窗口内尽量凑满一批；收到None表示停止，跳过已超时取消的请求"""
+        first = self._queue.get()
+        while first is not None and first.cancelled:
+            first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)
+                break
+            if not request.cancelled:
+                batch.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                return
+            self.batch_sizes.append(len(batch))
+            try:
+                results = self.model.generate_batch([request.params for request in batch])
+                for request, result in zip(batch, results):
+                    request.result = result
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+            finally:
+                for request in batch:
+                    request.done.set()
+
+    def close(self):
+        with self._lock:
+            if self._worker is not None:
+                self._queue.put(None)
+                self._worker.join(timeout=5)
+                self._worker = None
+
+
+def request_key(messages, stream):
+    """录制和回放时匹配请求的键：消息内容和是否流式，不含模型和采样参数，换用其他层级时仍能匹配"""
+    payload = json.dumps([messages, bool(stream)], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def load_recording(path):
+    """读取录制文件；进程被终止时文件可能缺少gzip结尾，已写入的记录仍然可用"""
+    records = []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+        except EOFError:
+            pass
+    return records
+
+
+def save_recording(path, records):
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n")
+
+
+class RecordingBackend(LLMBackend):
+    """
+    录制包装：原样转发请求，把响应追加写入gzip压缩的JSON Lines文件
+    每条记录包含请求键、首次返回的延迟，非流式为完整响应，流式为 [距上一块的秒数, 数据块] 列表；
+    调用失败时记录错误信息，回放时同样抛出 BackendError
+    """
+
+    def __init__(self, backend, path):
+        self.backend = backend
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def chat(self, model, messages, temperature, max_tokens, stream=False, timeout=None):
+        record = {'key': request_key(messages, stream), 'model': model, 'stream': stream,
+                  'temperature': temperature, 'max_tokens': max_tokens}
+        start = time.perf_counter()
+        try:
+            response = self.backend.chat(model, messages, temperature, max_tokens, stream=stream, timeout=timeout)
+        except BackendError as e:
+            record.update(latency=round(time.perf_counter() - start, 6), error=str(e))
+            self._write(record)
+            raise
+        record['latency'] = round(time.perf_counter() - start, 6)
+        if stream:
+            return self._record_stream(record, response)
+        record['response'] = response
+        self._write(record)
+        return response
+
+    def _record_stream(self, record, stream):
+        chunks = []
+        last = time.perf_counter()
+        try:
+            for chunk in stream:
+                now = time.perf_counter()
+                chunks.append([round(now - last, 6), chunk])
+                last = now
+                yield chunk
+        except Exception as e:
+            record['error'] = str(e)
+            raise
+        finally:
+            # 调用方提前关闭时只保存已收到的部分
+            if hasattr(stream, 'close'):
+                stream.close()
+            record['chunks'] = chunks
+            self._write(record)
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n"
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                # 追加模式下每次打开生成一个新的gzip成员，读取时自动拼接
+                self._file = gzip.open(self.path, 'at', encoding='utf-8')
+            self._file.write(line)
+            # 同步刷新压缩流，进程异常退出时已写入的记录仍可读取
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        self.backend.close()
+
+
+class ReplayBackend(LLMBackend):
+    """
+    回放录制的响应，流式响应按录制时的数据块间隔产出
+    按请求键匹配记录，同一请求录制了多次时依次回放；没有匹配的记录时累计 mismatches，
+    严格模式下抛出 BackendError，否则按录制顺序取下一条未用过的记录
+    :param speed: 回放速度倍数，1 为原速，0 表示不等待
+    :param strict: 请求与录制不一致（如提示词已经改变）时是否报错，测试应保持开启以免回放错误的响应
+    """
+
+    def __init__(self, records, speed=1.0, strict=True):
+        self.speed = speed
+        self.strict = strict
+        self.mismatches = 0
+        self._records = list(records)
+        self._lock = threading.Lock()
+        self._by_key = defaultdict(deque)
+        for i, record in enumerate(self._records):
+            self._by_key[record['key']].append(i)
+        self._used = set()
+        self._next = 0
+
+    def _take(self, key):
+        with self._lock:
+            index = None
+            candidates = self._by_key.get(key)
+            while candidates and index is None:
+                candidate = candidates.popleft()
+                if candidate not in self._used:
+                    index = candidate
+            if index is None:
+                self.mismatches += 1
+                if self.strict:
+                    raise BackendError(f"回放记录中没有与请求匹配的响应: {key[:12]}")
+                index = next((i for i in range(self._next, len(self._records)) if i not in self._used), None)
+                if index is None:
+                    raise BackendError("回放记录已用完，没有与请求匹配的响应")
+                self._next = index + 1
+            self._used.add(index)
+            return self._records[index]
+
+    def _sleep(self, seconds):
+        if self.speed > 0 and seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    def chat(self, model, messages, temperature, max_tokens, stream=False, timeout=None):
+        record = self._take(request_key(messages, stream))
+        self._sleep(record.get('latency', 0))
+        if record.get('error') and not record.get('chunks'):
+            raise BackendError(record['error'])
+        if stream:
+            return self._replay_stream(record)
+        if 'response' in record:
+            return record['response']
+        # 流式录制的记录用于非流式请求时拼接全部内容
+        text = "".join(chunk['choices'][0]['delta'].get('content') or "" for _, chunk in record['chunks'])
+        return _response(record.get('model') or model, text, 0, estimate_tokens(text))
+
+    def _replay_stream(self, record):
+        if 'chunks' not in record:
+            text = record['response']['choices'][0]['message']['content']
+            yield {'model': record.get('model'), 'choices': [{'delta': {'content': text}, 'finish_reason': 'stop'}]}
+            return
+        for delay, chunk in record['chunks']:
+            self._sleep(delay)
+            yield chunk
+        if record.get('error'):
+            raise BackendError(record['error'])
+
+
+def create_backend(settings):
+    """按 BackendSettings 创建后端，配置了 record_path 时包装为录制后端"""
+    if settings.type == 'openai':
+        backend = OpenAIBackend(settings)
+    elif settings.type == 'http':
+        backend = HTTPBackend(settings)
+    elif settings.type == 'local':
+        if settings.local_model == 'transformers':
+            model = TransformersModel(settings.model_path, settings.device)
+        else:
+            model = StubModel()
+        backend = LocalBatchingBackend(model, settings.max_batch_size, settings.batch_wait_ms)
+    elif settings.type == 'replay':
+        backend = ReplayBackend(load_recording(settings.replay_path), settings.replay_speed,
+                                settings.replay_strict)
+    else:
+        raise ValueError(f"未知的后端类型: {settings.type}")
+    if settings.record_path:
+        backend = RecordingBackend(backend, settings.record_path)
+    return backend
@@ -0,0 +1,226 @@
+import logging
+import threading
+import time
+from collections import deque
+from client.config import TaskRoute, get_config
+from client.modules.llm_backends import BackendError, create_backend, estimate_tokens
+from client.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# 每个层级保留的延迟样本数，用于计算p95
+LATENCY_SAMPLES = 1000
+
+
+class RoutedStream:
+    """
+    包装流式响应：原样产出数据块，结束或关闭时记录延迟和估算的用量
+    结束后 usage 为估算的 {'prompt_tokens', 'completion_tokens'}，调用方写入统计时直接使用
+    :param call_span: 调用开始时进入的追踪span，读完或关闭流时才结束，span耗时覆盖整个生成过程
+    """
+
+    def __init__(self, router, tier_name, model, stream, start, prompt_tokens, call_span):
+        self.router = router
+        self.tier_name = tier_name
+        self.model = model
+        self._stream = stream
+        self._start = start
+        self._span = call_span
+        self._completion = []
+        self._finished = False
+        self.usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': 0}
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                self._completion.append(chunk['choices'][0]['delta'].get('content') or "")
+                yield chunk
+        except Exception as e:
+            self._finish(e)
+            raise
+        finally:
+            self._finish()
+
+    def close(self):
+        if hasattr(self._stream, 'close'):
+            self._stream.close()
+        self._finish()
+
+    def _finish(self, error=None):
+        if not self._finished:
+            self._finished = True
+            if error is None:
+                self._span.__exit__(None, None, None)
+            else:
+                self._span.__exit__(type(error), error, error.__traceback__)
+            # 流式接口不返回用量，按输出文本估算
+            self.usage['completion_tokens'] = estimate_tokens("".join(self._completion))
+            self.router._record(self.tier_name, time.perf_counter() - self._start,
+                                self.usage['prompt_tokens'], self.usage['completion_tokens'])
+
+
+class ModelRouter:
+    """
+    按任务类型把LLM调用路由到配置的模型层级（routing.tasks -> routing.tiers），
+    层级决定使用的后端（backends.*）和模型；出错或超时时按层级的fallback降级，
+    并按层级统计延迟、token和成本。可在多个线程中共享
+    """
+
+    def __init__(self, config=None, backends=None):
+        self.config = config or get_config()
+        self._lock = threading.Lock()
+        self._stats = {}
+        # 后端按名称延迟创建；传入的后端（如测试替身）不随配置变化
+        self._fixed_backends = dict(backends or {})
+        self._backends = {}
+        self.config.add_listener(self._reset_backends)
+
+    def backend(self, name):
+        """获取后端实例，配置变化后重新创建"""
+        if name in self._fixed_backends:
+            return self._fixed_backends[name]
+        settings = self.config.settings.backends[name]
+        with self._lock:
+            cached = self._backends.get(name)
+            if cached is None or cached[0] != settings:
+                if cached is not None:
+                    cached[1].close()
+                cached = (settings, create_backend(settings))
+                self._backends[name] = cached
+            return cached[1]
+
+    def _reset_backends(self, config):
+        """配置热加载后关闭已删除或已修改的后端"""
+        with self._lock:
+            for name, (settings, backend) in list(self._backends.items()):
+                if config.settings.backends.get(name) != settings:
+                    backend.close()
+                    del self._backends[name]
+
+    def close(self):
+        self.config.remove_listener(self._reset_backends)
+        with self._lock:
+            for _, backend in self._backends.values():
+                backend.close()
+            self._backends.clear()
+
+    def resolve(self, task):
+        """返回任务对应的 (层级名, 层级配置, 任务配置)，未配置的任务使用默认层级"""
+        routing = self.config.settings.routing
+        route = routing.tasks.get(task) or TaskRoute(routing.default_tier)
+        return route.tier, routing.tiers[route.tier], route
+
+    def model_for(self, tier):
+        return tier.model or self.config.get_openai_config().get("model")
+
+    def complete(self, task, messages, temperature=None, max_tokens=None, stream=False):
+        """
+        调用任务对应的模型
+        任务配置中的 temperature/max_tokens 优先，其次是调用方传入的值，最后是openai全局配置
+        :return: ChatCompletion响应；stream=True 时返回 RoutedStream
+        """
+        routing = self.config.settings.routing
+        openai_config = self.config.get_openai_config()
+        tier_name, tier, route = self.resolve(task)
+        params = {
+            'temperature': next(v for v in (route.temperature, temperature, openai_config.get("temperature"))
+                                if v is not None),
+            'max_tokens': next(v for v in (route.max_tokens, max_tokens, openai_config.get("max_tokens"))
+                               if v is not None),
+        }
+
+        tried = []
+        while True:
+            tried.append(tier_name)
+            model = self.model_for(tier)
+            start = time.perf_counter()
+            # 流式调用的span交给 RoutedStream 在流结束时关闭，其余情况在这里关闭
+            call_span = span(f"llm.{task}", "llm", tier=tier_name, model=model, stream=stream)
+            call_span.__enter__()
+            try:
+                response = self.backend(tier.backend).chat(
+                    model, messages, stream=stream, timeout=tier.timeout, **params
+                )
+            except BaseException as e:
+                call_span.__exit__(type(e), e, e.__traceback__)
+                if not isinstance(e, BackendError):
+                    raise
+                self._record(tier_name, time.perf_counter() - start, error=True)
+                fallback = tier.fallback
+                if not fallback or fallback in tried:
+                    raise
+                logger.warning("模型 %s 调用失败，改用 %s 层级: %s", model, fallback, e)
+                with self._lock:
+                    self._tier_stats(tier_name)['fallbacks'] += 1
+                tier_name, tier = fallback, routing.tiers[fallback]
+                continue
+
+            if stream:
+                prompt_tokens = sum(estimate_tokens(m.get('content')) for m in messages)
+                return RoutedStream(self, tier_name, model, response, start, prompt_tokens, call_span)
+            call_span.__exit__(None, None, None)
+            usage = response.get('usage') or {}
+            self._record(tier_name, time.perf_counter() - start,
+                         usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0))
+            return response
+
+    # 统计
+    def _tier_stats(self, tier_name):
+        if tier_name not in self._stats:
+            self._stats[tier_name] = {
+                'calls': 0, 'errors': 0, 'fallbacks': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                'latencies': deque(maxlen=LATENCY_SAMPLES)
+            }
+        return self._stats[tier_name]
+
+    def _record(self, tier_name, latency, prompt_tokens=0, completion_tokens=0, error=False):
+        with self._lock:
+            stats = self._tier_stats(tier_name)
+            stats['calls'] += 1
+            stats['errors'] += error
+            stats['prompt_tokens'] += prompt_tokens
+            stats['completion_tokens'] += completion_tokens
+            stats['latencies'].append(latency)
+
+    def report(self):
+        """各层级的调用次数、失败/降级次数、延迟（毫秒）、token和成本（按当前配置的价格）"""
+        tiers = self.config.settings.routing.tiers
+        report = []
+        with self._lock:
+            for tier_name, stats in sorted(self._stats.items()):
+                tier = tiers.get(tier_name)
+                latencies = sorted(stats['latencies'])
+                cost = 0.0
+                if tier:
+                    cost = (stats['prompt_tokens'] * tier.prompt_price
+                            + stats['completion_tokens'] * tier.completion_price) / 1000
+                report.append({
+                    'tier': tier_name,
+                    'model': self.model_for(tier) if tier else "",
+                    'calls': stats['calls'],
+                    'errors': stats['errors'],
+                    'fallbacks': stats['fallbacks'],
+                    'avg_latency_ms': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+                    'p95_latency_ms': latencies[int(0.95 * (len(latencies) - 1))] * 1000 if latencies else 0.0,
+                    'prompt_tokens': stats['prompt_tokens'],
+                    'completion_tokens': stats['completion_tokens'],
+                    'cost': cost
+                })
+        return report
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """获取全局共享的路由器，生成器的工作线程也会调用"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter()
+        return _router
@@ -1,25 +1,34 @@
 import json
-import sqlite3
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTextEdit, QListWidget, QLabel, QPushButton, QMessageBox, QLineEdit, QProgressDialog, QTextBrowser, QHBoxLayout, QGridLayout, QProgressBar
-from PyQt5.QtCore import Qt
-import openai
-from client.config import Config
-from client.database import DatabaseManager
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTextEdit, QListWidget, QLabel, QPushButton, QMessageBox, QLineEdit, QTextBrowser, QHBoxLayout, QGridLayout, QProgressBar
+from PyQt5.QtCore import Qt, pyqtSignal
+from client.config import get_config
+from client.modules.llm_backends import BackendError
+from client.modules.model_router import get_router
+from client.tracing import span, traced
 from PyQt5.QtWidgets import QApplication
-from markdown2 import markdown
-import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from PyQt5.QtGui import QTextCursor
 
+# 场景细化程度（对应config.json中的generation.outline.detail_level）
+DETAIL_LEVELS = {
+    1: "一句话概括",
+    2: "简要描述（约20字）",
+    3: "较详细描述（约50字），包含冲突与结果",
+    4: "详细描述（约100字），包含冲突、结果和关键对白提示",
+    5: "非常详细的描述（约200字），包含冲突、结果、关键对白提示和情绪变化"
+}
+
 class OutlineGenerator:
-    def __init__(self, db_conn):
-        self.db = db_conn
-        self.config = Config()
-        openai_config = self.config.get_openai_config()
-        openai.api_key = openai_config.get("api_key")
-        openai.api_base = openai_config.get("api_base")
+    def __init__(self, db):
+        self.db = db
+        self.config = get_config()
         
+    @traced(category='generation')
     def generate_outline(self, project_id, theme, style, topic, update_callback=None):
-        """生成小说大纲"""
+        """
+        分层生成小说大纲：先生成骨架（章节多时按章节范围分多次生成），再并发细化各章节场景
+        :param update_callback: 实时输出回调，接收文本片段
+        """
         progress_dialog = None
         cancel_flag = False
         try:
@@ -38,13 +47,166 @@ class OutlineGenerator:
             if not all([project_id, theme, style, topic]):
                 raise ValueError("缺少必要的参数")
             
-            # 构造提示词
-            prompt = f"""基于以下要素创作小说大纲：
+            # 第一阶段：流式生成大纲骨架
+            prompt = self._build_skeleton_prompt(theme, style, topic, generation_config)
+            output_text = ""
+            response_stream = None
+            try:
+                with span('outline.skeleton', 'generation'):
+                    response_stream = get_router().complete(
+                        'outline',
+                        messages=[
+                            {"role": "system", "content": "你是一个专业的小说创作助手"},
+                            {"role": "user", "content": prompt}
+                        ],
+                        temperature=generation_config.get("temperature"),
+                        max_tokens=self._skeleton_max_tokens(generation_config),
+                        stream=True
+                    )
+
+                    for chunk in response_stream:
+                        if cancel_flag:
+                            break
+                        if chunk['choices'][0]['delta'].get("content"):
+                            content = chunk['choices'][0]['delta']["content"]
+                            output_text += content
+                            if update_callback:  # 如果有回调函数，则调用
+                                update_callback(content)
+                            with span('gui.processEvents', 'gui'):
+                                QApplication.processEvents()
+
+            finally:
+                # 确保流式连接关闭
+                if response_stream is not None:
+                    response_stream.close()
+
+            # 统一处理取消逻辑
+            if cancel_flag or (progress_dialog and progress_dialog.wasCanceled()):
+                raise Exception("用户取消操作")
+            
+            with span('outline.parse', 'generation'):
+                outline = self._parse_outline(output_text)
+            if not outline['chapters']:
+                # 骨架被截断时JSON解析失败，兜底解析也拿不到章节，不保存空大纲
+                raise ValueError("大纲骨架不完整，可能超出max_tokens被截断")
+
+            # 补充首次请求之后的章节范围
+            range_responses, range_usage = self._complete_skeleton(outline, theme, style, generation_config,
+                                                                   update_callback)
+
+            # 第二阶段：并发细化每章的关键场景
+            _, usage = self._expand_chapters(outline, theme, style, generation_config, update_callback)
+
+            self._save_outline(project_id, outline)
+            self.db.save_llm_response(project_id, 'outline', response_stream.model, prompt, output_text)
+            for range_prompt, model, range_text in range_responses:
+                self.db.save_llm_response(project_id, 'outline', model, range_prompt, range_text)
+            # 流式接口不返回用量，骨架首次请求使用 RoutedStream 的估算值
+            self.db.record_token_usage(
+                project_id,
+                usage['prompt_tokens'] + range_usage['prompt_tokens'] + response_stream.usage['prompt_tokens'],
+                usage['completion_tokens'] + range_usage['completion_tokens']
+                + response_stream.usage['completion_tokens']
+            )
+            return outline
+        
+        except Exception as e:
+            if isinstance(e, BackendError):
+                error_msg = f"API错误: {str(e)}"
+            elif "用户取消操作" in str(e):
+                error_msg = None  # 用户主动取消不需要提示
+            else:
+                error_msg = f"生成大纲时发生错误：{str(e)}"
+            
+            if error_msg:
+                QMessageBox.critical(None, "生成失败", error_msg)
+            return None  # 返回None而不是抛出异常
+        finally:
+            if progress_dialog:
+                progress_dialog.close()
+
+    def _first_range_end(self, generation_config):
+        """骨架首次请求生成的最后一章"""
+        return min(generation_config.get("chapter_count", 20), generation_config.get("skeleton_chapters_per_call", 20))
+
+    def _skeleton_max_tokens(self, generation_config, chapter_span=None):
+        """
+        单次骨架请求的token预算，每章摘要按 skeleton_tokens_per_chapter 计
+        :param chapter_span: 补充请求的章节数；为None时计算首次请求，另加max_tokens用于主线、角色等固定部分
+        """
+        per_chapter = generation_config.get("skeleton_tokens_per_chapter", 120)
+        if chapter_span is not None:
+            return chapter_span * per_chapter
+        return generation_config.get("max_tokens", 1000) + self._first_range_end(generation_config) * per_chapter
+
+    def _complete_skeleton(self, outline, theme, style, generation_config, update_callback=None):
+        """
+        按章节范围补充骨架中尚未生成的章节，直到达到 chapter_count
+        每次请求最多 skeleton_chapters_per_call 章，单次输出不会随全书章节数增长而超出模型上限
+        :return: ([(提示词, 模型, 输出文本)], token用量)
+        """
+        usage = {'prompt_tokens': 0, 'completion_tokens': 0}
+        responses = []
+        chapters = outline['chapters']
+        chapter_count = generation_config.get("chapter_count", 20)
+        per_call = generation_config.get("skeleton_chapters_per_call", 20)
+        while len(chapters) < chapter_count:
+            first = len(chapters) + 1
+            last = min(first + per_call - 1, chapter_count)
+            if update_callback:
+                update_callback(f"\n[补充大纲骨架：第{first}至{last}章]\n")
+            prompt = self._build_skeleton_range_prompt(outline, first, last, theme, style, generation_config)
+            with span('outline.skeleton_range', 'generation'):
+                response = get_router().complete(
+                    'outline',
+                    messages=[
+                        {"role": "system", "content": "你是一个专业的小说创作助手"},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=generation_config.get("temperature"),
+                    max_tokens=self._skeleton_max_tokens(generation_config, last - first + 1)
+                )
+            text = response['choices'][0]['message']['content']
+            try:
+                new_chapters = self._parse_json_block(text)
+            except json.JSONDecodeError:
+                raise ValueError(f"大纲骨架第{first}至{last}章不完整，可能超出max_tokens被截断")
+            if isinstance(new_chapters, dict):
+                new_chapters = new_chapters.get('chapters', [])
+            new_chapters = [c for c in new_chapters if isinstance(c, dict)] if isinstance(new_chapters, list) else []
+            if not new_chapters:
+                raise ValueError(f"大纲骨架第{first}至{last}章为空")
+            for number, chapter in enumerate(new_chapters[:last - first + 1], first):
+                chapter['chapter_number'] = number
+                chapters.append(chapter)
+
+            responses.append((prompt, response.get('model'), text))
+            response_usage = response.get('usage') or {}
+            usage['prompt_tokens'] += response_usage.get('prompt_tokens', 0)
+            usage['completion_tokens'] += response_usage.get('completion_tokens', 0)
+        return responses, usage
+
+    def _build_skeleton_prompt(self, theme, style, topic, generation_config):
+        """构造大纲骨架提示词，只要求章节摘要，不展开场景"""
+        worldbuilding = ""
+        if generation_config.get("enable_worldbuilding", True):
+            worldbuilding = """
+    "worldbuilding": {
+        "time_period": "时代背景",
+        "locations": {
+            "核心场景1": "场景特征与象征意义"
+        },
+        "magic_tech_systems": "特殊设定（如存在）",
+        "cultural_rules": "社会规则与文化特征"
+    },"""
+
+        return f"""基于以下要素创作小说大纲骨架：
 题材类型：{theme}
 文学风格：{style}
 核心主题：{topic}
 
-请按照以下结构生成详细大纲（JSON格式）：
+{self._skeleton_scope(generation_config)}
+请严格按照以下结构输出（JSON格式）：
 {{
     "main_storyline": {{
         "overview": "故事核心梗概（50-100字）",
@@ -60,14 +222,7 @@ class OutlineGenerator:
             "chapter_number": 1,
             "title": "章节标题",
             "pov": "叙事视角",
-            "key_scenes": [
-                {{
-                    "scene_type": "对话/动作/描写",
-                    "purpose": "场景作用",
-                    "characters": ["参与角色"],
-                    "location": "场景地点"
-                }}
-            ],
+            "summary": "本章一句话摘要",
             "word_count_target": 2500
         }}
     ],
@@ -80,75 +235,181 @@ class OutlineGenerator:
             "appearance": "外貌特征",
             "key_relationships": ["与其他角色的关系"]
         }}
-    ],
-    "worldbuilding": {{
-        "time_period": "时代背景",
-        "locations": {{
-            "核心场景1": "场景特征与象征意义"
-        }},
-        "magic_tech_systems": "特殊设定（如存在）",
-        "cultural_rules": "社会规则与文化特征"
-    }},
+    ],{worldbuilding}
     "thematic_elements": {{
         "central_conflicts": "核心矛盾",
         "symbolism": "核心意象",
         "moral_questions": "探讨的道德问题"
     }}
 }}"""
-            
-            # 流式请求处理优化
-            output_text = ""
-            response_stream = None
-            try:
-                response_stream = openai.ChatCompletion.create(
-                    model=openai_config.get("model"),
-                    messages=[
-                        {"role": "system", "content": "你是一个专业的小说创作助手"},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=generation_config.get("temperature"),
-                    max_tokens=generation_config.get("max_tokens"),
-                    stream=True
-                )
 
-                for chunk in response_stream:
-                    if cancel_flag:
-                        break
-                    if chunk.choices[0].delta.get("content"):
-                        content = chunk.choices[0].delta["content"]
-                        output_text += content
-                        if update_callback:  # 如果有回调函数，则调用
-                            update_callback(content)
-                        QApplication.processEvents()
+    def _skeleton_scope(self, generation_config):
+        """骨架首次请求的章节范围说明"""
+        chapter_count = generation_config.get("chapter_count", 20)
+        last = self._first_range_end(generation_config)
+        if last >= chapter_count:
+            return f"全书共{chapter_count}章，只需给出每章的标题和一句话摘要，不要展开具体场景，场景会在后续步骤中细化。"
+        return (f"全书共{chapter_count}章，本次只需给出第1至{last}章的标题和一句话摘要，其余章节会在后续请求中补充；"
+                "不要展开具体场景，场景会在后续步骤中细化。")
 
-            finally:
-                # 确保流式连接关闭
-                if response_stream is not None:
-                    response_stream.close()
+    def _build_skeleton_range_prompt(self, outline, first, last, theme, style, generation_config):
+        """构造补充骨架章节范围的提示词，携带梗概、结构、角色名和前几章摘要以保持连贯"""
+        storyline = outline['main_storyline']
+        structure = storyline.get('structure') or {}
+        names = [c.get('name', '') for c in outline.get('characters', []) if isinstance(c, dict)]
+        previous = "\n".join(
+            f"第{c.get('chapter_number', '')}章《{c.get('title', '')}》：{c.get('summary', '')}"
+            for c in outline['chapters'][-3:] if isinstance(c, dict)
+        )
+        structure_text = "\n".join(f"{k}：{v}" for k, v in structure.items()) if isinstance(structure, dict) else ""
 
-            # 统一处理取消逻辑
-            if cancel_flag or (progress_dialog and progress_dialog.wasCanceled()):
-                raise Exception("用户取消操作")
-            
-            # 解析并保存大纲
-            outline = self._parse_outline(output_text)
-            self._save_outline(project_id, outline)
-            return outline
-        
-        except Exception as e:
-            if isinstance(e, openai.error.APIError):
-                error_msg = f"API错误: {str(e)}"
-            elif "用户取消操作" in str(e):
-                error_msg = None  # 用户主动取消不需要提示
-            else:
-                error_msg = f"生成大纲时发生错误：{str(e)}"
-            
-            if error_msg:
-                QMessageBox.critical(None, "生成失败", error_msg)
-            return None  # 返回None而不是抛出异常
-        finally:
-            if progress_dialog:
-                progress_dialog.close()
+        return f"""小说信息：
+题材类型：{theme}
+文学风格：{style}
+故事梗概：{storyline.get('overview', '')}
+故事结构：
+{structure_text}
+主要角色：{"、".join(names)}
+前几章摘要：
+{previous}
+
+全书共{generation_config.get("chapter_count", 20)}章，请接着给出第{first}至{last}章的标题和一句话摘要，不要展开具体场景。
+请只输出JSON数组：
+[
+    {{
+        "chapter_number": {first},
+        "title": "章节标题",
+        "pov": "叙事视角",
+        "summary": "本章一句话摘要",
+        "word_count_target": 2500
+    }}
+]"""
+
+    def _build_chapter_prompt(self, outline, index, theme, style, generation_config):
+        """
+        构造单章细化提示词，只携带梗概、角色名和相邻章节摘要以控制长度
+        :param index: 章节在outline['chapters']中的下标
+        """
+        chapters = outline['chapters']
+        chapter = chapters[index]
+        max_scenes = generation_config.get("max_scenes_per_chapter", 5)
+        detail_level = generation_config.get("detail_level", 3)
+        detail_desc = DETAIL_LEVELS.get(detail_level, DETAIL_LEVELS[3])
+
+        overview = outline['main_storyline'].get('overview', '')
+        names = [c.get('name', '') for c in outline.get('characters', []) if isinstance(c, dict)]
+        prev_summary = chapters[index - 1].get('summary', '') if index > 0 else "无（本章为第一章）"
+        next_summary = chapters[index + 1].get('summary', '') if index + 1 < len(chapters) else "无（本章为最后一章）"
+
+        extra_fields = ""
+        if detail_level >= 3:
+            extra_fields += ',\n        "conflict": "场景冲突",\n        "outcome": "场景结果"'
+        if detail_level >= 4:
+            extra_fields += ',\n        "dialogue_hint": "关键对白提示"'
+
+        return f"""小说信息：
+题材类型：{theme}
+文学风格：{style}
+故事梗概：{overview}
+主要角色：{"、".join(names)}
+上一章摘要：{prev_summary}
+下一章摘要：{next_summary}
+
+请为第{chapter.get('chapter_number', index + 1)}章《{chapter.get('title', '')}》设计关键场景。
+本章摘要：{chapter.get('summary', '')}
+叙事视角：{chapter.get('pov', '')}
+
+要求：场景数量不超过{max_scenes}个，每个场景给出{detail_desc}。
+请只输出JSON数组：
+[
+    {{
+        "scene_type": "对话/动作/描写",
+        "purpose": "场景作用",
+        "description": "场景内容",
+        "characters": ["参与角色"],
+        "location": "场景地点"{extra_fields}
+    }}
+]"""
+
+    @traced('outline.expand_chapter', category='llm')
+    def _expand_chapter(self, prompt, generation_config, max_scenes):
+        """在工作线程中细化单章场景（非流式），返回 (场景列表, token用量)"""
+        response = get_router().complete(
+            'outline_chapter',
+            messages=[
+                {"role": "system", "content": "你是一个专业的小说创作助手"},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=generation_config.get("temperature"),
+            max_tokens=generation_config.get("chapter_max_tokens", 800)
+        )
+        scenes = self._parse_json_block(response['choices'][0]['message']['content'])
+        if isinstance(scenes, dict):
+            scenes = scenes.get('key_scenes', [])
+        if not isinstance(scenes, list):
+            raise ValueError("章节场景格式错误")
+        return scenes[:max_scenes], response.get('usage') or {}
+
+    @traced('outline.expand', category='generation')
+    def _expand_chapters(self, outline, theme, style, generation_config, update_callback=None):
+        """
+        并发细化所有章节的关键场景并合并回大纲
+        工作线程只负责网络请求，界面刷新、回调和数据库写入都在调用线程中执行
+        :return: (大纲, 各章累计token用量)
+        """
+        usage = {'prompt_tokens': 0, 'completion_tokens': 0}
+        chapters = [c for c in outline['chapters'] if isinstance(c, dict)]
+        if not chapters:
+            return outline, usage
+        outline['chapters'] = chapters
+
+        max_scenes = generation_config.get("max_scenes_per_chapter", 5)
+        max_workers = min(generation_config.get("max_workers", 8), len(chapters))
+
+        if update_callback:
+            update_callback(f"\n\n[大纲骨架完成，开始并发细化{len(chapters)}个章节]\n")
+
+        done_count = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    self._expand_chapter,
+                    self._build_chapter_prompt(outline, i, theme, style, generation_config),
+                    generation_config, max_scenes
+                ): i
+                for i in range(len(chapters))
+            }
+            pending = set(futures)
+            while pending:
+                finished, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    chapter = chapters[futures[future]]
+                    done_count += 1
+                    try:
+                        chapter['key_scenes'], chapter_usage = future.result()
+                        usage['prompt_tokens'] += chapter_usage.get('prompt_tokens', 0)
+                        usage['completion_tokens'] += chapter_usage.get('completion_tokens', 0)
+                        status = "完成"
+                    except Exception as e:
+                        # 单章失败不影响整体大纲，保留骨架信息
+                        chapter['key_scenes'] = []
+                        status = f"失败：{str(e)}"
+                    if update_callback:
+                        update_callback(
+                            f"[{done_count}/{len(chapters)}] 第{chapter.get('chapter_number', '')}章"
+                            f"《{chapter.get('title', '')}》{status}\n"
+                        )
+                with span('gui.processEvents', 'gui'):
+                    QApplication.processEvents()
+        return outline, usage
+
+    def _parse_json_block(self, content):
+        """从AI返回内容中提取并解析JSON（支持Markdown代码块）"""
+        if "```json" in content:
+            content = content.split("```json")[1].split("```")[0]
+        elif "```" in content:
+            content = content.split("```")[1].split("```")[0]
+        return json.loads(content.strip())
         
     def _parse_outline(self, content):
         """
@@ -157,18 +418,8 @@ class OutlineGenerator:
         :return: 结构化的大纲字典
         """
         try:
-            # 尝试提取Markdown中的JSON代码块
-            if "```json" in content:
-                # 提取json代码块内容
-                json_content = content.split("```json")[1].split("```")[0].strip()
-                outline = json.loads(json_content)
-            elif "```" in content:
-                # 处理不带json标记的代码块
-                json_content = content.split("```")[1].split("```")[0].strip()
-                outline = json.loads(json_content)
-            else:
-                # 直接解析整个内容
-                outline = json.loads(content)
+            # 提取Markdown中的JSON代码块或直接解析整个内容
+            outline = self._parse_json_block(content)
             
             # 验证必要字段
             required_fields = ['main_storyline', 'chapters']
@@ -221,21 +472,28 @@ class OutlineGenerator:
         :param project_id: 项目ID
         :param outline: 大纲内容
         """
-        # 这里实现数据库保存逻辑
-        cursor = self.db.cursor()
-        cursor.execute("""
-            INSERT INTO outlines (project_id, content)
-            VALUES (?, ?)
-        """, (project_id, json.dumps(outline)))
-        self.db.commit()
+        self.db.save_outline(project_id, outline)
 
 class OutlineEditor(QWidget):
-    def __init__(self, project_id, db_conn, config, parent=None):
+    # 大纲写入数据库后发出，参数为项目ID
+    outline_saved = pyqtSignal(int)
+
+    def __init__(self, project_id, generator, config, parent=None):
         super().__init__(parent)
         self.project_id = project_id
-        self.generator = OutlineGenerator(db_conn)
+        self.generator = generator
         self.config = config
+        self.outline = None
         self.init_ui()
+
+    @traced(category='gui')
+    def set_project(self, project_id, outline):
+        """切换到指定项目并显示其大纲"""
+        self.project_id = project_id
+        self.outline = outline
+        self.output_console.clear()
+        self.update_storyline(outline or {})
+        self.update_chapters((outline or {}).get('chapters', []))
         
     def init_ui(self):
         # 主布局改为水平布局
@@ -332,8 +590,13 @@ class OutlineEditor(QWidget):
                 update_callback=update_output  # 实时更新到工作台
             )
             
+            if not outline:
+                return
+            
             # 更新界面显示
-            self.update_storyline(outline.get('main_storyline', ''))
+            self.outline = outline
+            self.outline_saved.emit(self.project_id)
+            self.update_storyline(outline)
             self.update_chapters(outline.get('chapters', []))
             
             QMessageBox.information(self, "生成成功", "大纲已成功生成！")
@@ -347,8 +610,8 @@ class OutlineEditor(QWidget):
     def save_outline(self):
         """保存当前大纲"""
         try:
-            # 获取当前内容
-            outline = {
+            # 获取当前内容，已有结构化大纲时保留完整结构
+            outline = self.outline or {
                 'main_storyline': self.storyline_edit.toPlainText(),
                 'chapters': [self.chapter_list.item(i).text() 
                            for i in range(self.chapter_list.count())]
@@ -356,6 +619,7 @@ class OutlineEditor(QWidget):
             
             # 保存到数据库
             self.generator._save_outline(self.project_id, outline)
+            self.outline_saved.emit(self.project_id)
             QMessageBox.information(self, "保存成功", "大纲已成功保存！")
             
         except Exception as e:
@@ -386,10 +650,15 @@ class OutlineEditor(QWidget):
         """
         self.storyline_edit.setHtml(html_content)
         
+    @traced(category='gui')
     def update_chapters(self, chapters):
         """更新章节列表显示"""
         self.chapter_list.clear()  # 先清空现有内容
         for chapter in chapters:
+            # 分层生成的章节为字典，旧版大纲为字符串
+            if isinstance(chapter, dict):
+                scenes = chapter.get('key_scenes', [])
+                chapter = f"第{chapter.get('chapter_number', '')}章 {chapter.get('title', '')}（{len(scenes)}个场景）"
             self.chapter_list.addItem(chapter)  # 使用addItem添加每个章节 
 
     def _update_preview(self, content):
@@ -0,0 +1,98 @@
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QGridLayout, QLabel, QProgressBar, QTableWidget,
+                             QTableWidgetItem, QAbstractItemView, QHeaderView)
+from client.database import CHAPTER_STATUS_LABELS as STATUS_LABELS
+from client.tracing import traced
+
+
+class ProgressDashboard(QWidget):
+    """写作进度面板，数据全部来自预计算的统计表"""
+
+    DAYS = 14
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.project_id = None
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        # 汇总数据
+        summary = QGridLayout()
+        self.word_label = QLabel()
+        self.chapter_label = QLabel()
+        self.target_label = QLabel()
+        self.token_label = QLabel()
+        summary.addWidget(QLabel("总字数"), 0, 0)
+        summary.addWidget(self.word_label, 0, 1)
+        summary.addWidget(QLabel("章节数"), 1, 0)
+        summary.addWidget(self.chapter_label, 1, 1)
+        summary.addWidget(QLabel("大纲进度"), 2, 0)
+        summary.addWidget(self.target_label, 2, 1)
+        summary.addWidget(QLabel("Token消耗"), 3, 0)
+        summary.addWidget(self.token_label, 3, 1)
+        layout.addLayout(summary)
+
+        # 各状态章节进度
+        self.status_bars = {}
+        status_grid = QGridLayout()
+        for row, (status, label) in enumerate(STATUS_LABELS.items()):
+            bar = QProgressBar()
+            bar.setFormat("%v 章")
+            status_grid.addWidget(QLabel(label), row, 0)
+            status_grid.addWidget(bar, row, 1)
+            self.status_bars[status] = bar
+        layout.addLayout(status_grid)
+
+        # 每日写作进度
+        layout.addWidget(QLabel(f"最近{self.DAYS}天"))
+        self.daily_table = QTableWidget(0, 4)
+        self.daily_table.setHorizontalHeaderLabels(["日期", "新增字数", "保存次数", "Token"])
+        self.daily_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.daily_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.daily_table)
+
+        self.setLayout(layout)
+
+    def set_project(self, project_id, outline=None):
+        self.project_id = project_id
+        self.refresh(outline)
+
+    @traced(category='gui')
+    def refresh(self, outline=None):
+        """刷新统计显示"""
+        if self.project_id is None:
+            return
+        stats = self.db.get_project_stats(self.project_id)
+        if not stats:
+            return
+
+        self.word_label.setText(str(stats['word_count']))
+        self.chapter_label.setText(str(stats['chapter_count']))
+        total_tokens = stats['prompt_tokens'] + stats['completion_tokens']
+        self.token_label.setText(f"{total_tokens}（{stats['llm_calls']}次调用）")
+
+        if outline is not None:
+            planned = outline.get('chapters', [])
+            target = sum(c.get('word_count_target', 0) for c in planned if isinstance(c, dict))
+            text = f"{stats['chapter_count']}/{len(planned)} 章"
+            if target:
+                text += f"，{stats['word_count']}/{target} 字"
+            self.target_label.setText(text)
+
+        for status, bar in self.status_bars.items():
+            bar.setRange(0, max(stats['chapter_count'], 1))
+            bar.setValue(stats['status_counts'].get(status, 0))
+
+        progress = self.db.get_writing_progress(self.project_id, self.DAYS)
+        self.daily_table.setRowCount(len(progress))
+        for row, day in enumerate(reversed(progress)):
+            values = [
+                day['day'],
+                str(day['chars_added']),
+                str(day['chapters_saved']),
+                str(day['prompt_tokens'] + day['completion_tokens'])
+            ]
+            for col, value in enumerate(values):
+                self.daily_table.setItem(row, col, QTableWidgetItem(value))
@@ -0,0 +1,160 @@
+import math
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton,
+                             QLabel, QMessageBox, QInputDialog, QAbstractItemView, QHeaderView)
+from PyQt5.QtCore import pyqtSignal
+from client.tracing import traced
+
+STATUS_LABELS = {'draft': "草稿", 'in_progress': "进行中", 'completed': "已完成"}
+
+
+class ProjectManager:
+    """项目列表与切换，项目行、大纲和章节元数据由DatabaseManager的读缓存提供"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def list_page(self, page, page_size=20):
+        """
+        分页获取项目
+        :param page: 从0开始的页码
+        :return: (项目列表, 总页数)
+        """
+        total_pages = max(1, math.ceil(self.db.count_projects() / page_size))
+        return self.db.list_projects(offset=page * page_size, limit=page_size), total_pages
+
+    def create_project(self, name, author="", theme="", style="", topic=""):
+        if not name.strip():
+            raise ValueError("项目名称不能为空")
+        return self.db.create_project(name.strip(), author, theme, style, topic)
+
+    def delete_project(self, project_id):
+        return self.db.delete_project(project_id)
+
+    def get_context(self, project_id):
+        """获取项目上下文（章节元数据不含正文），命中缓存时无需访问数据库"""
+        project = self.db.get_project(project_id)
+        if not project:
+            raise ValueError("项目不存在")
+        return {
+            'project': project,
+            'outline': self.db.get_latest_outline(project_id),
+            'chapters': self.db.get_chapter_metadata(project_id)
+        }
+
+
+class ProjectManagerView(QWidget):
+    project_selected = pyqtSignal(int)
+    # 项目删除后发出，参数为项目ID
+    project_deleted = pyqtSignal(int)
+
+    PAGE_SIZE = 20
+
+    def __init__(self, manager, parent=None):
+        super().__init__(parent)
+        self.manager = manager
+        self.page = 0
+        self.total_pages = 1
+        self.projects = []
+        self.init_ui()
+        self.refresh()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        # 项目表格
+        self.table = QTableWidget(0, 6)
+        self.table.setHorizontalHeaderLabels(["名称", "作者", "状态", "章节数", "字数", "最后修改"])
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.cellDoubleClicked.connect(lambda row, col: self.open_selected())
+        layout.addWidget(self.table)
+
+        # 分页
+        page_layout = QHBoxLayout()
+        self.prev_btn = QPushButton("上一页")
+        self.prev_btn.clicked.connect(lambda: self.go_to_page(self.page - 1))
+        self.next_btn = QPushButton("下一页")
+        self.next_btn.clicked.connect(lambda: self.go_to_page(self.page + 1))
+        self.page_label = QLabel()
+        page_layout.addWidget(self.prev_btn)
+        page_layout.addWidget(self.page_label)
+        page_layout.addWidget(self.next_btn)
+        page_layout.addStretch()
+
+        # 操作按钮
+        self.open_btn = QPushButton("打开项目")
+        self.open_btn.clicked.connect(self.open_selected)
+        self.new_btn = QPushButton("新建项目")
+        self.new_btn.clicked.connect(self.create_project)
+        self.delete_btn = QPushButton("删除项目")
+        self.delete_btn.clicked.connect(self.delete_selected)
+        page_layout.addWidget(self.open_btn)
+        page_layout.addWidget(self.new_btn)
+        page_layout.addWidget(self.delete_btn)
+        layout.addLayout(page_layout)
+
+        self.setLayout(layout)
+
+    @traced(category='gui')
+    def refresh(self):
+        """重新加载当前页"""
+        self.projects, self.total_pages = self.manager.list_page(self.page, self.PAGE_SIZE)
+        if self.page >= self.total_pages:
+            self.page = self.total_pages - 1
+            self.projects, self.total_pages = self.manager.list_page(self.page, self.PAGE_SIZE)
+
+        self.table.setRowCount(len(self.projects))
+        for row, project in enumerate(self.projects):
+            values = [
+                project['name'],
+                project['author'] or "",
+                STATUS_LABELS.get(project['status'], project['status']),
+                str(project['chapter_count']),
+                str(project['word_count']),
+                str(project['last_modified'])
+            ]
+            for col, value in enumerate(values):
+                self.table.setItem(row, col, QTableWidgetItem(value))
+
+        self.page_label.setText(f"第{self.page + 1}/{self.total_pages}页")
+        self.prev_btn.setEnabled(self.page > 0)
+        self.next_btn.setEnabled(self.page + 1 < self.total_pages)
+
+    def go_to_page(self, page):
+        self.page = max(0, min(page, self.total_pages - 1))
+        self.refresh()
+
+    def selected_project_id(self):
+        row = self.table.currentRow()
+        if 0 <= row < len(self.projects):
+            return self.projects[row]['id']
+        return None
+
+    def open_selected(self):
+        project_id = self.selected_project_id()
+        if project_id is not None:
+            self.project_selected.emit(project_id)
+
+    def create_project(self):
+        name, ok = QInputDialog.getText(self, "新建项目", "项目名称")
+        if not ok:
+            return
+        try:
+            project_id = self.manager.create_project(name)
+            self.page = 0
+            self.refresh()
+            self.project_selected.emit(project_id)
+        except ValueError as e:
+            QMessageBox.warning(self, "创建失败", str(e))
+
+    def delete_selected(self):
+        project_id = self.selected_project_id()
+        if project_id is None:
+            return
+        reply = QMessageBox.question(self, "确认删除", "删除项目将同时删除其大纲、章节和角色，确定继续？")
+        if reply == QMessageBox.Yes:
+            self.manager.delete_project(project_id)
+            self.refresh()
+            self.project_deleted.emit(project_id)
@@ -0,0 +1,161 @@
+"""
+可选的性能追踪：span 上下文管理器 / traced 装饰器记录耗时，
+导出 Chrome trace 格式（chrome://tracing 或 Perfetto 打开），并按span汇总p50/p95
+
+环境变量 NOVEL_TRACE=1 在启动时开启；NOVEL_TRACE=<文件名>.json 同时在退出时写出追踪文件
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+# 内存中最多保留的事件数和每个span的耗时样本数
+MAX_EVENTS = 200000
+MAX_SAMPLES = 10000
+
+_enabled = False
+_lock = threading.Lock()
+_events = deque(maxlen=MAX_EVENTS)
+_durations = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+_origin = time.perf_counter()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _events.clear()
+        _durations.clear()
+
+
+class _Span:
+    __slots__ = ('name', 'category', 'args', 'start')
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        event = {
+            'name': self.name, 'cat': self.category, 'ph': 'X',
+            'ts': (self.start - _origin) * 1e6, 'dur': (end - self.start) * 1e6,
+            'pid': os.getpid(), 'tid': threading.get_ident()
+        }
+        if self.args:
+            event['args'] = self.args
+        if exc_type is not None:
+            event.setdefault('args', {})['error'] = exc_type.__name__
+        with _lock:
+            _events.append(event)
+            _durations[self.name].append(end - self.start)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name, category='app', **args):
+    """记录一段代码的耗时；未开启追踪时返回空操作的上下文管理器"""
+    if not _enabled:
+        return _NOOP
+    return _Span(name, category, args)
+
+
+def traced(name=None, category='app'):
+    """函数耗时追踪装饰器，span名默认为函数的限定名"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(span_name, category, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def export_chrome_trace(path):
+    """写出Chrome trace格式的JSON，返回事件数"""
+    with _lock:
+        events = list(_events)
+    thread_names = {t.ident: t.name for t in threading.enumerate()}
+    metadata = [
+        {'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': thread_names[tid]}}
+        for tid in {e['tid'] for e in events} if tid in thread_names
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+    return len(events)
+
+
+def _percentile(sorted_values, q):
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+def summary():
+    """各span的调用次数、总耗时、p50/p95/最大耗时（毫秒），按总耗时降序"""
+    with _lock:
+        samples = {name: sorted(values) for name, values in _durations.items() if values}
+    rows = [{
+        'name': name,
+        'count': len(values),
+        'total_ms': sum(values) * 1000,
+        'p50_ms': _percentile(values, 0.50) * 1000,
+        'p95_ms': _percentile(values, 0.95) * 1000,
+        'max_ms': values[-1] * 1000
+    } for name, values in samples.items()]
+    return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+
+def format_summary(limit=30):
+    """汇总表的纯文本形式"""
+    lines = [f"{'span':<48}{'次数':>8}{'总计ms':>12}{'p50ms':>10}{'p95ms':>10}{'最大ms':>10}"]
+    for row in summary()[:limit]:
+        lines.append(f"{row['name']:<48}{row['count']:>8}{row['total_ms']:>12.1f}"
+                     f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['max_ms']:>10.2f}")
+    return "\n".join(lines)
+
+
+def _init_from_env():
+    value = os.environ.get('NOVEL_TRACE', '').strip()
+    if not value or value == '0':
+        return
+    enable()
+    if value.endswith('.json'):
+        atexit.register(lambda: export_chrome_trace(value))
+
+
+_init_from_env()
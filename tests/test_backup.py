@@ -0,0 +1,93 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from client.backup import BackupManager, BackupScheduler
+from client.config import BackupSettings
+from client.database import DatabaseManager
+
+
+class TestBackupManager(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "novel.db")
+        self.db = DatabaseManager(self.db_path)
+        self.project_id = self.db.create_project("测试小说", "测试作者", "", "", "")
+        self.db.save_chapter(self.project_id, 1, "第一章内容", title="第一章")
+        self.settings = BackupSettings(directory=os.path.join(self.tmpdir, "backups"), keep=2, pages_per_step=1)
+        self.manager = BackupManager(self.db_path, self.settings)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmpdir)
+
+    def _chapter_count(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM chapters").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_snapshot_and_retention(self):
+        progress = []
+        first = self.manager.snapshot(progress=lambda remaining, total: progress.append(remaining))
+        self.assertEqual(self._chapter_count(first), 1)
+        self.assertTrue(progress)
+
+        # 快照期间其他连接仍可写入
+        self.db.save_chapter(self.project_id, 2, "第二章内容", title="第二章")
+        self.settings.compact_snapshots = True
+        second = self.manager.snapshot()
+        self.assertEqual(self._chapter_count(second), 2)
+
+        self.manager.snapshot()
+        snapshots = self.manager.list_snapshots()
+        self.assertEqual(len(snapshots), 2)
+        self.assertNotIn(first, snapshots)
+        self.assertFalse([name for name in os.listdir(self.settings.directory) if name.endswith('.partial')])
+
+    def test_restore(self):
+        snapshot = self.manager.snapshot()
+        self.db.delete_project(self.project_id)
+        self.assertIsNone(self.db.get_project(self.project_id))
+        self.manager.restore(snapshot, self.db)
+        self.assertEqual(self.db.get_project(self.project_id)['name'], "测试小说")
+
+    def test_compact_reclaims_free_pages(self):
+        self.db.bulk_insert_chapters(self.project_id, ((i, None, "内容" * 2000) for i in range(2, 50)))
+        self.db.delete_project(self.project_id)
+        size_before = os.path.getsize(self.db_path)
+
+        self.assertGreater(self.manager.compact(), 0)
+        self.assertLess(os.path.getsize(self.db_path), size_before)
+        self.assertEqual(self.db.conn.execute("PRAGMA freelist_count").fetchone()[0], 0)
+
+    def test_compact_never_runs_full_vacuum(self):
+        path = os.path.join(self.tmpdir, "legacy.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE t (x TEXT)")
+        conn.executemany("INSERT INTO t VALUES (?)", (("x" * 1000,) for _ in range(500)))
+        conn.execute("DELETE FROM t")
+        conn.commit()
+        conn.close()
+
+        manager = BackupManager(path, self.settings)
+        self.assertFalse(manager.is_incremental())
+        self.assertEqual(manager.compact(), 0)
+        self.assertFalse(manager.is_incremental())
+        self.assertGreater(manager.convert_to_incremental(), 0)
+        self.assertTrue(manager.is_incremental())
+
+    def test_scheduler_runs_when_due(self):
+        # 启动时不立即快照
+        scheduler = BackupScheduler(self.manager, now=0)
+        scheduler.run_pending(now=0)
+        scheduler.run_pending(now=60)
+        self.assertEqual(self.manager.list_snapshots(), [])
+        scheduler.run_pending(now=self.settings.interval_minutes * 60)
+        self.assertEqual(len(self.manager.list_snapshots()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
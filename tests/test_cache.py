@@ -0,0 +1,68 @@
+import threading
+import unittest
+from client.cache import LRUCache
+
+class TestLRUCache(unittest.TestCase):
+    def test_eviction_and_stats(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)  # 淘汰最久未使用的 b
+
+        self.assertNotIn('b', cache)
+        self.assertIsNone(cache.get('b'))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (1, 1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_get_or_load_and_invalidate_where(self):
+        cache = LRUCache(10)
+        loads = []
+        for _ in range(3):
+            cache.get_or_load((1, 1), lambda: loads.append(1) or "章节")
+        self.assertEqual(len(loads), 1)
+
+        cache.put((2, 1), "其他项目")
+        cache.invalidate_where(lambda key: key[0] == 1)
+        self.assertEqual(len(cache), 1)
+
+    def test_zero_size_disables_cache(self):
+        cache = LRUCache(0)
+        cache.put('a', 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_copy_on_read(self):
+        cache = LRUCache(10, copy=dict)
+        first = cache.get_or_load('a', lambda: {'title': "第一章"})
+        first['title'] = "被修改"
+        cache.get('a')['title'] = "被修改"
+        self.assertEqual(cache.get('a'), {'title': "第一章"})
+        self.assertIsNone(cache.get_or_load('b', lambda: None))
+
+    def test_shared_between_threads(self):
+        cache = LRUCache(50)
+        errors = []
+
+        def worker(offset):
+            try:
+                for i in range(2000):
+                    cache.put((offset, i % 80), i)
+                    cache.get((offset, (i * 7) % 80))
+                    if i % 50 == 0:
+                        cache.invalidate_where(lambda key: key[1] % 3 == 0)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(cache), 50)
+        stats = cache.stats()
+        self.assertEqual(stats['hits'] + stats['misses'], 4 * 2000)
+
+if __name__ == '__main__':
+    unittest.main()
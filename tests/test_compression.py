@@ -0,0 +1,153 @@
+import json
+import os
+import tempfile
+import unittest
+import zlib
+from unittest import mock
+from client.compression import Compressor, RecompressionJob, train_dictionary
+from client.config import Config
+from client.database import DatabaseManager
+
+SAMPLE = "林远握紧长剑，望向山门外的云海。苏晴低声说道：“师兄，宗门大比就要开始了。”" * 20
+
+
+class TestCompressor(unittest.TestCase):
+    def test_round_trip(self):
+        compressor = Compressor('zlib', min_size=64)
+        value = compressor.compress(SAMPLE)
+        self.assertIsInstance(value, bytes)
+        self.assertLess(len(value), len(SAMPLE.encode('utf-8')))
+        self.assertEqual(compressor.decompress(value), SAMPLE)
+
+    def test_short_text_passthrough(self):
+        compressor = Compressor('zlib', min_size=512)
+        self.assertEqual(compressor.compress("短文本"), "短文本")
+        self.assertEqual(compressor.decompress("短文本"), "短文本")
+        self.assertEqual(Compressor('none').compress(SAMPLE), SAMPLE)
+
+    def test_dictionary(self):
+        samples = [f"第{i}章 " + SAMPLE[i:i + 300] for i in range(20)]
+        dictionary = train_dictionary(samples, 'zlib', 4096)
+        self.assertTrue(dictionary)
+
+        text = "第99章 " + SAMPLE[:300]
+        plain = Compressor('zlib', min_size=64).compress(text)
+        with_dict = Compressor('zlib', min_size=64, dictionary_id=1, dictionaries={1: dictionary}).compress(text)
+        self.assertLess(len(with_dict), len(plain))
+
+        # 解压时通过字典ID按需加载
+        reader = Compressor('zlib', dictionary_loader=lambda i: dictionary if i == 1 else None)
+        self.assertEqual(reader.decompress(with_dict), text)
+
+    def test_codec_reused_per_dictionary(self):
+        dictionary = train_dictionary([f"第{i}章 " + SAMPLE[i:i + 300] for i in range(20)], 'zlib', 4096)
+        compressor = Compressor('zlib', min_size=64, dictionary_id=1, dictionaries={1: dictionary})
+        with mock.patch('client.compression.zlib.compressobj', wraps=zlib.compressobj) as compressobj:
+            values = [compressor.compress(SAMPLE[i:] + "结尾") for i in range(3)]
+        # 预置字典只在第一次压缩时处理
+        self.assertEqual(compressobj.call_count, 1)
+        self.assertEqual([compressor.decompress(v) for v in values], [SAMPLE[i:] + "结尾" for i in range(3)])
+
+    def test_zstd_fallback_warns(self):
+        with mock.patch('client.compression.zstd_available', return_value=False):
+            with self.assertWarns(RuntimeWarning):
+                compressor = Compressor('zstd')
+        self.assertEqual(compressor.algorithm, 'zlib')
+
+
+class TestCompressedStorage(unittest.TestCase):
+    def setUp(self):
+        self.db = DatabaseManager(':memory:')
+        self.db._compressor = Compressor('zlib', min_size=64)
+        self.project_id = self.db.create_project("测试小说", "测试作者", "", "", "")
+
+    def tearDown(self):
+        self.db.close()
+
+    def _stored(self, chapter_index):
+        return self.db.conn.execute("""
+        SELECT content FROM chapters WHERE project_id = ? AND chapter_index = ? ORDER BY id DESC LIMIT 1
+        """, (self.project_id, chapter_index)).fetchone()[0]
+
+    def test_transparent_read(self):
+        self.assertTrue(self.db.compression_enabled)
+        self.db.save_chapter(self.project_id, 1, SAMPLE, title="第一章")
+        self.db.save_outline(self.project_id, {'title': "测试", 'summary': SAMPLE})
+        self.db.save_llm_response(self.project_id, 'chapter', 'gpt-4', "提示词", SAMPLE)
+
+        self.assertIsInstance(self._stored(1), bytes)
+        self.assertEqual(self.db._load_chapter(self.project_id, 1)['content'], SAMPLE)
+        self.assertEqual(next(self.db.iter_latest_chapters(self.project_id))['content'], SAMPLE)
+        self.assertEqual(self.db._load_latest_outline(self.project_id)['summary'], SAMPLE)
+        self.assertEqual(self.db.get_llm_responses(self.project_id)[0]['response'], SAMPLE)
+        # 字数按原文统计
+        self.assertEqual(self.db.get_chapter_metadata(self.project_id)[0]['char_count'], len(SAMPLE))
+
+    def test_recompress_existing_rows(self):
+        self.db._compressor = Compressor('none')
+        self.db.bulk_insert_chapters(self.project_id, ((i, f"第{i}章", SAMPLE) for i in range(1, 11)))
+        self.assertIsInstance(self._stored(1), str)
+
+        self.db._compressor = Compressor('zlib', min_size=64)
+        self.assertIsNotNone(self.db.train_compression_dictionary())
+        self.assertEqual(self.db.recompress(batch_size=3), 10)
+        self.assertTrue(self._stored(1).startswith(self.db._compressor.header()))
+        self.assertEqual(self.db.storage_stats()['chapters.content']['compressed_rows'], 10)
+        self.assertEqual(self.db._load_chapter(self.project_id, 10)['content'], SAMPLE)
+
+        # 已是当前格式的行不再重写；关闭压缩后解压回文本
+        self.assertEqual(self.db.recompress(), 0)
+        self.db._compressor = Compressor('none', dictionary_loader=self.db._load_compression_dict)
+        self.assertEqual(self.db.recompress(), 10)
+        self.assertEqual(self._stored(1), SAMPLE)
+
+
+class TestRecompressionJob(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_path = os.path.join(self.tmpdir.name, "config.json")
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump({"openai": {"api_key": "test"},
+                       "storage": {"compression": "zlib", "min_size": 64, "use_dictionary": True}}, f)
+        patcher = mock.patch('client.database.get_config', return_value=Config(config_path))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.db_path = os.path.join(self.tmpdir.name, "novel.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_main_connection_uses_trained_dictionary(self):
+        with DatabaseManager(self.db_path) as db:
+            project_id = db.create_project("测试小说", "测试作者", "", "", "")
+            db.bulk_insert_chapters(project_id, ((i, f"第{i}章", SAMPLE) for i in range(1, 11)))
+            self.assertFalse(db._compressor.dictionary_id)
+
+            trained = []
+            job = RecompressionJob(self.db_path, on_dictionary_trained=lambda i: (trained.append(i),
+                                                                                  db.reload_compressor()))
+            job.start()
+            job.join()
+            self.assertIsNone(job.error)
+            self.assertEqual(len(trained), 1)
+
+            # 主连接之后的写入使用后台任务训练的字典
+            db.save_chapter(project_id, 11, SAMPLE)
+            stored = db.conn.execute("SELECT content FROM chapters WHERE chapter_index = 11").fetchone()[0]
+            self.assertTrue(stored.startswith(Compressor('zlib', dictionary_id=trained[0]).header()))
+            self.assertEqual(db.get_chapter(project_id, 11)['content'], SAMPLE)
+
+    def test_dictionary_id_limit(self):
+        with DatabaseManager(self.db_path) as db:
+            project_id = db.create_project("测试小说", "测试作者", "", "", "")
+            db.bulk_insert_chapters(project_id, ((i, f"第{i}章", SAMPLE) for i in range(1, 11)))
+            # 头部只能记录2字节的字典ID，超出时不保存新字典
+            db.conn.execute("INSERT INTO compression_dicts (id, algorithm, data) VALUES (65535, 'zlib', x'00')")
+            db.conn.commit()
+            with self.assertRaises(ValueError):
+                db.train_compression_dictionary()
+            self.assertEqual(db.conn.execute("SELECT MAX(id) FROM compression_dicts").fetchone()[0], 65535)
+
+
+if __name__ == '__main__':
+    unittest.main()
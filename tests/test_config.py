@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+import unittest
+from client.config import Config
+
+class TestConfig(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'config.json')
+        self.data = {
+            "openai": {"api_key": "test_key", "temperature": 1.0, "max_tokens": 2000},
+            "generation": {"outline": {"detail_level": 2, "max_workers": 4}}
+        }
+        self._write(self.data)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _write(self, data):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    def test_defaults_merged_into_typed_settings(self):
+        config = Config(self.path)
+        self.assertEqual(config.settings.outline.detail_level, 2)
+        self.assertEqual(config.settings.outline.max_workers, 4)
+        # 文件中缺失的键使用默认值
+        self.assertEqual(config.settings.outline.max_scenes_per_chapter, 5)
+        self.assertEqual(config.get_generation_config("content")["max_tokens"], 2000)
+
+    def test_invalid_concurrency_rejected(self):
+        self.data["generation"]["outline"]["max_workers"] = 0
+        self._write(self.data)
+        with self.assertRaises(ValueError):
+            Config(self.path)
+
+    def test_reload_notifies_listeners_and_keeps_old_on_error(self):
+        config = Config(self.path)
+        received = []
+        config.add_listener(lambda c: received.append(c.settings.outline.detail_level))
+
+        self.data["generation"]["outline"]["detail_level"] = 5
+        self._write(self.data)
+        self.assertTrue(config.reload())
+        self.assertEqual(received, [5])
+
+        self.data["generation"]["outline"]["detail_level"] = 9
+        self._write(self.data)
+        self.assertFalse(config.reload())
+        self.assertEqual(config.settings.outline.detail_level, 5)
+        self.assertEqual(received, [5])
+        self.assertIn("detail_level", config.last_error)
+
+    def test_reload_if_changed_reports_listener_failure(self):
+        config = Config(self.path)
+        self.assertIsNone(config.reload_if_changed())
+
+        def failing(_):
+            raise RuntimeError("无法应用")
+        config.add_listener(failing)
+        self.data["generation"]["outline"]["detail_level"] = 4
+        self._write(self.data)
+        config._mtime = None
+        with self.assertLogs('client.config', level='ERROR'):
+            self.assertFalse(config.reload_if_changed())
+        self.assertIn("无法应用", config.last_error)
+        # 新配置已生效，文件未再变化时不重复加载
+        self.assertEqual(config.settings.outline.detail_level, 4)
+        self.assertIsNone(config.reload_if_changed())
+
+    def test_api_key_only_required_for_openai_backend(self):
+        self.data["openai"]["api_key"] = ""
+        self._write(self.data)
+        with self.assertRaises(ValueError):
+            Config(self.path)
+
+        self.data["backends"] = {"local": {"type": "http", "api_base": "http://127.0.0.1:8080/v1"}}
+        self.data["routing"] = {"tiers": {"strong": {"backend": "local"}, "fast": {"backend": "local"}}}
+        self._write(self.data)
+        config = Config(self.path)
+        self.assertEqual(config.settings.routing.tiers["fast"].backend, "local")
+        self.assertEqual(config.settings.backends["local"].timeout, 120)
+
+if __name__ == '__main__':
+    unittest.main()
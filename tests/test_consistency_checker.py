@@ -0,0 +1,108 @@
+import unittest
+from unittest import mock
+from client.database import DatabaseManager
+from client.modules.consistency_checker import ConsistencyChecker, FactExtractor
+
+
+class TestFactExtractor(unittest.TestCase):
+    def test_extract(self):
+        extractor = FactExtractor(["林远", "苏晴", "张三"])
+        facts = extractor.extract("林远甩了甩一头黑发。张三是林远的师父。苏晴看着林远，那双蓝色的眼睛里满是担忧。")
+        values = {(f['character'], f['attribute'], f['value'], f['ambiguous']) for f in facts}
+        self.assertIn(("林远", 'hair_color', "黑", False), values)
+        self.assertIn(("林远", 'relation:师父', "张三", False), values)
+        # 句中有多个角色时归于最近的角色，并标记为不确定
+        self.assertIn(("林远", 'eye_color', "蓝", True), values)
+
+    def test_extract_profile(self):
+        extractor = FactExtractor(["林远", "张三"])
+        facts = extractor.extract_profile({
+            'name': "林远", 'appearance': "十七岁，银发，身材高挑", 'personality': "冷静、谨慎",
+            'relationships': "师父：张三", 'description': None
+        })
+        values = {(f['attribute'], f['value']) for f in facts}
+        self.assertTrue({('hair_color', "白"), ('age', 17), ('build', "高大"), ('trait', "冷静"),
+                         ('relation:师父', "张三")} <= values)
+
+    def test_negated_trait(self):
+        extractor = FactExtractor(["林远"])
+        traits = lambda text: [f['value'] for f in extractor.extract(text) if f['attribute'] == 'trait']
+        self.assertEqual(traits("林远一点也不冷静。"), [])
+        self.assertEqual(traits("林远并不胆小，只是不是很开朗。"), [])
+        self.assertEqual(traits("林远不再冲动，变得冷静。"), ["冷静"])
+        self.assertEqual(traits("林远非常冷静。"), ["冷静"])
+        profile = extractor.extract_profile({'name': "林远", 'personality': "不冷静，勇敢"})
+        self.assertEqual([f['value'] for f in profile if f['attribute'] == 'trait'], ["勇敢"])
+
+
+class TestConsistencyChecker(unittest.TestCase):
+    def setUp(self):
+        self.db = DatabaseManager(':memory:')
+        self.project_id = self.db.create_project("测试小说", "测试作者", "", "", "")
+        self.db.bulk_insert_characters(self.project_id, [
+            {'name': "林远", 'appearance': "黑发，十七岁", 'personality': "冷静"},
+            {'name': "苏晴", 'appearance': "蓝色的眼睛"},
+        ])
+        self.checker = ConsistencyChecker(self.db)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_contradictions_written_to_reviews(self):
+        self.db.save_chapter(self.project_id, 1, "林远今年十七岁，黑发被风吹乱。")
+        self.db.save_chapter(self.project_id, 2, "林远拨开额前的白发，才十五岁的他已经见惯生死。")
+        findings = self.checker.check(self.project_id, use_llm=False)
+
+        self.assertEqual({(f['attribute'], f['expected'], f['actual']) for f in findings},
+                         {('hair_color', "黑", "白"), ('age', 17, 15)})
+        reviews = self.db.get_reviews(self.project_id, 'character')
+        self.assertEqual(len(reviews), 2)
+        self.assertTrue(all(r['status'] == 'pending' for r in reviews))
+
+        # 重复检查不重复写入；修正后待处理记录被移除
+        self.checker.check(self.project_id, use_llm=False)
+        self.assertEqual(len(self.db.get_reviews(self.project_id, 'character')), 2)
+        self.db.save_chapter(self.project_id, 2, "林远拨开额前的黑发，十八岁的他已经见惯生死。")
+        self.checker.check(self.project_id, use_llm=False)
+        self.assertEqual(self.db.get_reviews(self.project_id, 'character'), [])
+
+    def test_incremental_extraction(self):
+        for i in range(1, 6):
+            self.db.save_chapter(self.project_id, i, f"第{i}章，林远沉默地走着。")
+        self.checker.check(self.project_id, use_llm=False)
+        self.assertEqual(self.checker.last_stats['extracted'], 5)
+
+        self.checker.check(self.project_id, use_llm=False)
+        self.assertEqual((self.checker.last_stats['extracted'], self.checker.last_stats['reused']), (0, 5))
+
+        # 只重新抽取内容变化的章节，内容相同的新版本复用缓存
+        self.db.save_chapter(self.project_id, 2, "林远的白发在风中飘动。")
+        self.db.save_chapter(self.project_id, 3, "第3章，林远沉默地走着。")
+        self.checker.check(self.project_id, use_llm=False)
+        self.assertEqual((self.checker.last_stats['extracted'], self.checker.last_stats['reused']), (1, 4))
+
+    def test_ambiguous_escalated_to_llm(self):
+        self.db.save_chapter(self.project_id, 1, "林远一向冷静。")
+        self.db.save_chapter(self.project_id, 3, "林远变得冲动起来，一拳砸在桌上。")
+
+        with mock.patch.object(ConsistencyChecker, '_ask_llm', return_value=(True, "剧情转折")) as ask:
+            self.assertEqual(self.checker.check(self.project_id, use_llm=True), [])
+            self.assertEqual(ask.call_count, 1)
+
+        # 已确认过的疑似矛盾不再询问
+        with mock.patch.object(ConsistencyChecker, '_ask_llm', return_value=(False, "缺少铺垫")) as ask:
+            self.assertEqual(self.checker.check(self.project_id, use_llm=True), [])
+            ask.assert_not_called()
+
+        self.db.save_chapter(self.project_id, 3, "林远突然冲动起来。")
+        with mock.patch.object(ConsistencyChecker, '_ask_llm', return_value=(False, "缺少铺垫")) as ask:
+            findings = self.checker.check(self.project_id, use_llm=True)
+            self.assertEqual(self.checker.check(self.project_id, use_llm=True), findings)
+            self.assertEqual(ask.call_count, 1)
+        self.assertEqual(len(findings), 1)
+        self.assertTrue(findings[0]['confirmed'])
+        self.assertEqual(findings[0]['explanation'], "缺少铺垫")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,24 +1,100 @@
+import json
+import os
+import shutil
+import tempfile
+import time
 import unittest
+from unittest import mock
+from PyQt5.QtWidgets import QApplication
+from client.config import get_config
 from client.database import DatabaseManager
+from client.modules import model_router
 from client.modules.content_generator import ContentGenerator
+from client.modules.llm_backends import LLMBackend, RecordingBackend, ReplayBackend, load_recording
+from client.modules.model_router import ModelRouter
+from client.modules.outline_generator import OutlineGenerator
+
+SKELETON = {
+    "main_storyline": {"overview": "少年林风离开小镇寻找失踪的师父", "structure": {}},
+    "chapters": [
+        {"chapter_number": 1, "title": "出城", "pov": "林风", "summary": "林风决定离开小镇"},
+        {"chapter_number": 2, "title": "夜雨", "pov": "林风", "summary": "林风在雨夜遇到苏晴"}
+    ],
+    "characters": [{"name": "林风"}, {"name": "苏晴"}]
+}
+
+
+class ScriptedBackend(LLMBackend):
+    """录制会话时代替真实接口：流式请求逐段返回大纲骨架，其余按提示词返回场景或正文"""
+
+    def chat(self, model, messages, temperature, max_tokens, stream=False, timeout=None):
+        prompt = messages[-1]['content']
+        if stream:
+            text = json.dumps(SKELETON, ensure_ascii=False)
+
+            def chunks():
+                for i in range(0, len(text), 16):
+                    time.sleep(0.001)
+                    yield {'choices': [{'delta': {'content': text[i:i + 16]}}]}
+            return chunks()
+        if prompt.startswith("根据以下大纲"):
+            text = "夜色渐深，林风推开木门，院中的桂花被风吹落一地。" * 30
+        else:
+            text = json.dumps([{"scene_type": "对话", "description": prompt.split("》")[0][-2:]}], ensure_ascii=False)
+        return {'model': model, 'choices': [{'message': {'content': text}}],
+                'usage': {'prompt_tokens': len(prompt), 'completion_tokens': len(text)}}
+
 
 class TestContentGenerator(unittest.TestCase):
+    """生成流程的离线测试：先录制一次会话，之后的用例都回放录制文件，不访问网络"""
+
     @classmethod
     def setUpClass(cls):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        cls.app = QApplication.instance() or QApplication([])
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.recording = os.path.join(cls.tmpdir, "session.jsonl.gz")
+        cls.saved_router = model_router._router
+
         # 使用内存数据库进行测试
         cls.db = DatabaseManager(':memory:')
-        cls.generator = ContentGenerator(cls.db, 'test_api_key')
-        
-    def test_content_generation_workflow(self):
+        cls.outline_generator = OutlineGenerator(cls.db)
+        cls.generator = ContentGenerator(cls.db)
+
+        recorder = RecordingBackend(ScriptedBackend(), cls.recording)
+        model_router._router = ModelRouter(get_config(), backends={'openai': recorder})
+        try:
+            cls.recorded_outline = cls._run_outline()
+            _, cls.recorded_content = cls._run_chapter()
+        finally:
+            recorder.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        model_router._router = cls.saved_router
+        cls.db.close()
+        shutil.rmtree(cls.tmpdir)
+
+    @classmethod
+    def _run_outline(cls, update_callback=None):
+        project_id = cls.db.create_project("大纲测试", "测试作者", "武侠", "古典", "寻找")
+        # 骨架一次给出全部章节，不触发补充章节范围的请求
+        config = cls.outline_generator.config
+        generation_config = dict(config.get_generation_config("outline"), chapter_count=len(SKELETON['chapters']))
+        with mock.patch.object(config, 'get_generation_config', return_value=generation_config):
+            return cls.outline_generator.generate_outline(project_id, "武侠", "古典", "寻找", update_callback)
+
+    @classmethod
+    def _run_chapter(cls):
         # 创建测试项目
-        project_id = self.db.create_project(
+        project_id = cls.db.create_project(
             name="测试小说",
             author="测试作者",
             theme="测试题材",
             style="测试风格",
             topic="测试主题"
         )
-        
+
         # 保存测试大纲
         outline = {
             "main_storyline": "测试故事主线",
@@ -26,23 +102,47 @@ class TestContentGenerator(unittest.TestCase):
             "characters": ["测试角色A", "测试角色B"],
             "key_points": ["测试关键点1", "测试关键点2"]
         }
-        self.db.save_outline(project_id, outline)
-        
+        cls.db.save_outline(project_id, outline)
+
         # 测试章节生成
         style_params = {
             'style': '正式',
             'length': 1000
         }
-        content = self.generator.generate_chapter(project_id, 1, style_params)
-        
+        return project_id, cls.generator.generate_chapter(project_id, 1, style_params)
+
+    def _replay(self, speed=0):
+        backend = ReplayBackend(load_recording(self.recording), speed=speed)
+        model_router._router = ModelRouter(get_config(), backends={'openai': backend})
+        return backend
+
+    def test_content_generation_workflow(self):
+        backend = self._replay()
+        project_id, content = self._run_chapter()
+
         # 验证生成结果
         self.assertIsInstance(content, str)
         self.assertGreater(len(content), 500)
-        
+        self.assertEqual(content, self.recorded_content)
+        self.assertEqual(backend.mismatches, 0)
+
         # 验证数据库保存
         saved_chapter = self.db.get_chapter(project_id, 1)
         self.assertIsNotNone(saved_chapter)
         self.assertEqual(saved_chapter['content'], content)
 
+    def test_outline_streaming_replay(self):
+        backend = self._replay(speed=1.0)
+        pieces = []
+        outline = self._run_outline(pieces.append)
+
+        self.assertEqual(outline, self.recorded_outline)
+        self.assertEqual([c['key_scenes'][0]['description'] for c in outline['chapters']], ["出城", "夜雨"])
+        self.assertEqual(backend.mismatches, 0)
+        # 骨架按录制时的数据块逐段回调，之后是各章细化进度
+        skeleton_chunks = len(load_recording(self.recording)[0]['chunks'])
+        self.assertEqual("".join(pieces[:skeleton_chunks]), json.dumps(SKELETON, ensure_ascii=False))
+
+
 if __name__ == '__main__':
-    unittest.main() 
\ No newline at end of file
+    unittest.main()
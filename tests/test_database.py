@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from client.database import DatabaseManager
+
+class TestDatabaseManager(unittest.TestCase):
+    def setUp(self):
+        self.db = DatabaseManager(':memory:')
+        self.project_id = self.db.create_project(
+            name="测试小说", author="测试作者", theme="测试题材", style="测试风格", topic="测试主题"
+        )
+
+    def tearDown(self):
+        self.db.close()
+
+    def _project_counts(self):
+        project = self.db.list_projects()[0]
+        return project['chapter_count'], project['word_count']
+
+    def test_aggregates_follow_latest_versions(self):
+        self.db.save_chapter(self.project_id, 1, "一二三", title="第一章")
+        self.db.bulk_insert_chapters(self.project_id, [(2, "第二章", "四五"), (3, "第三章", "六")])
+        self.assertEqual(self._project_counts(), (3, 6))
+
+        # 新版本替换旧版本的字数
+        self.db.save_chapter(self.project_id, 1, "一二三四五", title="第一章")
+        self.assertEqual(self._project_counts(), (3, 8))
+
+        # 删除最新版本后回退到上一版本
+        latest_id = self.db.get_chapter(self.project_id, 1)['id']
+        self.db.conn.execute("DELETE FROM chapters WHERE id = ?", (latest_id,))
+        self.assertEqual(self._project_counts(), (3, 6))
+
+    def test_chapter_metadata_without_content(self):
+        self.db.save_chapter(self.project_id, 2, "旧", title="旧标题")
+        self.db.save_chapter(self.project_id, 1, "一", title="第一章")
+        self.db.save_chapter(self.project_id, 2, "新内容", title="新标题")
+
+        metadata = self.db.get_chapter_metadata(self.project_id)
+        self.assertEqual([m['chapter_index'] for m in metadata], [1, 2])
+        self.assertEqual(metadata[1]['title'], "新标题")
+        self.assertEqual(metadata[1]['char_count'], 3)
+        self.assertNotIn('content', metadata[1])
+
+    def test_status_counts_and_progress(self):
+        self.db.save_chapter(self.project_id, 1, "一二三", title="第一章")
+        self.db.save_chapter(self.project_id, 2, "四五", title="第二章", status='completed')
+        self.db.update_chapter_status(self.project_id, 1, 'completed')
+        # 新版本沿用上一版本的状态
+        self.db.save_chapter(self.project_id, 1, "一二三四", title="第一章")
+        self.db.record_token_usage(self.project_id, 100, 50)
+
+        stats = self.db.get_project_stats(self.project_id)
+        self.assertEqual(stats['status_counts']['completed'], 2)
+        self.assertEqual(stats['status_counts']['pending_review'], 0)
+        self.assertEqual((stats['word_count'], stats['prompt_tokens'], stats['llm_calls']), (6, 100, 1))
+
+        today = self.db.get_writing_progress(self.project_id)[-1]
+        self.assertEqual((today['chars_added'], today['chapters_saved']), (6, 3))
+        self.assertEqual(today['completion_tokens'], 50)
+
+    def test_read_cache_invalidated_on_write(self):
+        self.db.save_outline(self.project_id, {"main_storyline": {}, "chapters": ["一"]})
+        self.db.save_chapter(self.project_id, 1, "初稿", title="第一章")
+        for _ in range(3):
+            self.db.get_latest_outline(self.project_id)
+            self.db.get_chapter(self.project_id, 1)
+        stats = self.db.cache_stats()
+        self.assertEqual((stats['outlines']['hits'], stats['outlines']['misses']), (2, 1))
+        self.assertEqual(stats['chapters']['hits'], 2)
+
+        self.db.save_outline(self.project_id, {"main_storyline": {}, "chapters": ["一", "二"]})
+        self.db.save_chapter(self.project_id, 1, "修改稿", title="第一章")
+        self.assertEqual(len(self.db.get_latest_outline(self.project_id)['chapters']), 2)
+        self.assertEqual(self.db.get_chapter(self.project_id, 1)['content'], "修改稿")
+        self.assertEqual(self.db.get_project(self.project_id)['word_count'], 3)
+
+        self.db.update_project(self.project_id, name="新名字")
+        self.assertEqual(self.db.get_project(self.project_id)['name'], "新名字")
+
+    def test_cached_reads_return_copies(self):
+        self.db.save_chapter(self.project_id, 1, "一二三", title="第一章")
+        self.db.save_outline(self.project_id, {'chapters': [{'title': "第一章"}]})
+        self.db.get_project(self.project_id)['name'] = "被修改"
+        self.db.get_chapter(self.project_id, 1)['content'] = "被修改"
+        self.db.get_latest_outline(self.project_id)['chapters'][0]['title'] = "被修改"
+        self.db.get_chapter_metadata(self.project_id)[0]['title'] = "被修改"
+
+        self.assertEqual(self.db.get_project(self.project_id)['name'], "测试小说")
+        self.assertEqual(self.db.get_chapter(self.project_id, 1)['content'], "一二三")
+        self.assertEqual(self.db.get_latest_outline(self.project_id)['chapters'][0]['title'], "第一章")
+        self.assertEqual(self.db.get_chapter_metadata(self.project_id)[0]['title'], "第一章")
+
+    def test_list_projects_paginated(self):
+        for i in range(4):
+            self.db.create_project(f"项目{i}", "", "", "", "")
+        self.assertEqual(self.db.count_projects(), 5)
+        self.assertEqual(len(self.db.list_projects(offset=0, limit=2)), 2)
+        self.assertEqual(len(self.db.list_projects(offset=4, limit=2)), 1)
+
+    def test_foreign_keys_on_reopened_database(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "novel.db")
+            DatabaseManager(path).close()
+            with DatabaseManager(path) as db:
+                self.assertEqual(db.conn.execute("PRAGMA foreign_keys").fetchone()[0], 1)
+                with self.assertRaises(sqlite3.IntegrityError):
+                    db.save_chapter_draft(999, 1, 0, 0, "草稿", [[1, 0, 2]], [])
+
+if __name__ == '__main__':
+    unittest.main()
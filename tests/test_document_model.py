@@ -0,0 +1,131 @@
+import random
+import unittest
+from client.database import DatabaseManager
+from client.modules.document_model import Annotation, PieceTable, anchor_reviews
+
+
+class TestPieceTable(unittest.TestCase):
+    def test_edits_match_string(self):
+        rng = random.Random(3)
+        text = "夜色渐深，林风推开木门。" * 50
+        document = PieceTable(text)
+        for _ in range(500):
+            position = rng.randrange(len(text) + 1)
+            if rng.random() < 0.6:
+                insert = rng.choice(["雪", "远处传来钟声。", "\n"])
+                document.insert(position, insert)
+                text = text[:position] + insert + text[position:]
+            else:
+                length = min(rng.randrange(1, 20), len(text) - position)
+                document.delete(position, length)
+                text = text[:position] + text[position + length:]
+            self.assertEqual(len(document), len(text))
+        self.assertEqual(document.text(), text)
+        self.assertEqual(document.slice(100, 180), text[100:180])
+
+    def test_typing_extends_piece(self):
+        document = PieceTable("开头结尾")
+        for i, char in enumerate("中间的文字"):
+            document.insert(2 + i, char)
+        self.assertEqual(document.text(), "开头中间的文字结尾")
+        self.assertEqual(len(document.pieces), 3)
+
+    def test_annotations_follow_edits(self):
+        document = PieceTable("林风的眼睛是黑色的。后来林风的眼睛是蓝色的。")
+        annotation = Annotation(10, 22, review_id=1)
+        document.annotations = [annotation]
+        document.insert(0, "第一段。")
+        document.insert(annotation.end, "！")
+        self.assertEqual(document.slice(annotation.start, annotation.end), "后来林风的眼睛是蓝色的。")
+        document.replace(annotation.start + 8, 2, "绿色")
+        self.assertEqual(document.slice(annotation.start, annotation.end), "后来林风的眼睛是绿色的。")
+        document.delete(annotation.start - 2, len(document) - annotation.start + 2)
+        self.assertTrue(annotation.collapsed)
+
+    def test_delta_restores_document(self):
+        document = PieceTable("第一句。第二句。")
+        document.insert(4, "插入。")
+        offset, added, pieces = document.delta()
+        document.mark_saved()
+        document.delete(0, 2)
+        document.insert(len(document), "结尾")
+        offset2, added2, pieces2 = document.delta()
+        self.assertEqual((offset, offset2), (0, len(added)))
+        self.assertEqual(added2, "结尾")
+        restored = PieceTable("第一句。第二句。", added + added2, pieces2)
+        self.assertEqual(restored.text(), document.text())
+
+        document.compact()
+        self.assertEqual((document.pieces, document.added, document.dirty), ([[0, 0, len(document)]], "", False))
+
+    def test_unmatched_change_replaces_whole_text(self):
+        # 编辑器报告的范围与文档长度不一致时按全文替换，原始缓冲区仍是数据库中的版本
+        document = PieceTable("第一句。第二句。")
+        document.apply_change(0, 3, "新", 5, lambda: "整篇新内容")
+        self.assertEqual(document.text(), "整篇新内容")
+        self.assertEqual(document.original, "第一句。第二句。")
+        offset, added, pieces = document.delta()
+        self.assertEqual(PieceTable("第一句。第二句。", added, pieces).text(), "整篇新内容")
+
+    def test_unmatched_change_keeps_annotations(self):
+        # 只替换变化的中间部分，变化范围之外的批注和原始片段保持不变
+        document = PieceTable("第一句。第二句。第三句。")
+        annotation = Annotation(4, 8, review_id=1)
+        document.annotations = [annotation]
+        document.apply_change(0, 12, "", 13, lambda: "第一句。第二句。第三句话。")
+        self.assertEqual((annotation.start, annotation.end), (4, 8))
+        self.assertEqual(document.slice(annotation.start, annotation.end), "第二句。")
+        self.assertEqual(document.pieces, [[0, 0, 11], [1, 0, 1], [0, 11, 1]])
+
+        document.apply_change(0, 0, "", 14, lambda: "序第一句。第二句。第三句话。")
+        self.assertEqual(document.slice(annotation.start, annotation.end), "第二句。")
+        self.assertEqual(document.text(), "序第一句。第二句。第三句话。")
+
+    def test_anchor_reviews(self):
+        text = "林风走进院子。林风的眼睛是蓝色的。"
+        reviews = [
+            {'id': 1, 'status': 'pending', 'result': "眼睛颜色矛盾",
+             'issues': {'actual_chapter': 2, 'actual_sentence': "林风的眼睛是蓝色的"}},
+            {'id': 2, 'status': 'pending', 'issues': {'actual_chapter': 3, 'actual_sentence': "林风走进院子"}},
+            {'id': 3, 'status': 'pending', 'issues': {'actual_chapter': 2, 'actual_sentence': "不存在的句子"}},
+        ]
+        annotations = anchor_reviews(text, 2, reviews)
+        self.assertEqual([(a.review_id, text[a.start:a.end]) for a in annotations], [(1, "林风的眼睛是蓝色的")])
+        self.assertEqual(anchor_reviews(text, 2, reviews, annotations), [])
+
+
+class TestChapterDrafts(unittest.TestCase):
+    def setUp(self):
+        self.db = DatabaseManager(':memory:')
+        self.project_id = self.db.create_project("测试小说", "测试作者", "", "", "")
+        self.chapter_id = self.db.save_chapter(self.project_id, 1, "第一句。第二句。", title="第一章")
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_incremental_draft(self):
+        document = PieceTable("第一句。第二句。")
+        document.annotations = [Annotation(4, 8, review_id=None, note="待修改")]
+        for offset, text in ((4, "新增。"), (0, "开头")):
+            document.insert(offset, text)
+            self.db.save_chapter_draft(self.project_id, 1, self.chapter_id, *document.delta(),
+                                       [(a.review_id, a.start, a.end, a.note) for a in document.annotations])
+            document.mark_saved()
+
+        chunks = self.db.conn.execute("SELECT added_offset, text FROM chapter_draft_chunks").fetchall()
+        self.assertEqual(chunks, [(0, "新增。"), (3, "开头")])
+        draft = self.db.get_chapter_draft(self.project_id, 1)
+        self.assertEqual(draft['base_id'], self.chapter_id)
+        restored = PieceTable("第一句。第二句。", draft['added'], draft['pieces'])
+        self.assertEqual(restored.text(), "开头第一句。新增。第二句。")
+        annotation = self.db.get_annotations(self.project_id, 1, self.chapter_id)[0]
+        self.assertEqual(restored.slice(annotation['start_pos'], annotation['end_pos']), "第二句。")
+
+        self.db.delete_chapter_draft(self.project_id, 1)
+        self.assertIsNone(self.db.get_chapter_draft(self.project_id, 1))
+        self.db.delete_project(self.project_id)
+        self.assertEqual(self.db.conn.execute("SELECT COUNT(*) FROM annotations").fetchone()[0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
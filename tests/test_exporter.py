@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+import zipfile
+from unittest.mock import patch
+from client.database import DatabaseManager
+from client.modules.exporter import NovelExporter, DocxWriter, _read_spool, _render_in_process
+
+class TestExporter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmpdir.name, 'test.db'))
+        self.project_id = self.db.create_project(
+            name="测试小说", author="测试作者", theme="测试题材", style="测试风格", topic="测试主题"
+        )
+        self.db.save_chapter(self.project_id, 2, "第二章旧稿", title="第二章")
+        self.db.save_chapter(self.project_id, 1, "第一段\n\n第二段 <b>", title="第一章")
+        self.db.save_chapter(self.project_id, 2, "第二章新稿", title="第二章")
+        self.exporter = NovelExporter(self.db)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def test_markdown_uses_latest_versions_in_order(self):
+        path = self.exporter.export(self.project_id, "markdown", os.path.join(self.tmpdir.name, "out.md"))
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        self.assertLess(text.index("## 第一章"), text.index("## 第二章"))
+        self.assertIn("第二章新稿", text)
+        self.assertNotIn("第二章旧稿", text)
+
+    def test_only_changed_chapters_rerendered(self):
+        path = os.path.join(self.tmpdir.name, "out.docx")
+        self.exporter.export(self.project_id, "docx", path)
+        first_hash = self.db.get_export_fragment(self.project_id, 1, "docx")[0]
+
+        self.db.save_chapter(self.project_id, 2, "第二章修改稿", title="第二章")
+        with patch.object(DocxWriter, 'render_chapter', autospec=True,
+                          side_effect=DocxWriter.render_chapter) as render:
+            self.exporter.export(self.project_id, "docx", path)
+
+        rendered = [call.args[1]['chapter_index'] for call in render.call_args_list]
+        self.assertEqual(rendered, [2])
+        self.assertEqual(self.db.get_export_fragment(self.project_id, 1, "docx")[0], first_hash)
+        with zipfile.ZipFile(path) as zf:
+            document = zf.read('word/document.xml').decode('utf-8')
+        self.assertIn("第二章修改稿", document)
+        self.assertIn("&lt;b&gt;", document)
+
+    def test_export_many_in_process_pool(self):
+        paths = self.exporter.export_many(self.project_id, ["markdown", "epub"], self.tmpdir.name)
+        self.assertEqual(set(paths), {"markdown", "epub"})
+        with zipfile.ZipFile(paths["epub"]) as zf:
+            self.assertEqual(zf.namelist()[0], 'mimetype')
+            self.assertIn('OEBPS/chapter_2.xhtml', zf.namelist())
+        # 子进程不写数据库，片段由主进程统一写入缓存
+        self.assertIsNotNone(self.db.get_export_fragment(self.project_id, 2, "epub"))
+        self.assertIsNotNone(self.db.get_export_fragment(self.project_id, 1, "markdown"))
+
+    def test_child_process_does_not_write(self):
+        spool = os.path.join(self.tmpdir.name, "markdown.fragments")
+        with patch('client.modules.exporter.FRAGMENT_BATCH_SIZE', 1):
+            _render_in_process(self.db.db_path, self.project_id, "markdown",
+                               os.path.join(self.tmpdir.name, "child.md"), spool)
+        # 片段按批写入临时文件，由主进程读出
+        self.assertEqual([(index, fmt) for index, fmt, _, _ in _read_spool(spool)],
+                         [(1, "markdown"), (2, "markdown")])
+        self.assertIsNone(self.db.get_export_fragment(self.project_id, 1, "markdown"))
+
+    def test_fragments_saved_in_batches(self):
+        for index in range(3, 8):
+            self.db.save_chapter(self.project_id, index, f"第{index}章正文", title=f"第{index}章")
+        batches = []
+        original = self.db.save_export_fragments
+
+        def save(project_id, batch):
+            batches.append(len(batch))
+            original(project_id, batch)
+
+        with patch('client.modules.exporter.FRAGMENT_BATCH_SIZE', 3), \
+                patch.object(self.db, 'save_export_fragments', side_effect=save):
+            self.exporter.export(self.project_id, "markdown", os.path.join(self.tmpdir.name, "out.md"))
+        self.assertEqual(batches, [3, 3, 1])
+        self.assertIsNotNone(self.db.get_export_fragment(self.project_id, 7, "markdown"))
+
+if __name__ == '__main__':
+    unittest.main()
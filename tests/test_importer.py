@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+from client.database import DatabaseManager
+from client.modules.exporter import NovelExporter
+from client.modules.importer import CHAPTER_HEADING, ManuscriptImporter
+
+class TestImporter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(':memory:')
+        self.importer = ManuscriptImporter(self.db)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def _write(self, name, text, encoding='utf-8'):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w', encoding=encoding) as f:
+            f.write(text)
+        return path
+
+    def test_txt_chapters_and_characters(self):
+        dialogue = "“走吧。”林风说：“天黑了。”\n" * 6
+        text = "楔子的内容。\n\n第一章 出发\n" + dialogue + "第二章：归来\n苏晴笑道：“回来了。”\n"
+        path = self._write("旧稿.txt", text, encoding='gb18030')
+
+        result = self.importer.import_file(path, extract_characters=True)
+
+        self.assertEqual(result['chapters'], 3)
+        project = self.db.get_project(result['project_id'])
+        self.assertEqual(project['name'], "旧稿")
+        first = self.db.get_chapter(result['project_id'], 1)
+        self.assertEqual(first['title'], "序章")
+        second = self.db.get_chapter(result['project_id'], 2)
+        self.assertEqual(second['title'], "第一章 出发")
+        self.assertIn("林风说", second['content'])
+        names = [c['name'] for c in self.db.get_characters(result['project_id'])]
+        self.assertEqual(names, ["林风"])
+
+    def test_heading_requires_separator(self):
+        for line in ("第一章", "第一章 出发", "第二回：归来", "第十二卷　江湖", "Chapter 3 Home"):
+            self.assertTrue(CHAPTER_HEADING.match(line), line)
+        for line in ("第三回合他输了", "第一节课上老师点名", "第二章节的内容"):
+            self.assertIsNone(CHAPTER_HEADING.match(line), line)
+
+    def test_gb18030_after_utf8_sample(self):
+        # 只根据开头判断编码；开头的英文同时是合法UTF-8，后文出现GBK编码的中文时从出错处改用GB18030
+        head = "Chapter 1 Start\n" + "The night deepened.\n" * 5000
+        path = os.path.join(self.tmpdir.name, "mixed.txt")
+        with open(path, 'wb') as f:
+            f.write(head.encode('ascii'))
+            f.write("第二章 归来\n苏晴回来了。\n".encode('gb18030'))
+        self.assertEqual(self.importer._detect_encoding(path), 'utf-8')
+        result = self.importer.import_file(path)
+        self.assertEqual(result['chapters'], 2)
+        self.assertEqual(self.db.get_chapter(result['project_id'], 2)['content'], "苏晴回来了。")
+
+    def test_lines_across_chunks(self):
+        text = "第一章 出发\r\n" + "林风推开木门。\n" * 3000 + "最后一行"
+        path = self._write("long.txt", text)
+        self.assertEqual(list(self.importer._iter_text_lines(path, chunk_size=1000)),
+                         ["第一章 出发"] + ["林风推开木门。"] * 3000 + ["最后一行"])
+
+    def test_import_not_counted_as_writing_progress(self):
+        path = self._write("旧稿.txt", "第一章 出发\n林风推开木门。\n第二章 归来\n苏晴回来了。\n")
+        result = self.importer.import_file(path)
+        self.assertEqual(self.db.get_writing_progress(result['project_id']), [])
+        # 总字数仍包含导入的章节，导入之后的编辑照常计入
+        self.assertEqual(self.db.get_project_stats(result['project_id'])['word_count'], 13)
+        self.db.save_chapter(result['project_id'], 2, "苏晴回来了。天亮了。")
+        progress = self.db.get_writing_progress(result['project_id'])
+        self.assertEqual((progress[0]['chars_added'], progress[0]['chapters_saved']), (4, 1))
+
+    def test_markdown_headings(self):
+        path = self._write("book.md", "# 书名\n\n## 开端\n正文一\n\n## 结尾\n正文二\n")
+        result = self.importer.import_file(path, project_name="md")
+        self.assertEqual(result['chapters'], 2)
+        self.assertEqual(self.db.get_chapter(result['project_id'], 2)['content'], "正文二")
+
+    def test_docx_round_trip(self):
+        source = self.db.create_project("源", "作者", "", "", "")
+        self.db.save_chapter(source, 1, "第一段\n第二段", title="第一章 相遇")
+        self.db.save_chapter(source, 2, "结尾段", title="第二章 别离")
+        path = NovelExporter(self.db).export(source, "docx", os.path.join(self.tmpdir.name, "a.docx"))
+
+        result = self.importer.import_file(path)
+        chapters = list(self.db.iter_latest_chapters(result['project_id']))
+        self.assertEqual([c['title'] for c in chapters], ["第一章 相遇", "第二章 别离"])
+        self.assertEqual(chapters[0]['content'], "第一段\n第二段")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from client.config import BackendSettings
+from client.modules.llm_backends import (BackendError, HTTPBackend, LLMBackend, LocalBatchingBackend, RecordingBackend,
+                                         ReplayBackend, StubModel, create_backend, estimate_tokens,
+                                         load_recording)
+
+
+class CompletionHandler(BaseHTTPRequestHandler):
+    """OpenAI兼容接口的最小实现"""
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        text = "回复：" + request['messages'][-1]['content']
+        if request.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            for piece in (text[:3], text[3:]):
+                chunk = {'choices': [{'delta': {'content': piece}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+        body = json.dumps({
+            'model': request['model'], 'choices': [{'message': {'content': text}}],
+            'usage': {'prompt_tokens': 5, 'completion_tokens': len(text)}
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHTTPBackend(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(('127.0.0.1', 0), CompletionHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.backend = HTTPBackend(BackendSettings(type='http', api_base=f"http://127.0.0.1:{cls.server.server_port}/v1"))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_chat(self):
+        response = self.backend.chat("local", [{"role": "user", "content": "你好"}], 0.7, 100)
+        self.assertEqual(response['choices'][0]['message']['content'], "回复：你好")
+        self.assertEqual(response['usage']['prompt_tokens'], 5)
+
+    def test_stream(self):
+        stream = self.backend.chat("local", [{"role": "user", "content": "你好"}], 0.7, 100, stream=True)
+        self.assertEqual("".join(c['choices'][0]['delta']['content'] for c in stream), "回复：你好")
+
+    def test_connection_error(self):
+        backend = HTTPBackend(BackendSettings(type='http', api_base="http://127.0.0.1:1/v1"))
+        with self.assertRaises(BackendError):
+            backend.chat("local", [{"role": "user", "content": "你好"}], 0.7, 100, timeout=2)
+
+
+class TestLocalBatchingBackend(unittest.TestCase):
+    def test_concurrent_requests_batched(self):
+        backend = LocalBatchingBackend(StubModel(forward_latency=0.05), max_batch_size=8, batch_wait_ms=50)
+        try:
+            def call(i):
+                response = backend.chat("stub", [{"role": "user", "content": f"请求{i}"}], 0.7, 100)
+                return response['choices'][0]['message']['content']
+
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                results = list(executor.map(call, range(16)))
+            self.assertEqual(results, [f"[stub] 请求{i}" for i in range(16)])
+            self.assertEqual(sum(backend.batch_sizes), 16)
+            self.assertLess(len(backend.batch_sizes), 16)
+            self.assertLessEqual(max(backend.batch_sizes), 8)
+        finally:
+            backend.close()
+
+    def test_timed_out_request_skipped(self):
+        backend = LocalBatchingBackend(StubModel(forward_latency=0.2), max_batch_size=1, batch_wait_ms=0)
+        try:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                first = executor.submit(backend.chat, "stub", [{"role": "user", "content": "a"}], 0.7, 100)
+                time.sleep(0.05)
+                # 第一个请求占用模型时第二个请求超时，之后不应再被计算
+                with self.assertRaises(BackendError):
+                    backend.chat("stub", [{"role": "user", "content": "b"}], 0.7, 100, timeout=0.05)
+                first.result()
+            backend.chat("stub", [{"role": "user", "content": "c"}], 0.7, 100)
+            self.assertEqual(backend.batch_sizes, [1, 1])
+        finally:
+            backend.close()
+
+    def test_model_error(self):
+        class BrokenModel:
+            def generate_batch(self, requests):
+                raise RuntimeError("显存不足")
+
+        backend = LocalBatchingBackend(BrokenModel())
+        try:
+            with self.assertRaises(BackendError):
+                backend.chat("stub", [{"role": "user", "content": "x"}], 0.7, 100)
+        finally:
+            backend.close()
+
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("林风推开木门。"), 7)
+        self.assertEqual(estimate_tokens("hello world!"), 3)
+        self.assertEqual(estimate_tokens("林风said hi"), 2 + 2)
+
+
+class SlowStreamBackend(LLMBackend):
+    """流式数据块之间间隔固定时间，"失败" 消息抛出错误"""
+
+    def chat(self, model, messages, temperature, max_tokens, stream=False, timeout=None):
+        prompt = messages[-1]['content']
+        if prompt == "失败":
+            raise BackendError("timeout")
+        if not stream:
+            return {'model': model, 'choices': [{'message': {'content': prompt * 2}}]}
+
+        def chunks():
+            for piece in prompt:
+                time.sleep(0.02)
+                yield {'choices': [{'delta': {'content': piece}}]}
+        return chunks()
+
+
+class TestRecordReplay(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "session.jsonl.gz")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _record(self):
+        recorder = RecordingBackend(SlowStreamBackend(), self.path)
+        messages = [{"role": "user", "content": "你好世界"}]
+        stream = recorder.chat("m", messages, 0.7, 100, stream=True)
+        self.assertEqual("".join(c['choices'][0]['delta']['content'] for c in stream), "你好世界")
+        self.assertEqual(recorder.chat("m", messages, 0.7, 100)['choices'][0]['message']['content'], "你好世界" * 2)
+        with self.assertRaises(BackendError):
+            recorder.chat("m", [{"role": "user", "content": "失败"}], 0.7, 100)
+        recorder.close()
+
+    def test_round_trip(self):
+        self._record()
+        records = load_recording(self.path)
+        self.assertEqual(len(records), 3)
+        self.assertEqual(len(records[0]['chunks']), 4)
+
+        replay = ReplayBackend(records, speed=1.0)
+        start = time.perf_counter()
+        stream = replay.chat("other-model", [{"role": "user", "content": "你好世界"}], 0.2, 10, stream=True)
+        self.assertEqual("".join(c['choices'][0]['delta']['content'] for c in stream), "你好世界")
+        # 按录制时的间隔产出
+        self.assertGreaterEqual(time.perf_counter() - start, 0.06)
+        response = replay.chat("m", [{"role": "user", "content": "你好世界"}], 0.7, 100)
+        self.assertEqual(response['choices'][0]['message']['content'], "你好世界" * 2)
+        with self.assertRaises(BackendError):
+            replay.chat("m", [{"role": "user", "content": "失败"}], 0.7, 100)
+        self.assertEqual(replay.mismatches, 0)
+
+    def test_accelerated_and_unmatched(self):
+        self._record()
+        replay = ReplayBackend(load_recording(self.path), speed=0, strict=False)
+        start = time.perf_counter()
+        # 非严格模式下提示词改变时按录制顺序回放
+        stream = replay.chat("m", [{"role": "user", "content": "改过的提示词"}], 0.7, 100, stream=True)
+        self.assertEqual("".join(c['choices'][0]['delta']['content'] for c in stream), "你好世界")
+        self.assertLess(time.perf_counter() - start, 0.05)
+        self.assertEqual(replay.mismatches, 1)
+
+    def test_strict_mismatch_raises(self):
+        self._record()
+        replay = ReplayBackend(load_recording(self.path), speed=0)
+        with self.assertRaises(BackendError):
+            replay.chat("m", [{"role": "user", "content": "改过的提示词"}], 0.7, 100, stream=True)
+        self.assertEqual(replay.mismatches, 1)
+        # 不一致的请求不消耗记录，匹配的请求仍可回放
+        stream = replay.chat("m", [{"role": "user", "content": "你好世界"}], 0.7, 100, stream=True)
+        self.assertEqual("".join(c['choices'][0]['delta']['content'] for c in stream), "你好世界")
+
+    def test_create_backend(self):
+        self._record()
+        backend = create_backend(BackendSettings(type='replay', replay_path=self.path, replay_speed=0))
+        self.assertIsInstance(backend, ReplayBackend)
+        backend = create_backend(BackendSettings(type='local', record_path=self.path))
+        self.assertIsInstance(backend, RecordingBackend)
+        backend.chat("stub", [{"role": "user", "content": "追加"}], 0.7, 100)
+        backend.close()
+        # 追加写入的新gzip成员与之前的记录一起读出
+        self.assertEqual(len(load_recording(self.path)), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
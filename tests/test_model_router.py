@@ -0,0 +1,149 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from client import tracing
+from client.config import Config
+from client.modules.llm_backends import BackendError, LLMBackend
+from client.modules import model_router
+from client.modules.model_router import ModelRouter
+
+
+class FakeBackend(LLMBackend):
+    """按模型名返回固定结果，failing 中的模型抛出错误"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = []
+
+    def chat(self, model, messages, temperature, max_tokens, stream=False, timeout=None):
+        self.calls.append({'model': model, 'temperature': temperature, 'max_tokens': max_tokens})
+        if model in self.failing:
+            raise BackendError("timeout")
+        if stream:
+            return iter([{'choices': [{'delta': {'content': "你好"}}]}, {'choices': [{'delta': {}}]}])
+        return {'model': model, 'choices': [{'message': {'content': "结果"}}],
+                'usage': {'prompt_tokens': 1000, 'completion_tokens': 500}}
+
+
+class TestModelRouter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmpdir.name, "config.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "openai": {"api_key": "test", "model": "default-model", "temperature": 0.7, "max_tokens": 2000},
+                "routing": {
+                    "tiers": {
+                        "strong": {"model": "big", "prompt_price": 0.01, "completion_price": 0.03,
+                                   "fallback": "fast"},
+                        "fast": {"model": "", "prompt_price": 0.001, "completion_price": 0.002}
+                    },
+                    "tasks": {"summary": {"tier": "fast", "temperature": 0.3, "max_tokens": 100}}
+                }
+            }, f)
+        self.config = Config(path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _router(self, failing=()):
+        backend = FakeBackend(failing)
+        return ModelRouter(self.config, backends={'openai': backend}), backend
+
+    def test_task_parameters(self):
+        router, backend = self._router()
+        router.complete('summary', [{"role": "user", "content": "x"}], temperature=1.5, max_tokens=800)
+        router.complete('chapter', [{"role": "user", "content": "x"}], temperature=1.5)
+        router.complete('unknown', [{"role": "user", "content": "x"}])
+        # 任务配置优先，其次调用方参数，最后全局配置；层级未配置模型时使用openai.model
+        self.assertEqual(backend.calls[0]['model'], "default-model")
+        self.assertEqual((backend.calls[0]['temperature'], backend.calls[0]['max_tokens']), (0.3, 100))
+        self.assertEqual((backend.calls[1]['model'], backend.calls[1]['temperature']), ("big", 1.5))
+        self.assertEqual((backend.calls[2]['model'], backend.calls[2]['max_tokens']), ("big", 2000))
+
+    def test_fallback_and_report(self):
+        router, backend = self._router(failing={"big"})
+        response = router.complete('chapter', [{"role": "user", "content": "x"}])
+        self.assertEqual(response['model'], "default-model")
+        self.assertEqual([c['model'] for c in backend.calls], ["big", "default-model"])
+
+        report = {r['tier']: r for r in router.report()}
+        self.assertEqual((report['strong']['errors'], report['strong']['fallbacks']), (1, 1))
+        self.assertEqual(report['fast']['calls'], 1)
+        self.assertAlmostEqual(report['fast']['cost'], 1000 * 0.001 / 1000 + 500 * 0.002 / 1000)
+
+    def test_unexpected_error_closes_span(self):
+        router, backend = self._router()
+
+        def broken(*args, **kwargs):
+            raise KeyError('choices')
+        backend.chat = broken
+
+        tracing.reset()
+        tracing.enable()
+        try:
+            with self.assertRaises(KeyError):
+                router.complete('chapter', [{"role": "user", "content": "x"}])
+            rows = {row['name']: row for row in tracing.summary()}
+        finally:
+            tracing.disable()
+            tracing.reset()
+        self.assertEqual(rows['llm.chapter']['count'], 1)
+
+    def test_shared_router_created_once(self):
+        saved = model_router._router
+        model_router._router = None
+        try:
+            with mock.patch.object(model_router, 'ModelRouter', side_effect=lambda: time.sleep(0.01) or object()):
+                with ThreadPoolExecutor(max_workers=8) as executor:
+                    routers = list(executor.map(lambda _: model_router.get_router(), range(8)))
+            self.assertEqual(len({id(r) for r in routers}), 1)
+        finally:
+            model_router._router = saved
+
+        # 没有可降级的层级时抛出原始错误
+        router, _ = self._router(failing={"big", "default-model"})
+        with self.assertRaises(BackendError):
+            router.complete('chapter', [{"role": "user", "content": "x"}])
+
+    def test_stream_usage_estimated(self):
+        router, _ = self._router()
+        stream = router.complete('outline', [{"role": "user", "content": "提示词"}], stream=True)
+        self.assertEqual("".join(c['choices'][0]['delta'].get('content') or "" for c in stream), "你好")
+        stream.close()
+        report = router.report()[0]
+        self.assertEqual((report['tier'], report['calls']), ('strong', 1))
+        self.assertEqual((report['prompt_tokens'], report['completion_tokens']), (3, 2))
+        self.assertEqual(stream.usage, {'prompt_tokens': 3, 'completion_tokens': 2})
+
+    def test_stream_span_covers_generation(self):
+        backend = FakeBackend()
+
+        def slow_stream():
+            for text in ("你", "好"):
+                time.sleep(0.02)
+                yield {'choices': [{'delta': {'content': text}}]}
+        backend.chat = lambda *args, **kwargs: slow_stream()
+        router = ModelRouter(self.config, backends={'openai': backend})
+
+        tracing.reset()
+        tracing.enable()
+        try:
+            stream = router.complete('outline', [{"role": "user", "content": "提示词"}], stream=True)
+            self.assertEqual(tracing.summary(), [])
+            list(stream)
+            rows = {row['name']: row for row in tracing.summary()}
+        finally:
+            tracing.disable()
+            tracing.reset()
+        # span在流读完时结束，而不是拿到迭代器时
+        self.assertEqual(rows['llm.outline']['count'], 1)
+        self.assertGreaterEqual(rows['llm.outline']['total_ms'], 40)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,205 @@
+import json
+import os
+import re
+import unittest
+from unittest import mock
+from PyQt5.QtWidgets import QApplication
+from client.database import DatabaseManager
+from client.modules import model_router
+from client.modules.llm_backends import BackendError
+from client.modules.outline_generator import DETAIL_LEVELS, OutlineGenerator
+
+SKELETON = {
+    "main_storyline": {"overview": "少年林风离开小镇寻找失踪的师父", "structure": {}},
+    "chapters": [
+        {"chapter_number": 1, "title": "出城", "pov": "林风", "summary": "林风决定离开小镇"},
+        {"chapter_number": 2, "title": "夜雨", "pov": "林风", "summary": "林风在雨夜遇到苏晴"},
+        {"chapter_number": 3, "title": "渡口", "pov": "苏晴", "summary": "两人在渡口分别"}
+    ],
+    "characters": [{"name": "林风"}, {"name": "苏晴"}]
+}
+
+
+class FakeStream:
+    def __init__(self, text, model="fake-model"):
+        self.model = model
+        self.closed = False
+        self.usage = {'prompt_tokens': 10, 'completion_tokens': 20}
+        self._chunks = iter([{'choices': [{'delta': {'content': text[i:i + 16]}}]}
+                             for i in range(0, len(text), 16)])
+
+    def __iter__(self):
+        return self._chunks
+
+    def close(self):
+        self.closed = True
+
+
+class FakeRouter:
+    """
+    代替 ModelRouter：骨架返回固定文本，补充的章节范围按请求的范围返回章节（range_text 可覆盖），
+    章节细化按章节号返回场景，failing 中的章节抛出错误
+    """
+
+    def __init__(self, skeleton_text, failing=(), range_text=None):
+        self.skeleton_text = skeleton_text
+        self.failing = set(failing)
+        self.range_text = range_text
+        self.calls = []
+
+    def complete(self, task, messages, temperature=None, max_tokens=None, stream=False):
+        self.calls.append({'task': task, 'max_tokens': max_tokens, 'prompt': messages[-1]['content']})
+        if stream:
+            return FakeStream(self.skeleton_text)
+        if task == 'outline':
+            first, last = map(int, re.search(r"请接着给出第(\d+)至(\d+)章", messages[-1]['content']).groups())
+            chapters = [{"chapter_number": i, "title": f"续{i}", "summary": f"第{i}章摘要"}
+                        for i in range(first, last + 1)]
+            text = self.range_text if self.range_text is not None else json.dumps(chapters, ensure_ascii=False)
+            return {'choices': [{'message': {'content': text}}], 'model': "fake-model",
+                    'usage': {'prompt_tokens': 30, 'completion_tokens': 40}}
+        number = int(re.search(r"请为第(\d+)章", messages[-1]['content']).group(1))
+        if number in self.failing:
+            raise BackendError("timeout")
+        scenes = [{"scene_type": "对话", "description": f"第{number}章场景{i}"} for i in range(10)]
+        return {'choices': [{'message': {'content': "```json\n" + json.dumps(scenes, ensure_ascii=False) + "\n```"}}],
+                'usage': {'prompt_tokens': 100, 'completion_tokens': 50}}
+
+
+class TestOutlineGenerator(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        self.saved_router = model_router._router
+        self.db = DatabaseManager(':memory:')
+        self.generator = OutlineGenerator(self.db)
+        self.project_id = self.db.create_project("大纲测试", "测试作者", "武侠", "古典", "寻找")
+
+    def tearDown(self):
+        model_router._router = self.saved_router
+        self.db.close()
+
+    def _generate(self, router, **overrides):
+        """chapter_count 默认与 SKELETON 的章节数相同，不触发补充请求"""
+        model_router._router = router
+        generation_config = dict(self.generator.config.get_generation_config("outline"), chapter_count=3)
+        generation_config.update(overrides)
+        with mock.patch('client.modules.outline_generator.QMessageBox') as message_box, \
+                mock.patch.object(self.generator.config, 'get_generation_config', return_value=generation_config):
+            outline = self.generator.generate_outline(self.project_id, "武侠", "古典", "寻找")
+        return outline, message_box
+
+    def test_skeleton_then_expansion(self):
+        router = FakeRouter(json.dumps(SKELETON, ensure_ascii=False))
+        outline, _ = self._generate(router)
+
+        self.assertEqual([call['task'] for call in router.calls[:1]], ['outline'])
+        self.assertEqual(sorted(call['task'] for call in router.calls[1:]), ['outline_chapter'] * 3)
+        max_scenes = self.generator.config.get_generation_config("outline").get("max_scenes_per_chapter")
+        for chapter in outline['chapters']:
+            self.assertEqual(len(chapter['key_scenes']), max_scenes)
+            self.assertEqual(chapter['key_scenes'][0]['description'], f"第{chapter['chapter_number']}章场景0")
+        self.assertEqual(self.db.get_latest_outline(self.project_id)['chapters'][2]['title'], "渡口")
+        # 骨架使用流的估算用量，与各章返回的用量同为token数
+        stats = self.db.get_project_stats(self.project_id)
+        self.assertEqual((stats['prompt_tokens'], stats['completion_tokens']), (10 + 3 * 100, 20 + 3 * 50))
+
+    def test_skeleton_budget_is_bounded_per_call(self):
+        generation_config = {"max_tokens": 1000, "chapter_count": 500, "skeleton_chapters_per_call": 20,
+                             "skeleton_tokens_per_chapter": 120}
+        # 预算只随单次请求的章节数增长，与全书章节数无关
+        self.assertEqual(self.generator._skeleton_max_tokens(generation_config), 1000 + 20 * 120)
+        self.assertEqual(self.generator._skeleton_max_tokens(generation_config, 5), 5 * 120)
+        prompt = self.generator._build_skeleton_prompt("武侠", "古典", "寻找", generation_config)
+        self.assertIn("全书共500章，本次只需给出第1至20章", prompt)
+
+        generation_config["chapter_count"] = 12
+        self.assertEqual(self.generator._skeleton_max_tokens(generation_config), 1000 + 12 * 120)
+        self.assertIn("全书共12章，只需给出每章", self.generator._build_skeleton_prompt("武侠", "古典", "寻找",
+                                                                                  generation_config))
+
+    def test_skeleton_generated_in_ranges(self):
+        router = FakeRouter(json.dumps(SKELETON, ensure_ascii=False))
+        outline, message_box = self._generate(router, chapter_count=7, skeleton_chapters_per_call=3)
+
+        message_box.critical.assert_not_called()
+        self.assertEqual([call['task'] for call in router.calls[:3]], ['outline'] * 3)
+        self.assertIn("请接着给出第4至6章", router.calls[1]['prompt'])
+        self.assertIn("第3章《渡口》：两人在渡口分别", router.calls[1]['prompt'])
+        self.assertIn("请接着给出第7至7章", router.calls[2]['prompt'])
+        self.assertEqual([call['max_tokens'] for call in router.calls[1:3]], [3 * 120, 1 * 120])
+        self.assertEqual([c['chapter_number'] for c in outline['chapters']], list(range(1, 8)))
+        self.assertEqual(outline['chapters'][6]['title'], "续7")
+        self.assertEqual(len(router.calls), 3 + 7)
+        stats = self.db.get_project_stats(self.project_id)
+        self.assertEqual((stats['prompt_tokens'], stats['completion_tokens']),
+                         (10 + 2 * 30 + 7 * 100, 20 + 2 * 40 + 7 * 50))
+
+    def test_truncated_skeleton_range(self):
+        router = FakeRouter(json.dumps(SKELETON, ensure_ascii=False), range_text='[{"chapter_number": 4, "ti')
+        outline, message_box = self._generate(router, chapter_count=5)
+
+        self.assertIsNone(outline)
+        self.assertIn("第4至5章不完整", message_box.critical.call_args[0][2])
+        self.assertIsNone(self.db.get_latest_outline(self.project_id))
+
+    def test_failed_chapter_keeps_skeleton(self):
+        router = FakeRouter(json.dumps(SKELETON, ensure_ascii=False), failing={2})
+        outline, message_box = self._generate(router)
+
+        self.assertEqual([len(c['key_scenes']) > 0 for c in outline['chapters']], [True, False, True])
+        self.assertEqual(outline['chapters'][1]['summary'], "林风在雨夜遇到苏晴")
+        message_box.critical.assert_not_called()
+
+    def test_truncated_skeleton(self):
+        text = json.dumps(SKELETON, ensure_ascii=False)
+        router = FakeRouter(text[:len(text) // 2])
+        outline, message_box = self._generate(router)
+
+        # 截断的骨架无法解析，不再细化章节，也不写入数据库
+        self.assertIsNone(outline)
+        self.assertEqual(len(router.calls), 1)
+        self.assertIn("截断", message_box.critical.call_args[0][2])
+        self.assertIsNone(self.db.get_latest_outline(self.project_id))
+
+    def test_invalid_skeleton(self):
+        router = FakeRouter(json.dumps({"chapters": []}))
+        outline, message_box = self._generate(router)
+
+        self.assertIsNone(outline)
+        self.assertIn("main_storyline", message_box.critical.call_args[0][2])
+
+    def test_parse_json_block(self):
+        parse = self.generator._parse_json_block
+        self.assertEqual(parse('```json\n{"a": 1}\n```'), {"a": 1})
+        self.assertEqual(parse('说明文字\n```\n[1, 2]\n```\n结尾'), [1, 2])
+        self.assertEqual(parse('  {"a": "甲"}  '), {"a": "甲"})
+        with self.assertRaises(json.JSONDecodeError):
+            parse('```json\n{"a": \n```')
+
+    def test_detail_levels(self):
+        outline = {"main_storyline": SKELETON["main_storyline"], "chapters": SKELETON["chapters"],
+                   "characters": SKELETON["characters"]}
+        self.assertEqual(sorted(DETAIL_LEVELS), [1, 2, 3, 4, 5])
+
+        def prompt(level):
+            return self.generator._build_chapter_prompt(
+                outline, 1, "武侠", "古典", {"detail_level": level, "max_scenes_per_chapter": 4})
+
+        for level, description in DETAIL_LEVELS.items():
+            self.assertIn(description, prompt(level))
+        self.assertNotIn('"conflict"', prompt(2))
+        self.assertIn('"conflict"', prompt(3))
+        self.assertNotIn('"dialogue_hint"', prompt(3))
+        self.assertIn('"dialogue_hint"', prompt(4))
+        # 未知等级使用默认的3级描述
+        self.assertIn(DETAIL_LEVELS[3], prompt(9))
+        self.assertIn("上一章摘要：林风决定离开小镇", prompt(3))
+        self.assertIn("下一章摘要：两人在渡口分别", prompt(3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from client import tracing
+from client.database import DatabaseManager
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        tracing.reset()
+        tracing.enable()
+
+    def tearDown(self):
+        tracing.disable()
+        tracing.reset()
+
+    def test_disabled_records_nothing(self):
+        tracing.disable()
+        with tracing.span("noop"):
+            pass
+        self.assertEqual(tracing.summary(), [])
+
+    def test_spans_and_decorator(self):
+        @tracing.traced(category='test')
+        def work():
+            with tracing.span("inner", "test", step=1):
+                time.sleep(0.002)
+            return 42
+
+        for _ in range(3):
+            self.assertEqual(work(), 42)
+        rows = {row['name']: row for row in tracing.summary()}
+        outer = rows[work.__qualname__]
+        self.assertEqual((outer['count'], rows['inner']['count']), (3, 3))
+        self.assertGreaterEqual(outer['total_ms'], rows['inner']['total_ms'])
+        self.assertLessEqual(outer['p50_ms'], outer['p95_ms'])
+        self.assertLessEqual(outer['p95_ms'], outer['max_ms'])
+
+    def test_error_recorded(self):
+        with self.assertRaises(ValueError):
+            with tracing.span("failing"):
+                raise ValueError("x")
+        self.assertEqual(tracing.summary()[0]['name'], "failing")
+
+    def test_export_chrome_trace(self):
+        db = DatabaseManager(':memory:')
+        try:
+            project_id = db.create_project("测试小说", "测试作者", "", "", "")
+            db.save_chapter(project_id, 1, "第一章内容", title="第一章")
+        finally:
+            db.close()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "trace.json")
+            count = tracing.export_chrome_trace(path)
+            with open(path, encoding='utf-8') as f:
+                trace = json.load(f)
+        events = [e for e in trace['traceEvents'] if e['ph'] == 'X']
+        self.assertEqual(len(events), count)
+        names = {e['name'] for e in events}
+        self.assertIn("DatabaseManager.save_chapter", names)
+        self.assertIn("sqlite.commit", names)
+        self.assertTrue(all(e['dur'] >= 0 and e['cat'] for e in events))
+
+
+if __name__ == '__main__':
+    unittest.main()